@@ -6,6 +6,7 @@ from astrbot.core.platform import (
     MessageType,
     PlatformMetadata,
     Group,
+    RetryAfter,
 )
 
 from astrbot.core.platform.register import register_platform_adapter
@@ -20,4 +21,5 @@ __all__ = [
     "PlatformMetadata",
     "register_platform_adapter",
     "Group",
+    "RetryAfter",
 ]
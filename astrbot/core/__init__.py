@@ -20,9 +20,7 @@ if os.environ.get("TESTING", ""):
     logger.setLevel("DEBUG")
 
 db_helper = SQLiteDatabase(DB_PATH)
-sp = (
-    SharedPreferences()
-)  # 简单的偏好设置存储, 这里后续应该存储到数据库中, 一些部分可以存储到配置中
+sp = SharedPreferences()  # 简单的偏好设置存储, 保存在 data/shared_preferences.db 中
 pip_installer = PipInstaller(
     astrbot_config.get("pip_install_arg", ""),
     astrbot_config.get("pypi_index_url", None),
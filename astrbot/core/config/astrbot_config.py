@@ -2,8 +2,13 @@ import os
 import json
 import logging
 import enum
+import asyncio
+import atexit
+import inspect
+import threading
+import weakref
 from .default import DEFAULT_CONFIG, DEFAULT_VALUE_MAP
-from typing import Dict
+from typing import Any, Callable, Dict, Iterable, Optional, Set
 
 ASTRBOT_CONFIG_PATH = "data/cmd_config.json"
 logger = logging.getLogger("astrbot")
@@ -14,12 +19,65 @@ class RateLimitStrategy(enum.Enum):
     DISCARD = "discard"
 
 
+ConfigListener = Callable[[Set[str]], Any]
+"""配置变更回调, 参数为变更的配置项路径集合, 如 {"wake_prefix", "platform_settings.id_whitelist"}"""
+
+_unsaved_configs: Dict[int, weakref.ref] = {}
+"""有尚未写入文件的修改的配置。AstrBotConfig 是 dict, 不能放入 WeakSet"""
+
+
+def _atomic_write(path: str, text: str):
+    """先写入临时文件并 fsync, 再重命名覆盖, 写入途中崩溃不会损坏原文件"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8-sig") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _flush_pending(path: str):
+    """写入同一配置文件上尚未保存的修改, 避免重新读取该文件时得到旧内容"""
+    path = os.path.abspath(path)
+    for ref in list(_unsaved_configs.values()):
+        config = ref()
+        if config is not None and os.path.abspath(config.config_path) == path:
+            config.flush()
+
+
+def _diff_keys(old: Any, new: Any, path: str = "") -> Set[str]:
+    """比较两份配置, 返回发生变化的配置项路径。字典会逐层比较, 其余类型作为一个整体比较"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = set()
+        for key in old.keys() | new.keys():
+            sub_path = f"{path}.{key}" if path else key
+            if key not in old or key not in new:
+                changed.add(sub_path)
+            else:
+                changed |= _diff_keys(old[key], new[key], sub_path)
+        return changed
+    return set() if old == new else {path}
+
+
+def _matches(changed: Set[str], keys: Optional[Set[str]]) -> bool:
+    if keys is None:
+        return True
+    for c in changed:
+        for k in keys:
+            # 订阅的配置项本身、其子项或其父项发生变化
+            if c == k or c.startswith(k + ".") or k.startswith(c + "."):
+                return True
+    return False
+
+
 class AstrBotConfig(dict):
     """从配置文件中加载的配置，支持直接通过点号操作符访问根配置项。
 
     - 初始化时会将传入的 default_config 与配置文件进行比对，如果配置文件中缺少配置项则会自动插入默认值并进行一次写入操作。会递归检查配置项。
     - 如果配置文件路径对应的文件不存在，则会自动创建并写入默认配置。
     - 如果传入了 schema，将会通过 schema 解析出 default_config，此时传入的 default_config 会被忽略。
+    - save_config() 会立即通知订阅者变更的配置项; 写入文件在事件循环中会被合并, 在 save_delay 秒后于线程中完成。
+    - 加载同一配置文件时, 会先写入其他实例尚未保存的修改。
     """
 
     def __init__(
@@ -27,6 +85,7 @@ class AstrBotConfig(dict):
         config_path: str = ASTRBOT_CONFIG_PATH,
         default_config: dict = DEFAULT_CONFIG,
         schema: dict = None,
+        save_delay: float = 0.5,
     ):
         super().__init__()
 
@@ -34,14 +93,25 @@ class AstrBotConfig(dict):
         object.__setattr__(self, "config_path", config_path)
         object.__setattr__(self, "default_config", default_config)
         object.__setattr__(self, "schema", schema)
+        object.__setattr__(self, "save_delay", save_delay)
+        object.__setattr__(self, "_listeners", [])
+        object.__setattr__(self, "_write_lock", threading.Lock())
+        object.__setattr__(self, "_pending_text", None)
+        object.__setattr__(self, "_dirty", False)
+        object.__setattr__(self, "_save_handle", None)
+        object.__setattr__(self, "_save_task", None)
 
         if schema:
             default_config = self._config_schema_to_default_config(schema)
 
+        # 如重载插件时, 之前的实例可能还有未写入的修改
+        _flush_pending(config_path)
+
         if not self.check_exist():
             """不存在时载入默认配置"""
-            with open(config_path, "w", encoding="utf-8-sig") as f:
-                json.dump(default_config, f, indent=4, ensure_ascii=False)
+            _atomic_write(
+                config_path, json.dumps(default_config, indent=4, ensure_ascii=False)
+            )
 
         with open(config_path, "r", encoding="utf-8-sig") as f:
             conf_str = f.read()
@@ -56,6 +126,7 @@ class AstrBotConfig(dict):
             self.save_config()
 
         self.update(conf)
+        object.__setattr__(self, "_snapshot", self._copy())
 
     def _config_schema_to_default_config(self, schema: dict) -> dict:
         """将 Schema 转换成 Config"""
@@ -103,14 +174,127 @@ class AstrBotConfig(dict):
         return has_new
 
     def save_config(self, replace_config: Dict = None):
-        """将配置写入文件
+        """将配置写入文件, 并通知订阅者变更的配置项
 
         如果传入 replace_config，则将配置替换为 replace_config
         """
         if replace_config:
             self.update(replace_config)
-        with open(self.config_path, "w", encoding="utf-8-sig") as f:
-            json.dump(self, f, indent=2, ensure_ascii=False)
+        self._notify_changes()
+
+        object.__setattr__(self, "_dirty", True)
+        _unsaved_configs[id(self)] = weakref.ref(self)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._save_handle is None:
+            # 短时间内的多次保存合并为一次写入
+            handle = loop.call_later(self.save_delay, self._start_save)
+            object.__setattr__(self, "_save_handle", handle)
+
+    def _copy(self) -> dict:
+        return json.loads(json.dumps(self))
+
+    def _notify_changes(self):
+        snapshot = getattr(self, "_snapshot", None)
+        if snapshot is None:
+            # 初始化中
+            return
+        current = self._copy()
+        changed = _diff_keys(snapshot, current)
+        object.__setattr__(self, "_snapshot", current)
+        if not changed:
+            return
+        logger.debug(f"配置 {self.config_path} 已变更: {sorted(changed)}")
+        for ref, keys in list(self._listeners):
+            listener = ref()
+            if listener is None:
+                self._listeners.remove((ref, keys))
+                continue
+            if not _matches(changed, keys):
+                continue
+            try:
+                ret = listener(changed)
+                if inspect.isawaitable(ret):
+                    asyncio.ensure_future(ret)
+            except Exception as e:
+                logger.error(f"处理配置变更时出现异常: {e}")
+
+    def subscribe(self, listener: ConfigListener, keys: Iterable[str] = None):
+        """订阅配置变更。save_config() 时, 如果 keys 中的配置项(含子项)发生变化, 调用 listener(变更的配置项路径)
+
+        绑定方法以弱引用保存, 对象被回收后自动取消订阅。
+
+        Args:
+            listener (ConfigListener): 回调函数, 可以是协程函数
+            keys (Iterable[str]): 关心的配置项路径, 如 ["platform_settings", "wake_prefix"]。为空时任何变化都会通知
+        """
+        if inspect.ismethod(listener):
+            ref = weakref.WeakMethod(listener)
+        else:
+            ref = lambda: listener  # noqa: E731
+        self._listeners.append((ref, set(keys) if keys else None))
+
+    def unsubscribe(self, listener: ConfigListener):
+        self._listeners[:] = [
+            (ref, keys)
+            for ref, keys in self._listeners
+            if ref() not in (None, listener)
+        ]
+
+    def _serialize(self):
+        object.__setattr__(self, "_dirty", False)
+        text = json.dumps(self, indent=2, ensure_ascii=False)
+        with self._write_lock:
+            object.__setattr__(self, "_pending_text", text)
+
+    def _write_pending(self):
+        # 取出与写入都在锁内完成, 后写入的总是更新的内容
+        with self._write_lock:
+            text = self._pending_text
+            if text is None:
+                return
+            _atomic_write(self.config_path, text)
+            object.__setattr__(self, "_pending_text", None)
+
+    async def _save_in_thread(self):
+        try:
+            await asyncio.to_thread(self._write_pending)
+        except Exception as e:
+            logger.error(f"保存配置 {self.config_path} 失败: {e}")
+            return
+        if not self._dirty and self._save_handle is None:
+            _unsaved_configs.pop(id(self), None)
+
+    def _start_save(self):
+        object.__setattr__(self, "_save_handle", None)
+        self._serialize()
+        task = asyncio.create_task(self._save_in_thread())
+        object.__setattr__(self, "_save_task", task)
+
+    def flush(self):
+        """立即写入尚未保存的配置"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            object.__setattr__(self, "_save_handle", None)
+        if self._dirty:
+            self._serialize()
+        self._write_pending()
+        _unsaved_configs.pop(id(self), None)
+
+    @staticmethod
+    def flush_all():
+        """写入所有尚未保存的配置, 在退出时调用"""
+        for ref in list(_unsaved_configs.values()):
+            config = ref()
+            if config is None:
+                continue
+            try:
+                config.flush()
+            except Exception as e:
+                logger.error(f"保存配置 {config.config_path} 失败: {e}")
 
     def __getattr__(self, item):
         try:
@@ -130,3 +314,6 @@ class AstrBotConfig(dict):
 
     def check_exist(self) -> bool:
         return os.path.exists(self.config_path)
+
+
+atexit.register(AstrBotConfig.flush_all)
@@ -39,6 +39,12 @@ DEFAULT_CONFIG = {
         "empty_mention_waiting": True,
         "friend_message_needs_wake_prefix": False,
         "ignore_bot_self_message": False,
+        "send_scheduler": {
+            "enable": True,
+            "merge_text": True,
+            "global_rate": 0,
+            "chat_rate": 0,
+        },
     },
     "provider": [],
     "provider_settings": {
@@ -54,6 +60,49 @@ DEFAULT_CONFIG = {
         "dequeue_context_length": 1,
         "streaming_response": False,
         "streaming_segmented": False,
+        "prompt_cache_friendly": False,
+        "tool_call_concurrency": 4,
+        "tool_call_timeout": 60,
+        "agent": {
+            "max_steps": 5,
+            "token_budget": 0,
+            "compact_length": 500,
+            "stream_status": True,
+        },
+        "tool_selection": {
+            "enable": False,
+            "method": "bm25",
+            "top_k": 8,
+            "pinned_tools": [],
+            "context_turns": 1,
+            "embedding_api_key": "",
+            "embedding_api_base": "",
+            "embedding_model": "",
+        },
+        "provider_fallback": {
+            "enable": False,
+            "chain": [],
+            "hedge": False,
+            "hedge_min_delay": 2.0,
+            "circuit_breaker_threshold": 3,
+            "circuit_breaker_cooldown": 30,
+        },
+        "key_pool": {
+            "max_concurrency_per_key": 0,
+            "rate_limit_cooldown": 60,
+        },
+        "response_cache": {
+            "enable": False,
+            "ttl": 3600,
+            "max_entries": 1000,
+            "context_turns": 0,
+            "share_across_sessions": False,
+            "semantic_enable": False,
+            "semantic_threshold": 0.95,
+            "embedding_api_key": "",
+            "embedding_api_base": "",
+            "embedding_model": "",
+        },
     },
     "provider_stt_settings": {
         "enable": False,
@@ -67,9 +116,13 @@ DEFAULT_CONFIG = {
     "provider_ltm_settings": {
         "group_icl_enable": False,
         "group_message_max_cnt": 300,
+        "group_message_max_total_cnt": 30000,
+        "group_message_persist": True,
         "image_caption": False,
         "image_caption_provider_id": "",
         "image_caption_prompt": "Please describe the image using Chinese.",
+        "image_caption_batch_size": 4,
+        "image_caption_per_minute": 10,
         "active_reply": {
             "enable": False,
             "method": "possibility_reply",
@@ -99,8 +152,15 @@ DEFAULT_CONFIG = {
     "platform": [],
     "wake_prefix": ["/"],
     "log_level": "INFO",
+    "log_file": {
+        "enable": False,
+        "path": "data/logs/astrbot.log",
+        "max_mb": 20,
+        "backup_count": 3,
+    },
     "pip_install_arg": "",
     "pypi_index_url": "https://mirrors.aliyun.com/pypi/simple/",
+    "plugin_concurrent_initialize": False,
     "knowledge_db": {},
     "persona": [],
     "timezone": "",
@@ -140,6 +200,7 @@ CONFIG_METADATA_2 = {
                         "enable": False,
                         "ws_reverse_host": "0.0.0.0",
                         "ws_reverse_port": 6199,
+                        "onebot_file_mode": "base64",
                     },
                     "gewechat(微信)": {
                         "id": "gwchat",
@@ -248,6 +309,12 @@ CONFIG_METADATA_2 = {
                         "type": "int",
                         "hint": "aiocqhttp 适配器的反向 Websocket 端口。",
                     },
+                    "onebot_file_mode": {
+                        "description": "图片、语音发送方式",
+                        "type": "string",
+                        "options": ["base64", "path"],
+                        "hint": "base64: 将文件编码后内联发送。path: 直接发送本地文件路径或网络 URL, 由 OneBot 实现(NapCat 等)自行读取, 可以减少大量图片时的编码与传输开销, 要求 OneBot 实现与 AstrBot 在同一台机器上, 或已映射相同的路径(Docker)。",
+                    },
                     "lark_bot_name": {
                         "description": "飞书机器人的名字",
                         "type": "string",
@@ -303,6 +370,32 @@ CONFIG_METADATA_2 = {
                         "type": "bool",
                         "hint": "某些平台如 gewechat 会将自身账号在其他 APP 端发送的消息也当做消息事件下发导致给自己发消息时唤醒机器人",
                     },
+                    "send_scheduler": {
+                        "description": "出站消息调度",
+                        "type": "object",
+                        "items": {
+                            "enable": {
+                                "description": "启用出站消息调度",
+                                "type": "bool",
+                                "hint": "启用后，发送消息时按平台限制全局和每个会话的发送速率，平台限流时自动等待重试，并在多个会话之间轮流发送。",
+                            },
+                            "merge_text": {
+                                "description": "合并排队中的文本",
+                                "type": "bool",
+                                "hint": "限速期间同一条回复中排队的多段文本会被合并为一条消息发送。",
+                            },
+                            "global_rate": {
+                                "description": "全局发送速率(条/秒)",
+                                "type": "float",
+                                "hint": "每个平台每秒最多发送的消息数。0 表示使用该平台的默认值。",
+                            },
+                            "chat_rate": {
+                                "description": "单会话发送速率(条/秒)",
+                                "type": "float",
+                                "hint": "每个会话每秒最多发送的消息数。0 表示使用该平台的默认值。",
+                            },
+                        },
+                    },
                     "segmented_reply": {
                         "description": "分段回复",
                         "type": "object",
@@ -463,6 +556,7 @@ CONFIG_METADATA_2 = {
                         "key": [],
                         "api_base": "https://api.openai.com/v1",
                         "timeout": 120,
+                        "prompt_cache_key": True,
                         "model_config": {
                             "model": "gpt-4o-mini",
                         },
@@ -857,6 +951,11 @@ CONFIG_METADATA_2 = {
                         "type": "int",
                         "hint": "超时时间，单位为秒。",
                     },
+                    "prompt_cache_key": {
+                        "description": "附带 prompt_cache_key",
+                        "type": "bool",
+                        "hint": "提示词缓存友好模式下，为请求附带基于会话的 prompt_cache_key 参数，使同一会话的请求命中同一缓存。仅 OpenAI 官方等支持该参数的服务可以开启，不支持的服务可能会拒绝请求。",
+                    },
                     "openai-tts-voice": {
                         "description": "voice",
                         "type": "string",
@@ -1036,13 +1135,204 @@ CONFIG_METADATA_2 = {
                     "streaming_response": {
                         "description": "启用流式回复",
                         "type": "bool",
-                        "hint": "启用后，将会流式输出 LLM 的响应。目前仅支持 OpenAI API提供商 以及 Telegram、QQ Official 私聊 两个平台",
+                        "hint": "启用后，将会流式输出 LLM 的响应。目前支持 OpenAI API、Anthropic、Gemini、Dify 提供商 以及 Telegram、QQ Official 私聊 两个平台",
                     },
                     "streaming_segmented": {
                         "description": "不支持流式回复的平台分段输出",
                         "type": "bool",
                         "hint": "启用后，若平台不支持流式回复，会分段输出。目前仅支持 aiocqhttp 和 gewechat 两个平台，不支持或无需使用流式分段输出的平台会静默忽略此选项",
                     },
+                    "prompt_cache_friendly": {
+                        "description": "提示词缓存友好模式",
+                        "type": "bool",
+                        "hint": "启用后，人格等稳定内容放在 System Prompt 中，当前时间、引用消息、群聊记录等每轮变化的内容放在本轮用户消息末尾且不写入对话历史，使请求前缀在多轮对话间保持不变，以命中提供商的提示词缓存。同时会为 Anthropic 请求添加 cache_control 断点，为开启了 prompt_cache_key 的 OpenAI 提供商附带该参数。缓存命中的 Token 数可在统计页查看",
+                    },
+                    "tool_call_concurrency": {
+                        "description": "函数工具并发数",
+                        "type": "int",
+                        "hint": "LLM 一次返回多个函数调用时，最多同时执行多少个。设置为 1 则逐个执行。会发送消息的工具始终逐个执行",
+                    },
+                    "tool_call_timeout": {
+                        "description": "函数工具超时时间(秒)",
+                        "type": "int",
+                        "hint": "单个函数工具调用的超时时间，超时后将以错误信息作为该工具的结果。0 为不限制。使用 yield 发送消息的工具不受此限制",
+                    },
+                    "agent": {
+                        "description": "多步工具调用",
+                        "type": "object",
+                        "items": {
+                            "max_steps": {
+                                "description": "最大工具调用轮数",
+                                "type": "int",
+                                "hint": "一次对话中 LLM 最多连续调用多少轮函数工具，达到上限后将要求 LLM 直接给出回复。设置为 1 则与旧版行为一致",
+                            },
+                            "token_budget": {
+                                "description": "Token 预算",
+                                "type": "int",
+                                "hint": "一次对话中多轮工具调用累计消耗的 Token 上限，超出后不再提供函数工具。0 为不限制",
+                            },
+                            "compact_length": {
+                                "description": "旧工具结果保留长度(字符)",
+                                "type": "int",
+                                "hint": "除最新一轮外，较早轮次的工具调用结果会被截断到此长度，以减小上下文。0 为不截断",
+                            },
+                            "stream_status": {
+                                "description": "流式输出工具调用状态",
+                                "type": "bool",
+                                "hint": "启用流式回复时，在调用函数工具的过程中输出当前正在调用的工具",
+                            },
+                        },
+                    },
+                    "tool_selection": {
+                        "description": "函数工具筛选",
+                        "type": "object",
+                        "items": {
+                            "enable": {
+                                "description": "启用函数工具筛选",
+                                "type": "bool",
+                                "hint": "启用后，每次请求只发送与当前提问最相关的若干个函数工具，以减少工具描述占用的 Token。适合接入了大量 MCP 工具的情况",
+                            },
+                            "method": {
+                                "description": "检索方式",
+                                "type": "string",
+                                "options": ["bm25", "embedding"],
+                                "hint": "bm25 为本地关键词检索；embedding 使用下方配置的 OpenAI 兼容 Embedding 服务计算相似度",
+                            },
+                            "top_k": {
+                                "description": "发送的工具数量",
+                                "type": "int",
+                                "hint": "除固定工具外，每次请求最多发送的工具数量。与提问完全无关的工具不会被发送",
+                            },
+                            "pinned_tools": {
+                                "description": "固定工具",
+                                "type": "list",
+                                "items": {"type": "string"},
+                                "hint": "填写工具名称，这些工具始终会被发送",
+                            },
+                            "context_turns": {
+                                "description": "参与检索的历史消息数",
+                                "type": "int",
+                                "hint": "除当前提问外，最近几条用户消息也会参与检索",
+                            },
+                            "embedding_api_key": {
+                                "description": "Embedding API Key",
+                                "type": "string",
+                            },
+                            "embedding_api_base": {
+                                "description": "Embedding API Base URL",
+                                "type": "string",
+                            },
+                            "embedding_model": {
+                                "description": "Embedding 模型",
+                                "type": "string",
+                            },
+                        },
+                    },
+                    "provider_fallback": {
+                        "description": "提供商故障转移",
+                        "type": "object",
+                        "items": {
+                            "enable": {
+                                "description": "启用故障转移",
+                                "type": "bool",
+                                "hint": "启用后，当前提供商请求失败或者被熔断时，会按顺序尝试其他提供商。",
+                            },
+                            "chain": {
+                                "description": "备用提供商 ID 列表",
+                                "type": "list",
+                                "items": {"type": "string"},
+                                "hint": "按顺序填写备用提供商 ID。不填写时，会按健康度(错误率与延迟)自动排序所有已载入的提供商。",
+                            },
+                            "hedge": {
+                                "description": "启用对冲请求",
+                                "type": "bool",
+                                "hint": "启用后，当前提供商超过其 p95 延迟仍未响应时，会同时向下一个提供商发出请求，采用先成功的结果。会增加 token 开销。仅对非流式请求生效。",
+                            },
+                            "hedge_min_delay": {
+                                "description": "对冲请求最小等待时间(秒)",
+                                "type": "float",
+                                "hint": "发出对冲请求前至少等待的时间。样本不足时直接使用此值。",
+                            },
+                            "circuit_breaker_threshold": {
+                                "description": "熔断阈值",
+                                "type": "int",
+                                "hint": "提供商连续失败达到此次数后将被熔断，熔断期间请求直接转移到备用提供商。",
+                            },
+                            "circuit_breaker_cooldown": {
+                                "description": "熔断冷却时间(秒)",
+                                "type": "int",
+                                "hint": "熔断后经过此时间，会放行一个试探请求，成功则恢复。",
+                            },
+                        },
+                    },
+                    "key_pool": {
+                        "description": "API Key 池",
+                        "type": "object",
+                        "items": {
+                            "max_concurrency_per_key": {
+                                "description": "单个 Key 最大并发请求数",
+                                "type": "int",
+                                "hint": "同一个 Key 同时进行的请求数上限，达到上限时等待其他请求完成或使用其他 Key。0 表示不限制。对 OpenAI、Gemini、Anthropic 提供商生效。",
+                            },
+                            "rate_limit_cooldown": {
+                                "description": "速率限制冷却时间(秒)",
+                                "type": "int",
+                                "hint": "Key 触发速率限制(429)后暂停使用的时间。如果服务端返回了重置时间，将优先使用服务端的值。",
+                            },
+                        },
+                    },
+                    "response_cache": {
+                        "description": "LLM 响应缓存",
+                        "type": "object",
+                        "items": {
+                            "enable": {
+                                "description": "启用响应缓存",
+                                "type": "bool",
+                                "hint": "启用后，相同的提问(规范化后的 Prompt、系统提示词、人格与模型均一致)会直接返回缓存的回复，不再请求 LLM。工具调用轮次和带图片的请求不会使用缓存。可使用 /llmcache 指令为单个会话关闭。",
+                            },
+                            "ttl": {
+                                "description": "缓存有效期(秒)",
+                                "type": "int",
+                            },
+                            "max_entries": {
+                                "description": "最大缓存条数",
+                                "type": "int",
+                            },
+                            "context_turns": {
+                                "description": "参与匹配的上下文轮数",
+                                "type": "int",
+                                "hint": "为 0 时只有不带对话上下文的请求(如新对话的第一条消息)使用缓存；大于 0 时，带上下文的请求也会使用缓存，但最近几轮对话需要一致才会命中。",
+                            },
+                            "share_across_sessions": {
+                                "description": "跨会话共享缓存",
+                                "type": "bool",
+                                "hint": "默认每个会话的缓存互相独立。开启后，不同会话的相同提问可以命中同一条缓存，适合 FAQ 类问答。",
+                            },
+                            "semantic_enable": {
+                                "description": "启用近似匹配",
+                                "type": "bool",
+                                "hint": "启用后，提问的嵌入向量相似度超过阈值也视为命中。需要配置下方的 Embedding 服务，未配置时不生效。",
+                            },
+                            "semantic_threshold": {
+                                "description": "近似匹配相似度阈值",
+                                "type": "float",
+                                "hint": "0~1，越大越严格。",
+                            },
+                            "embedding_api_key": {
+                                "description": "Embedding API Key",
+                                "type": "string",
+                                "hint": "OpenAI 兼容的 Embedding 服务，近似匹配需要。",
+                            },
+                            "embedding_api_base": {
+                                "description": "Embedding API Base URL",
+                                "type": "string",
+                            },
+                            "embedding_model": {
+                                "description": "Embedding 模型",
+                                "type": "string",
+                            },
+                        },
+                    },
                 },
             },
             "persona": {
@@ -1141,6 +1431,16 @@ CONFIG_METADATA_2 = {
                         "obvious_hint": True,
                         "hint": "群聊消息最大数量。超过此数量后，会自动清除旧消息。",
                     },
+                    "group_message_max_total_cnt": {
+                        "description": "内存中群聊消息总数上限",
+                        "type": "int",
+                        "hint": "所有群聊在内存中保留的消息总数上限。超过后，最久未活跃的群聊记录会被移出内存，需要时再从数据库中加载。<= 0 表示不限制。",
+                    },
+                    "group_message_persist": {
+                        "description": "持久化群聊记录",
+                        "type": "bool",
+                        "hint": "启用后，群聊记录会在后台批量写入 data/long_term_memory.db，重启后不会丢失。",
+                    },
                     "image_caption": {
                         "description": "群聊图像转述(需模型支持)",
                         "type": "bool",
@@ -1157,6 +1457,16 @@ CONFIG_METADATA_2 = {
                         "description": "图像转述提示词",
                         "type": "string",
                     },
+                    "image_caption_batch_size": {
+                        "description": "图像转述批大小",
+                        "type": "int",
+                        "hint": "图像转述在后台进行，同一张图片(按感知哈希判断)只转述一次。多张待转述的图片会合并为一次多图请求，此项为一次请求中的最大图片数。",
+                    },
+                    "image_caption_per_minute": {
+                        "description": "每分钟最多转述的图片数",
+                        "type": "int",
+                        "hint": "超出后，图片会在队列中等待。<= 0 表示不限制。",
+                    },
                     "active_reply": {
                         "description": "主动回复",
                         "type": "object",
@@ -1241,6 +1551,30 @@ CONFIG_METADATA_2 = {
                 "hint": "控制台输出日志的级别。",
                 "options": ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
             },
+            "log_file": {
+                "description": "日志文件",
+                "type": "object",
+                "items": {
+                    "enable": {
+                        "description": "启用日志文件",
+                        "type": "bool",
+                        "hint": "启用后，日志会同时写入文件。文件在后台线程中写入，不会阻塞消息处理。重启后生效。",
+                    },
+                    "path": {
+                        "description": "日志文件路径",
+                        "type": "string",
+                    },
+                    "max_mb": {
+                        "description": "单个日志文件大小上限(MB)",
+                        "type": "int",
+                        "hint": "超过后会轮转为新文件。",
+                    },
+                    "backup_count": {
+                        "description": "保留的历史日志文件数量",
+                        "type": "int",
+                    },
+                },
+            },
             "t2i_strategy": {
                 "description": "文本转图像渲染源",
                 "type": "string",
@@ -1262,6 +1596,11 @@ CONFIG_METADATA_2 = {
                 "type": "string",
                 "hint": "安装 Python 依赖时请求的 PyPI 软件仓库地址。默认为 https://mirrors.aliyun.com/pypi/simple/",
             },
+            "plugin_concurrent_initialize": {
+                "description": "并发初始化插件",
+                "type": "bool",
+                "hint": "启用后，载入插件时各插件的 initialize() 并发执行，可以缩短启动时间。依赖其他插件先完成初始化的插件可能会出错，默认按顺序执行。",
+            },
         },
     },
 }
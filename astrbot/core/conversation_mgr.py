@@ -1,5 +1,5 @@
 """
-AstrBot 会话-对话管理器, 维护两个本地存储, 其中一个是 json 格式的shared_preferences, 另外一个是数据库
+AstrBot 会话-对话管理器, 维护两个本地存储, 其中一个是 shared_preferences, 另外一个是数据库
 
 在 AstrBot 中, 会话和对话是独立的, 会话用于标记对话窗口, 例如群聊"123456789"可以建立一个会话,
 在一个会话中可以建立多个对话, 并且支持对话的切换和删除
@@ -7,36 +7,49 @@ AstrBot 会话-对话管理器, 维护两个本地存储, 其中一个是 json 
 
 import uuid
 import json
-import asyncio
 from astrbot.core import sp
 from typing import Dict, List
 from astrbot.core.db import BaseDatabase
 from astrbot.core.db.po import Conversation
 
+SESSION_CONVERSATION_PREFIX = "session_conversation:"
+
 
 class ConversationManager:
     """负责管理会话与 LLM 的对话，某个会话当前正在用哪个对话。"""
 
     def __init__(self, db_helper: BaseDatabase):
         # session_conversations 字典记录会话ID-对话ID 映射关系
-        self.session_conversations: Dict[str, str] = sp.get("session_conversation", {})
+        # 每个会话单独保存为一个键, 切换对话时只写入这个会话
+        self.session_conversations: Dict[str, str] = sp.get_by_prefix(
+            SESSION_CONVERSATION_PREFIX
+        )
+        self._migrate_session_conversations()
         self.db = db_helper
-        self.save_interval = 60  # 每 60 秒保存一次
-        self._start_periodic_save()
-
-    def _start_periodic_save(self):
-        """启动定时保存任务"""
-        asyncio.create_task(self._periodic_save())
 
-    async def _periodic_save(self):
-        """定时保存会话对话映射关系到存储中"""
-        while True:
-            await asyncio.sleep(self.save_interval)
-            self._save_to_storage()
-
-    def _save_to_storage(self):
+    def _migrate_session_conversations(self):
+        """旧版本将所有会话的映射保存在 session_conversation 一个键中"""
+        legacy: Dict[str, str] = sp.get("session_conversation")
+        if legacy is None:
+            return
+        migrated = {
+            umo: cid
+            for umo, cid in legacy.items()
+            if umo not in self.session_conversations
+        }
+        self.session_conversations.update(migrated)
+        sp.put_many(
+            {SESSION_CONVERSATION_PREFIX + umo: cid for umo, cid in migrated.items()}
+        )
+        sp.remove("session_conversation")
+
+    def _save_session(self, unified_msg_origin: str):
         """保存会话对话映射关系到存储中"""
-        sp.put("session_conversation", self.session_conversations)
+        conversation_id = self.session_conversations.get(unified_msg_origin)
+        if conversation_id is None:
+            sp.remove(SESSION_CONVERSATION_PREFIX + unified_msg_origin)
+        else:
+            sp.put(SESSION_CONVERSATION_PREFIX + unified_msg_origin, conversation_id)
 
     async def new_conversation(self, unified_msg_origin: str) -> str:
         """新建对话，并将当前会话的对话转移到新对话
@@ -49,7 +62,7 @@ class ConversationManager:
         conversation_id = str(uuid.uuid4())
         self.db.new_conversation(user_id=unified_msg_origin, cid=conversation_id)
         self.session_conversations[unified_msg_origin] = conversation_id
-        sp.put("session_conversation", self.session_conversations)
+        self._save_session(unified_msg_origin)
         return conversation_id
 
     async def switch_conversation(self, unified_msg_origin: str, conversation_id: str):
@@ -60,7 +73,7 @@ class ConversationManager:
             conversation_id (str): 对话 ID, 是 uuid 格式的字符串
         """
         self.session_conversations[unified_msg_origin] = conversation_id
-        sp.put("session_conversation", self.session_conversations)
+        self._save_session(unified_msg_origin)
 
     async def delete_conversation(
         self, unified_msg_origin: str, conversation_id: str = None
@@ -75,7 +88,7 @@ class ConversationManager:
         if conversation_id:
             self.db.delete_conversation(user_id=unified_msg_origin, cid=conversation_id)
             del self.session_conversations[unified_msg_origin]
-            sp.put("session_conversation", self.session_conversations)
+            self._save_session(unified_msg_origin)
 
     async def get_curr_conversation_id(self, unified_msg_origin: str) -> str:
         """获取会话当前的对话 ID
@@ -16,6 +16,7 @@ import threading
 import os
 from .event_bus import EventBus
 from . import astrbot_config
+from astrbot.core.config import AstrBotConfig
 from asyncio import Queue
 from typing import List
 from astrbot.core.pipeline.scheduler import PipelineScheduler, PipelineContext
@@ -23,15 +24,16 @@ from astrbot.core.star import PluginManager
 from astrbot.core.platform.manager import PlatformManager
 from astrbot.core.star.context import Context
 from astrbot.core.provider.manager import ProviderManager
-from astrbot.core import LogBroker
+from astrbot.core import LogBroker, LogManager
 from astrbot.core.db import BaseDatabase
 from astrbot.core.updator import AstrBotUpdator
-from astrbot.core import logger
+from astrbot.core import logger, sp
 from astrbot.core.config.default import VERSION
 from astrbot.core.rag.knowledge_db_mgr import KnowledgeDBManager
 from astrbot.core.conversation_mgr import ConversationManager
 from astrbot.core.star.star_handler import star_handlers_registry, EventType
 from astrbot.core.star.star_handler import star_map
+from astrbot.core.utils.media_worker import shutdown_media_pool
 
 
 class AstrBotCoreLifecycle:
@@ -63,6 +65,14 @@ class AstrBotCoreLifecycle:
             logger.setLevel("DEBUG")  # 测试模式下设置日志级别为 DEBUG
         else:
             logger.setLevel(self.astrbot_config["log_level"])  # 设置日志级别
+        log_file_cfg = self.astrbot_config.get("log_file", {})
+        if log_file_cfg.get("enable", False):
+            LogManager.set_file_handler(
+                logger,
+                log_file_cfg.get("path", "data/logs/astrbot.log"),
+                max_mb=log_file_cfg.get("max_mb", 20),
+                backup_count=log_file_cfg.get("backup_count", 3),
+            )
 
         # 初始化事件队列
         self.event_queue = Queue()
@@ -200,6 +210,8 @@ class AstrBotCoreLifecycle:
 
         await self.provider_manager.terminate()
         await self.platform_manager.terminate()
+        shutdown_media_pool()
+        await self._flush_storage()
         self.dashboard_shutdown_event.set()
 
         # 再次遍历curr_tasks等待每个任务真正结束
@@ -215,11 +227,18 @@ class AstrBotCoreLifecycle:
         """重启 AstrBot 核心生命周期管理类, 终止各个管理器并重新加载平台实例"""
         await self.provider_manager.terminate()
         await self.platform_manager.terminate()
+        # 重启使用 os.execl, 不会执行 atexit 中的保存
+        await self._flush_storage()
         self.dashboard_shutdown_event.set()
         threading.Thread(
             target=self.astrbot_updator._reboot, name="restart", daemon=True
         ).start()
 
+    async def _flush_storage(self):
+        """写入尚未保存的配置与偏好设置"""
+        AstrBotConfig.flush_all()
+        await sp.aflush()
+
     def load_platform(self) -> List[asyncio.Task]:
         """加载平台实例并返回所有平台实例的异步任务列表"""
         tasks = []
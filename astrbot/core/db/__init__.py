@@ -84,6 +84,11 @@ class BaseDatabase(abc.ABC):
         """通过 url 或 path 获取 ATRI 视觉数据"""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_atri_vision_data_by_id(self, id: str) -> ATRIVision:
+        """通过 id 获取 ATRI 视觉数据"""
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_conversation_by_user_id(self, user_id: str, cid: str) -> Conversation:
         """通过 user_id 和 cid 获取 Conversation"""
@@ -389,6 +389,25 @@ class SQLiteDatabase(BaseDatabase):
             return ATRIVision(*res)
         return None
 
+    def get_atri_vision_data_by_id(self, id: str) -> ATRIVision:
+        try:
+            c = self.conn.cursor()
+        except sqlite3.ProgrammingError:
+            c = self._get_conn(self.db_path).cursor()
+
+        c.execute(
+            """
+            SELECT * FROM atri_vision WHERE id = ?
+            """,
+            (id,),
+        )
+
+        res = c.fetchone()
+        c.close()
+        if res:
+            return ATRIVision(*res)
+        return None
+
     def get_all_conversations(
         self, page: int = 1, page_size: int = 20
     ) -> Tuple[List[Dict[str, Any]], int]:
@@ -36,6 +36,7 @@ CREATE TABLE IF NOT EXISTS atri_vision(
     sender_nickname VARCHAR(32),
     timestamp INTEGER
 );
+CREATE INDEX IF NOT EXISTS idx_atri_vision_id ON atri_vision(id);
 
 CREATE TABLE IF NOT EXISTS webchat_conversation(
     user_id TEXT, -- 会话 id
@@ -8,30 +8,44 @@ const:
 class:
     LogBroker: 日志代理类, 用于缓存和分发日志消息
     LogQueueHandler: 日志处理器, 用于将日志消息发送到 LogBroker
+    AsyncLogHandler: 前置的队列处理器, 只将日志记录放入队列, 由后台线程输出
     LogManager: 日志管理器, 用于创建和配置日志记录器
+    LazyRepr: 惰性、限制长度的对象表示, 只有日志真正输出时才会格式化
+    LogSampler: 日志采样器, 用于高频日志
 
 function:
     is_plugin_path: 检查文件路径是否来自插件目录
     get_short_level_name: 将日志级别名称转换为四个字母的缩写
+    lazy_repr: 创建 LazyRepr
+    lazy_fields: 惰性格式化的结构化字段, 输出为 key=value 形式
 
 工作流程:
 1. 通过 LogManager.GetLogger() 获取日志器, 配置了控制台输出和多个格式化过滤器
-2. 通过 set_queue_handler() 设置日志处理器, 将日志消息发送到 LogBroker
-3. logBroker 维护一个订阅者列表, 负责将日志分发给所有订阅者
+2. 通过 set_queue_handler() 设置日志处理器。此后日志器只将日志记录放入队列, 由后台线程格式化并写入控制台、LogBroker 和可选的文件
+3. logBroker 维护一个订阅者列表, 负责将日志分发给所有订阅者。分发通过订阅者所在的事件循环完成, 可以在任意线程中调用
 4. 订阅者可以使用 register() 方法注册到 LogBroker, 订阅日志流
 """
 
+import atexit
 import logging
+import logging.handlers
 import colorlog
 import asyncio
 import os
+import queue
+import reprlib
 import sys
+import threading
 from collections import deque
 from asyncio import Queue
-from typing import List
+from typing import Any, Dict, List, Optional
 
 # 日志缓存大小
 CACHED_SIZE = 200
+# 不带颜色的日志格式, 用于日志文件
+PLAIN_LOG_FORMAT = "[%(asctime)s] [%(short_levelname)s] %(plugin_tag)s[%(filename)s:%(lineno)d]: %(message)s"
+# 惰性日志中单个对象的最大输出长度
+REPR_MAX_LEN = 2000
 # 日志颜色配置
 log_color_config = {
     "DEBUG": "green",
@@ -79,6 +93,88 @@ def get_short_level_name(level_name):
     return level_map.get(level_name, level_name[:4].upper())
 
 
+_repr = reprlib.Repr()
+_repr.maxstring = REPR_MAX_LEN
+_repr.maxother = REPR_MAX_LEN
+_repr.maxlist = _repr.maxdict = _repr.maxtuple = _repr.maxset = 20
+_repr.maxlevel = 4
+
+
+class LazyRepr:
+    """惰性、限制长度的对象表示
+
+    作为 %-style 日志参数使用时, 只有这条日志真正需要输出时才会格式化对象, 例如:
+    `logger.debug("提供商请求 Payload: %s", lazy_repr(req))`
+
+    容器(dict/list 等)使用 reprlib 只遍历前若干个元素, 其他对象使用 str()。结果超过 max_len 时截断。
+    """
+
+    __slots__ = ("obj", "max_len")
+
+    def __init__(self, obj: Any, max_len: int = REPR_MAX_LEN):
+        self.obj = obj
+        self.max_len = max_len
+
+    def __str__(self) -> str:
+        obj = self.obj
+        if isinstance(obj, (dict, list, tuple, set, frozenset, deque)):
+            text = _repr.repr(obj)
+        else:
+            text = str(obj)
+        if len(text) > self.max_len:
+            return f"{text[: self.max_len]}...(省略 {len(text) - self.max_len} 字符)"
+        return text
+
+    __repr__ = __str__
+
+
+def lazy_repr(obj: Any, max_len: int = REPR_MAX_LEN) -> LazyRepr:
+    return LazyRepr(obj, max_len)
+
+
+class _LazyFields:
+    __slots__ = ("fields", "max_len")
+
+    def __init__(self, fields: dict, max_len: int):
+        self.fields = fields
+        self.max_len = max_len
+
+    def __str__(self) -> str:
+        return " ".join(
+            f"{k}={LazyRepr(v, self.max_len)}" for k, v in self.fields.items()
+        )
+
+
+def lazy_fields(max_len: int = REPR_MAX_LEN, **fields) -> _LazyFields:
+    """结构化的日志字段, 惰性格式化为 `key=value key2=value2`, 每个值都限制长度
+
+    `logger.debug("LLM 响应 %s", lazy_fields(provider=pid, completion=completion))`
+    """
+    return _LazyFields(fields, max_len)
+
+
+class LogSampler:
+    """日志采样器, 用于流式分片等高频日志。第一次调用以及之后每 every 次调用返回一次 True
+
+    ```
+    sampler = LogSampler(20)
+    if sampler.sample():
+        logger.debug("...")
+    ```
+    """
+
+    __slots__ = ("every", "_count")
+
+    def __init__(self, every: int):
+        self.every = max(1, every)
+        self._count = 0
+
+    def sample(self) -> bool:
+        hit = self._count % self.every == 0
+        self._count += 1
+        return hit
+
+
 class LogBroker:
     """日志代理类, 用于缓存和分发日志消息
 
@@ -88,17 +184,24 @@ class LogBroker:
     def __init__(self):
         self.log_cache = deque(maxlen=CACHED_SIZE)  # 环形缓冲区, 保存最近的日志
         self.subscribers: List[Queue] = []  # 订阅者列表
+        self._loops: Dict[int, asyncio.AbstractEventLoop] = {}
+        """订阅者队列所在的事件循环"""
+        self._pending: Dict[asyncio.AbstractEventLoop, list] = {}
+        """等待投递到各个事件循环的日志"""
+        self._lock = threading.Lock()
 
     def register(self) -> Queue:
-        """注册新的订阅者, 并给每个订阅者返回一个带有日志缓存的队列
+        """注册新的订阅者, 并给每个订阅者返回一个带有日志缓存的队列。需要在事件循环中调用
 
         Returns:
             Queue: 订阅者的队列, 可用于接收日志消息
         """
         q = Queue(maxsize=CACHED_SIZE + 10)
-        for log in self.log_cache:
-            q.put_nowait(log)
-        self.subscribers.append(q)
+        with self._lock:
+            for log in self.log_cache:
+                q.put_nowait(log)
+            self.subscribers.append(q)
+            self._loops[id(q)] = asyncio.get_running_loop()
         return q
 
     def unregister(self, q: Queue):
@@ -107,21 +210,47 @@ class LogBroker:
         Args:
             q (Queue): 需要取消订阅的队列
         """
-        self.subscribers.remove(q)
+        with self._lock:
+            self.subscribers.remove(q)
+            self._loops.pop(id(q), None)
 
     def publish(self, log_entry: dict):
         """发布新日志到所有订阅者, 使用非阻塞方式投递, 避免一个订阅者阻塞整个系统
 
+        可以在任意线程中调用。同一个事件循环的日志会合并为一次回调投递。
+
         Args:
             log_entry (dict): 日志消息, 包含日志级别和日志内容.
                 example: {"level": "INFO", "data": "This is a log message.", "time": "2023-10-01 12:00:00"}
         """
-        self.log_cache.append(log_entry)
-        for q in self.subscribers:
+        with self._lock:
+            self.log_cache.append(log_entry)
+            loops = set(self._loops.values())
+            to_schedule = []
+            for loop in loops:
+                pending = self._pending.setdefault(loop, [])
+                if not pending:
+                    to_schedule.append(loop)
+                pending.append(log_entry)
+        for loop in to_schedule:
             try:
-                q.put_nowait(log_entry)
-            except asyncio.QueueFull:
-                pass
+                loop.call_soon_threadsafe(self._flush, loop)
+            except RuntimeError:
+                # 事件循环已经关闭
+                with self._lock:
+                    self._pending.pop(loop, None)
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        """在订阅者所在的事件循环中执行, 将等待中的日志放入订阅者队列"""
+        with self._lock:
+            entries = self._pending.pop(loop, [])
+            queues = [q for q in self.subscribers if self._loops.get(id(q)) is loop]
+        for q in queues:
+            for entry in entries:
+                try:
+                    q.put_nowait(entry)
+                except asyncio.QueueFull:
+                    break
 
 
 class LogQueueHandler(logging.Handler):
@@ -151,12 +280,25 @@ class LogQueueHandler(logging.Handler):
         )
 
 
+class AsyncLogHandler(logging.handlers.QueueHandler):
+    """只将日志记录放入队列的处理器, 实际的格式化与输出由 QueueListener 的后台线程完成"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 在调用线程中完成消息插值, 避免参数对象之后被修改；颜色格式化、异常堆栈和 I/O 都留给后台线程
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
 class LogManager:
     """日志管理器, 用于创建和配置日志记录器
 
     提供了获取默认日志记录器logger和设置队列处理器的方法
     """
 
+    _listeners: Dict[str, logging.handlers.QueueListener] = {}
+    """各个日志器的后台输出线程"""
+
     @classmethod
     def GetLogger(cls, log_name: str = "default"):
         """获取指定名称的日志记录器logger
@@ -230,6 +372,8 @@ class LogManager:
     def set_queue_handler(cls, logger: logging.Logger, log_broker: LogBroker):
         """设置队列处理器, 用于将日志消息发送到 LogBroker
 
+        此后日志器上原有的处理器(控制台输出)和 LogBroker 都改由后台线程调用, 记录日志的线程只需要将记录放入队列。
+
         Args:
             logger (logging.Logger): 日志记录器
             log_broker (LogBroker): 日志代理类, 用于缓存和分发日志消息
@@ -240,9 +384,65 @@ class LogManager:
             handler.setFormatter(logger.handlers[0].formatter)
         else:
             # 为队列处理器设置相同格式的formatter
-            handler.setFormatter(
-                logging.Formatter(
-                    "[%(asctime)s] [%(short_levelname)s] %(plugin_tag)s[%(filename)s:%(lineno)d]: %(message)s"
-                )
-            )
-        logger.addHandler(handler)
+            handler.setFormatter(logging.Formatter(PLAIN_LOG_FORMAT))
+        cls._add_background_handler(logger, handler)
+
+    @classmethod
+    def _add_background_handler(cls, logger: logging.Logger, handler: logging.Handler):
+        listener = cls._listeners.get(logger.name)
+        if listener:
+            listener.handlers = listener.handlers + (handler,)
+            return
+        handlers = [*logger.handlers, handler]
+        for h in list(logger.handlers):
+            logger.removeHandler(h)
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(AsyncLogHandler(log_queue))
+        listener = logging.handlers.QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        listener.start()
+        if not cls._listeners:
+            atexit.register(cls.stop_listeners)
+        cls._listeners[logger.name] = listener
+
+    @classmethod
+    def stop_listeners(cls):
+        """停止所有后台日志线程, 在此之前会处理完队列中剩余的日志"""
+        while cls._listeners:
+            _, listener = cls._listeners.popitem()
+            listener.stop()
+
+    @classmethod
+    def set_file_handler(
+        cls,
+        logger: logging.Logger,
+        path: str,
+        max_mb: int = 20,
+        backup_count: int = 3,
+    ) -> Optional[logging.Handler]:
+        """添加按大小轮转的日志文件。文件在后台线程中写入, 不会阻塞事件循环
+
+        Args:
+            path (str): 日志文件路径
+            max_mb (int): 单个日志文件的最大大小(MB)
+            backup_count (int): 保留的历史日志文件数量
+        """
+        listener = cls._listeners.get(logger.name)
+        for h in listener.handlers if listener else []:
+            if isinstance(h, logging.FileHandler) and h.baseFilename == os.path.abspath(
+                path
+            ):
+                return h
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=max_mb * 1024 * 1024,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+        handler.setLevel(logging.DEBUG)
+        handler.setFormatter(logging.Formatter(PLAIN_LOG_FORMAT))
+        cls._add_background_handler(logger, handler)
+        return handler
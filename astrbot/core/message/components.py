@@ -23,12 +23,14 @@ SOFTWARE.
 """
 
 import base64
+import copy
 import json
+import operator
 import os
+import types
 import uuid
 import typing as T
 from enum import Enum
-from pydantic.v1 import BaseModel
 from astrbot.core.utils.io import download_image_by_url, file_to_base64
 
 
@@ -64,16 +66,180 @@ class ComponentType(Enum):
     WechatEmoji = "WechatEmoji"  # Wechat 下的 emoji 表情包
 
 
-class BaseMessageComponent(BaseModel):
+_REQUIRED = object()
+"""没有默认值的必填字段"""
+
+_MUTABLE_DEFAULTS = (list, dict, set)
+
+_validation_enabled = os.environ.get("ASTRBOT_VALIDATE_COMPONENTS", "").lower() in (
+    "1",
+    "true",
+)
+_validation_models: T.Dict[type, T.Any] = {}
+
+
+def set_component_validation(enabled: bool = True):
+    """开启或关闭消息组件的字段校验。
+
+    消息组件默认不做类型校验与转换, 以降低创建组件的开销。插件开发调试时可以开启校验,
+    开启后会使用 pydantic 按字段注解校验并转换参数(如将 "123" 转换为 123), 参数不合法时抛出 ValidationError。
+    也可以通过环境变量 ASTRBOT_VALIDATE_COMPONENTS=1 开启。
+    """
+    global _validation_enabled
+    _validation_enabled = enabled
+
+
+def _is_optional(annotation) -> bool:
+    if annotation is T.Any or annotation is None or annotation is type(None):
+        return True
+    if isinstance(annotation, str):
+        return annotation.startswith("Optional") or "None" in annotation
+    if T.get_origin(annotation) in (T.Union, types.UnionType):
+        return any(_is_optional(arg) for arg in T.get_args(annotation))
+    return False
+
+
+class _ComponentMeta(type):
+    """根据类的字段注解生成 __slots__ 与字段表, 声明方式与 pydantic 模型相同:
+
+    - 有默认值的字段为可选字段, Optional 注解且没有默认值的字段默认为 None, 其余为必填字段
+    - 以下划线开头的注解不是字段
+    - 类中显式声明的 __slots__ 作为额外的私有属性
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        fields: T.Dict[str, T.Any] = {}
+        for base in reversed(bases):
+            fields.update(getattr(base, "_component_fields", ()))
+        inherited = set(fields)
+
+        slots = list(namespace.get("__slots__", ()))
+        annotations = namespace.get("__annotations__", {})
+        for attr, annotation in annotations.items():
+            if attr.startswith("_") or T.get_origin(annotation) is T.ClassVar:
+                continue
+            if attr in namespace:
+                default = namespace.pop(attr)
+            elif _is_optional(annotation):
+                default = None
+            else:
+                default = _REQUIRED
+            fields[attr] = default
+            if attr not in inherited:
+                slots.append(attr)
+        # 子类中不带注解地覆盖父类字段的默认值
+        for attr in inherited - set(annotations):
+            if attr in namespace:
+                fields[attr] = namespace.pop(attr)
+
+        namespace["__slots__"] = tuple(slots)
+        cls = super().__new__(mcs, name, bases, namespace)
+        cls._component_fields = tuple(fields.items())
+        # toDict / toString 中输出的字段
+        cls._data_fields = tuple(k for k in fields if k != "type")
+        cls._data_values = staticmethod(_values_getter(cls._data_fields))
+        cls._assign = _make_assign(cls._component_fields)
+        return cls
+
+
+def _values_getter(names: T.Tuple[str, ...]) -> T.Callable[[T.Any], tuple]:
+    if len(names) > 1:
+        return operator.attrgetter(*names)
+    if names:
+        name = names[0]
+        return lambda obj: (getattr(obj, name),)
+    return lambda obj: ()
+
+
+def _make_assign(fields: T.Tuple[T.Tuple[str, T.Any], ...]):
+    """与 dataclasses 相同, 为每个组件类生成按字段逐个赋值的函数, 避免运行时遍历字段表"""
+    lines = ["def _assign(self, data):"]
+    env = {}
+    for i, (k, default) in enumerate(fields):
+        env[f"_d{i}"] = default
+        if default is _REQUIRED:
+            lines.append(
+                f"    if {k!r} not in data: "
+                f"raise ValueError(type(self).__name__ + ' 缺少必填字段 {k}')"
+            )
+            lines.append(f"    self.{k} = data[{k!r}]")
+        elif isinstance(default, _MUTABLE_DEFAULTS):
+            # 与 pydantic 一致, 可变的默认值在每个实例中复制一份
+            lines.append(
+                f"    self.{k} = data[{k!r}] if {k!r} in data else _d{i}.copy()"
+            )
+        else:
+            lines.append(f"    self.{k} = data.get({k!r}, _d{i})")
+    lines.append("    pass")
+    exec("\n".join(lines), env)
+    return env["_assign"]
+
+
+class BaseMessageComponent(metaclass=_ComponentMeta):
     type: ComponentType
 
+    def __init__(self, **data):
+        if _validation_enabled:
+            data = self._validate(data)
+        # 与 pydantic 一致, 忽略未声明的参数
+        self._assign(data)
+
+    @classmethod
+    def _validate(cls, data: dict) -> dict:
+        model = _validation_models.get(cls)
+        if model is None:
+            from pydantic.v1 import BaseConfig, create_model
+
+            class Config(BaseConfig):
+                arbitrary_types_allowed = True
+
+            hints = T.get_type_hints(cls)
+            model = create_model(
+                f"{cls.__name__}Model",
+                __config__=Config,
+                **{
+                    k: (hints.get(k, T.Any), ... if default is _REQUIRED else default)
+                    for k, default in cls._component_fields
+                },
+            )
+            _validation_models[cls] = model
+        return model(**data).__dict__
+
+    def __eq__(self, other):
+        if not isinstance(other, BaseMessageComponent):
+            return NotImplemented
+        return type(self) is type(other) and all(
+            getattr(self, k) == getattr(other, k) for k, _ in self._component_fields
+        )
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{k}={getattr(self, k)!r}" for k, _ in self._component_fields
+        )
+        return f"{type(self).__name__}({fields})"
+
+    def __copy__(self):
+        new = object.__new__(type(self))
+        for cls in type(self).__mro__:
+            for k in getattr(cls, "__slots__", ()):
+                if hasattr(self, k):
+                    setattr(new, k, getattr(self, k))
+        return new
+
+    def __deepcopy__(self, memo):
+        new = object.__new__(type(self))
+        memo[id(self)] = new
+        for cls in type(self).__mro__:
+            for k in getattr(cls, "__slots__", ()):
+                if hasattr(self, k):
+                    setattr(new, k, copy.deepcopy(getattr(self, k), memo))
+        return new
+
     def toString(self):
         output = f"[CQ:{self.type.lower()}"
-        for k, v in self.__dict__.items():
-            if k == "type" or v is None:
+        for k, v in zip(self._data_fields, self._data_values(self)):
+            if v is None:
                 continue
-            if k == "_type":
-                k = "type"
             if isinstance(v, bool):
                 v = 1 if v else 0
             output += ",%s=%s" % (
@@ -88,13 +254,11 @@ class BaseMessageComponent(BaseModel):
         return output
 
     def toDict(self):
-        data = {}
-        for k, v in self.__dict__.items():
-            if k == "type" or v is None:
-                continue
-            if k == "_type":
-                k = "type"
-            data[k] = v
+        data = {
+            k: v
+            for k, v in zip(self._data_fields, self._data_values(self))
+            if v is not None
+        }
         return {"type": self.type.lower(), "data": data}
 
 
@@ -133,6 +297,8 @@ class Record(BaseMessageComponent):
     # 额外
     path: T.Optional[str]
 
+    __slots__ = ("_base64_cache",)
+
     def __init__(self, file: T.Optional[str], **_):
         for k in _.keys():
             if k == "url":
@@ -181,6 +347,10 @@ class Record(BaseMessageComponent):
         Returns:
             str: 语音的 base64 编码，不以 base64:// 或者 data:image/jpeg;base64, 开头。
         """
+        # 同一个组件多次发送时(如分段发送、多个会话)不再重复读取文件
+        cached = getattr(self, "_base64_cache", None)
+        if cached and cached[0] == self.file:
+            return cached[1]
         # convert to base64
         if self.file and self.file.startswith("file:///"):
             bs64_data = file_to_base64(self.file[8:])
@@ -194,6 +364,7 @@ class Record(BaseMessageComponent):
         else:
             raise Exception(f"not a valid file: {self.file}")
         bs64_data = bs64_data.removeprefix("base64://")
+        self._base64_cache = (self.file, bs64_data)
         return bs64_data
 
 
@@ -328,6 +499,8 @@ class Image(BaseMessageComponent):
     path: T.Optional[str] = ""
     file_unique: T.Optional[str] = ""  # 某些平台可能有图片缓存的唯一标识
 
+    __slots__ = ("_base64_cache",)
+
     def __init__(self, file: T.Optional[str], **_):
         super().__init__(file=file, **_)
 
@@ -385,8 +558,12 @@ class Image(BaseMessageComponent):
         Returns:
             str: 图片的 base64 编码，不以 base64:// 或者 data:image/jpeg;base64, 开头。
         """
-        # convert to base64
         url = self.url if self.url else self.file
+        # 同一个组件多次发送时(如分段发送、多个会话)不再重复读取或下载
+        cached = getattr(self, "_base64_cache", None)
+        if cached and cached[0] == url:
+            return cached[1]
+        # convert to base64
         if url and url.startswith("file:///"):
             bs64_data = file_to_base64(url[8:])
         elif url and url.startswith("http"):
@@ -399,6 +576,7 @@ class Image(BaseMessageComponent):
         else:
             raise Exception(f"not a valid file: {url}")
         bs64_data = bs64_data.removeprefix("base64://")
+        self._base64_cache = (url, bs64_data)
         return bs64_data
 
 
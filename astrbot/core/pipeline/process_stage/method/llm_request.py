@@ -4,6 +4,8 @@
 
 import traceback
 import asyncio
+import dataclasses
+import inspect
 import json
 from typing import Union, AsyncGenerator
 from ...context import PipelineContext
@@ -16,6 +18,7 @@ from astrbot.core.message.message_event_result import (
 )
 from astrbot.core.message.components import Image
 from astrbot.core import logger
+from astrbot.core.log import lazy_fields, lazy_repr
 from astrbot.core.utils.metrics import Metric
 from astrbot.core.provider.entities import (
     ProviderRequest,
@@ -24,6 +27,8 @@ from astrbot.core.provider.entities import (
     AssistantMessageSegment,
     ToolCallsResult,
 )
+from astrbot.core.provider.func_tool_manager import FuncTool
+from astrbot.core.provider.tool_selector import ToolSelector
 from astrbot.core.star.star_handler import star_handlers_registry, EventType
 from astrbot.core.star.star import star_map
 
@@ -45,6 +50,25 @@ class LLMRequestSubStage(Stage):
         self.streaming_response = ctx.astrbot_config["provider_settings"][
             "streaming_response"
         ]  # bool
+        self.tool_call_concurrency = ctx.astrbot_config["provider_settings"].get(
+            "tool_call_concurrency", 4
+        )  # int
+        self.tool_call_timeout = ctx.astrbot_config["provider_settings"].get(
+            "tool_call_timeout", 60
+        )  # int
+        agent_cfg = ctx.astrbot_config["provider_settings"].get("agent", {})
+        self.agent_max_steps = agent_cfg.get("max_steps", 5)  # int
+        self.agent_token_budget = agent_cfg.get("token_budget", 0)  # int
+        self.tool_result_compact_length = agent_cfg.get("compact_length", 500)  # int
+        self.agent_stream_status = agent_cfg.get("stream_status", True)  # bool
+        tool_selection_cfg = ctx.astrbot_config["provider_settings"].get(
+            "tool_selection", {}
+        )
+        self.tool_selector = (
+            ToolSelector(tool_selection_cfg)
+            if tool_selection_cfg.get("enable", False)
+            else None
+        )
 
         for bwp in self.bot_wake_prefixs:
             if self.provider_wake_prefix.startswith(bwp):
@@ -54,6 +78,8 @@ class LLMRequestSubStage(Stage):
                 self.provider_wake_prefix = self.provider_wake_prefix[len(bwp) :]
 
         self.conv_manager = ctx.plugin_manager.context.conversation_manager
+        self.provider_router = ctx.plugin_manager.context.provider_manager.router
+        self.response_cache = ctx.plugin_manager.context.provider_manager.response_cache
 
     async def process(
         self, event: AstrMessageEvent, _nested: bool = False
@@ -157,17 +183,38 @@ class LLMRequestSubStage(Stage):
         if not req.session_id:
             req.session_id = event.unified_msg_origin
 
+        # 只发送与当前提问相关的函数工具
+        if self.tool_selector and req.func_tool:
+            try:
+                req.func_tool = await self.tool_selector.select(
+                    req.func_tool, self.tool_selector.build_query(req)
+                )
+            except Exception as e:
+                logger.warning(f"函数工具筛选失败，将发送全部工具: {e}")
+
         async def requesting(req: ProviderRequest):
             try:
                 need_loop = True
+                step = 0  # 已经执行的工具调用轮数
+                tokens_used = 0
+                prompt_tokens = cached_tokens = 0
                 while need_loop:
                     need_loop = False
-                    logger.debug(f"提供商请求 Payload: {req}")
+                    logger.debug("提供商请求 Payload: %s", lazy_repr(req))
 
                     final_llm_response = None
 
-                    if self.streaming_response:
-                        stream = provider.text_chat_stream(**req.__dict__)
+                    cache_probe = await self.response_cache.lookup(provider, req)
+                    if cache_probe and cache_probe.hit:
+                        final_llm_response = cache_probe.hit
+                        if self.streaming_response:
+                            yield MessageChain().message(
+                                final_llm_response.completion_text
+                            )
+                    elif self.streaming_response:
+                        stream = self.provider_router.text_chat_stream(
+                            provider, **req.__dict__
+                        )
                         async for llm_response in stream:
                             if llm_response.is_chunk:
                                 if llm_response.result_chain:
@@ -179,13 +226,22 @@ class LLMRequestSubStage(Stage):
                             else:
                                 final_llm_response = llm_response
                     else:
-                        final_llm_response = await provider.text_chat(
-                            **req.__dict__
+                        final_llm_response = await self.provider_router.text_chat(
+                            provider, **req.__dict__
                         )  # 请求 LLM
 
                     if not final_llm_response:
                         raise Exception("LLM response is None.")
 
+                    self.response_cache.store(cache_probe, final_llm_response)
+                    tokens_used += self._count_tokens(req, final_llm_response)
+                    if not (cache_probe and cache_probe.hit):
+                        usage = self.provider_router.record_usage(
+                            provider, final_llm_response
+                        )
+                        prompt_tokens += usage[0]
+                        cached_tokens += usage[1]
+
                     # 执行 LLM 响应后的事件钩子。
                     handlers = star_handlers_registry.get_handlers_by_event_type(
                         EventType.OnLLMResponseEvent
@@ -205,6 +261,15 @@ class LLMRequestSubStage(Stage):
                             )
                             return
 
+                    if (
+                        self.streaming_response
+                        and self.agent_stream_status
+                        and final_llm_response.role == "tool"
+                    ):
+                        yield MessageChain().message(
+                            f"[调用工具: {', '.join(final_llm_response.tools_call_name)}]\n"
+                        )
+
                     if self.streaming_response:
                         # 流式输出的处理
                         async for result in self._handle_llm_stream_response(
@@ -228,11 +293,25 @@ class LLMRequestSubStage(Stage):
                             else:
                                 yield
 
+                    if need_loop:
+                        step += 1
+                        if step >= self.agent_max_steps or (
+                            self.agent_token_budget > 0
+                            and tokens_used >= self.agent_token_budget
+                        ):
+                            # 达到轮数或 Token 上限，要求 LLM 根据已有的工具结果直接回复
+                            logger.info(
+                                f"已执行 {step} 轮工具调用，累计约 {tokens_used} Tokens，不再提供函数工具。"
+                            )
+                            req.func_tool = None
+
                 asyncio.create_task(
                     Metric.upload(
                         llm_tick=1,
                         model_name=provider.get_model(),
                         provider_type=provider.meta().type,
+                        prompt_tokens=prompt_tokens,
+                        cached_tokens=cached_tokens,
                     )
                 )
 
@@ -361,85 +440,136 @@ class LLMRequestSubStage(Stage):
         logger.info(
             f"触发 {len(llm_response.tools_call_name)} 个函数调用: {llm_response.tools_call_name}"
         )
+        results: dict[str, list[ToolCallMessageSegment]] = {}
+        semaphore = asyncio.Semaphore(max(1, self.tool_call_concurrency))
+        concurrent_tasks = []
+        sequential_calls = []
+        platform_id = event.get_platform_id()
         for func_tool_name, func_tool_args, func_tool_id in zip(
             llm_response.tools_call_name,
             llm_response.tools_call_args,
             llm_response.tools_call_ids,
         ):
-            try:
-                func_tool = req.func_tool.get_func(func_tool_name)
-                if func_tool.origin == "mcp":
-                    logger.info(
-                        f"从 MCP 服务 {func_tool.mcp_server_name} 调用工具函数：{func_tool.name}，参数：{func_tool_args}"
+            func_tool = (
+                req.func_tool.get_func(func_tool_name) if req.func_tool else None
+            )
+            if not func_tool:
+                logger.warning(f"未找到函数工具 {func_tool_name}")
+                results[func_tool_id] = [
+                    ToolCallMessageSegment(
+                        role="tool",
+                        tool_call_id=func_tool_id,
+                        content=f"error: tool {func_tool_name} not found",
                     )
-                    client = req.func_tool.mcp_client_dict[func_tool.mcp_server_name]
-                    res = await client.session.call_tool(func_tool.name, func_tool_args)
-                    if res:
-                        # TODO content的类型可能包括list[TextContent | ImageContent | EmbeddedResource]，这里只处理了TextContent。
-                        tool_call_result.append(
+                ]
+                continue
+            if func_tool.origin != "mcp":
+                # 获取处理器，过滤掉平台不兼容的处理器
+                star_md = star_map.get(func_tool.handler_module_path)
+                if (
+                    star_md
+                    and platform_id in star_md.supported_platforms
+                    and not star_md.supported_platforms[platform_id]
+                ):
+                    logger.debug(
+                        f"处理器 {func_tool_name}({star_md.name}) 在当前平台不兼容或者被禁用，跳过执行"
+                    )
+                    # 直接跳过，不添加任何消息到tool_call_result
+                    continue
+            if self._can_call_concurrently(func_tool):
+                concurrent_tasks.append(
+                    asyncio.create_task(
+                        self._run_tool_call(
+                            semaphore,
+                            event,
+                            req,
+                            func_tool,
+                            func_tool_args,
+                            func_tool_id,
+                        )
+                    )
+                )
+            else:
+                sequential_calls.append((func_tool, func_tool_args, func_tool_id))
+
+        # 会发送消息的工具需要将控制权交回管道，逐个执行。可并发的工具此时已经在后台运行
+        for func_tool, func_tool_args, func_tool_id in sequential_calls:
+            if func_tool.origin == "mcp":
+                # 不可并发的 MCP 工具没有 handler，在此逐个调用 MCP 服务
+                _, results[func_tool_id], _ = await self._run_tool_call(
+                    semaphore, event, req, func_tool, func_tool_args, func_tool_id
+                )
+                continue
+            segments = results.setdefault(func_tool_id, [])
+            try:
+                logger.info(
+                    "调用工具函数 %s",
+                    lazy_fields(name=func_tool.name, args=func_tool_args, max_len=500),
+                )
+                wrapper = self._call_handler(
+                    self.ctx, event, func_tool.handler, **func_tool_args
+                )
+                async for resp in wrapper:
+                    if resp is not None:  # 有 return 返回
+                        segments.append(
                             ToolCallMessageSegment(
                                 role="tool",
                                 tool_call_id=func_tool_id,
-                                content=res.content[0].text,
+                                content=resp,
                             )
                         )
-                else:
-                    # 获取处理器，过滤掉平台不兼容的处理器
-                    platform_id = event.get_platform_id()
-                    star_md = star_map.get(func_tool.handler_module_path)
-                    if (
-                        star_md and
-                        platform_id in star_md.supported_platforms
-                        and not star_md.supported_platforms[platform_id]
-                    ):
-                        logger.debug(
-                            f"处理器 {func_tool_name}({star_md.name}) 在当前平台不兼容或者被禁用，跳过执行"
-                        )
-                        # 直接跳过，不添加任何消息到tool_call_result
-                        continue
-
-                    logger.info(
-                        f"调用工具函数：{func_tool_name}，参数：{func_tool_args}"
-                    )
-                    # 尝试调用工具函数
-                    wrapper = self._call_handler(
-                        self.ctx, event, func_tool.handler, **func_tool_args
-                    )
-                    async for resp in wrapper:
-                        if resp is not None:  # 有 return 返回
-                            tool_call_result.append(
-                                ToolCallMessageSegment(
-                                    role="tool",
-                                    tool_call_id=func_tool_id,
-                                    content=resp,
-                                )
-                            )
-                        else:
-                            res = event.get_result()
-                            if res and res.chain:
-                                event.set_extra("tool_call_result", res)
-                            yield  # 有生成器返回
+                    else:
+                        res = event.get_result()
+                        if res and res.chain:
+                            event.set_extra("tool_call_result", res)
+                        yield  # 有生成器返回
                 event.clear_result()  # 清除上一个 handler 的结果
             except BaseException as e:
                 logger.warning(traceback.format_exc())
-                tool_call_result.append(
+                segments.append(
                     ToolCallMessageSegment(
                         role="tool",
                         tool_call_id=func_tool_id,
                         content=f"error: {str(e)}",
                     )
                 )
+
+        for func_tool_id, segments, message_result in await asyncio.gather(
+            *concurrent_tasks
+        ):
+            results[func_tool_id] = segments
+            if message_result is None:
+                message_result = event.get_result()
+            if message_result is not None:
+                # 与逐个执行的工具一致，工具返回的消息交给管道发送
+                event.set_result(message_result)
+                if message_result.chain:
+                    event.set_extra("tool_call_result", message_result)
+                yield
+                event.clear_result()
+
+        # 按照 LLM 返回的 tool_call_id 顺序组织结果
+        for func_tool_id in llm_response.tools_call_ids:
+            tool_call_result.extend(results.get(func_tool_id, []))
+
         if tool_call_result:
             # 函数调用结果
-            req.func_tool = None  # 暂时不支持递归工具调用
             assistant_msg_seg = AssistantMessageSegment(
                 role="assistant", tool_calls=llm_response.to_openai_tool_calls()
             )
-            # 在多轮 Tool 调用的情况下，这里始终保持最新的 Tool 调用结果，减少上下文长度。
-            req.tool_calls_result = ToolCallsResult(
-                tool_calls_info=assistant_msg_seg,
-                tool_calls_result=tool_call_result,
-            )
+            previous = req.tool_calls_result or []
+            if isinstance(previous, ToolCallsResult):
+                previous = [previous]
+            if previous:
+                # 较早轮次的工具结果只保留摘录，减少上下文长度。
+                self._compact_tool_calls_result(previous[-1])
+            req.tool_calls_result = [
+                *previous,
+                ToolCallsResult(
+                    tool_calls_info=assistant_msg_seg,
+                    tool_calls_result=tool_call_result,
+                ),
+            ]
             yield req  # 再次执行 LLM 请求
         else:
             if llm_response.completion_text:
@@ -447,6 +577,160 @@ class LLMRequestSubStage(Stage):
                     MessageEventResult().message(llm_response.completion_text)
                 )
 
+    def _compact_tool_calls_result(self, tool_calls_result: ToolCallsResult):
+        """截断一轮工具调用的结果，只保留开头部分"""
+        limit = self.tool_result_compact_length
+        if limit <= 0:
+            return
+        for seg in tool_calls_result.tool_calls_result:
+            if isinstance(seg.content, str) and len(seg.content) > limit:
+                seg.content = (
+                    f"{seg.content[:limit]}...(已截断，原长度 {len(seg.content)} 字符)"
+                )
+
+    def _count_tokens(self, req: ProviderRequest, llm_response: LLMResponse) -> int:
+        """统计一次 LLM 请求消耗的 Token 数。提供商没有返回用量时按字符数粗略估算"""
+        usage = getattr(llm_response.raw_completion, "usage", None)
+        if usage:
+            total = getattr(usage, "total_tokens", None)
+            if total is None:
+                total = (getattr(usage, "input_tokens", 0) or 0) + (
+                    getattr(usage, "output_tokens", 0) or 0
+                )
+            if total:
+                return total
+        size = (
+            len(req.prompt or "")
+            + len(req.system_prompt or "")
+            + len(json.dumps(req.contexts or [], ensure_ascii=False, default=str))
+            + len(llm_response.completion_text or "")
+        )
+        tool_calls_results = req.tool_calls_result or []
+        if isinstance(tool_calls_results, ToolCallsResult):
+            tool_calls_results = [tool_calls_results]
+        for tcr in tool_calls_results:
+            size += sum(len(str(seg.content)) for seg in tcr.tool_calls_result)
+        return size // 2
+
+    def _can_call_concurrently(self, func_tool: FuncTool) -> bool:
+        """MCP 工具与返回字符串的本地工具可以并发执行；使用 yield 发送消息的工具需要逐个执行"""
+        if func_tool.origin == "mcp":
+            return func_tool.concurrent
+        return func_tool.concurrent and not inspect.isasyncgenfunction(
+            func_tool.handler
+        )
+
+    async def _run_tool_call(
+        self,
+        semaphore: asyncio.Semaphore,
+        event: AstrMessageEvent,
+        req: ProviderRequest,
+        func_tool: FuncTool,
+        func_tool_args: dict,
+        func_tool_id: str,
+    ) -> tuple[str, list[ToolCallMessageSegment], Union[MessageEventResult, None]]:
+        """在并发数与超时限制下执行一个函数调用，异常和超时会作为该工具的结果返回给 LLM"""
+        message_result = None
+        async with semaphore:
+            try:
+                coro = self._call_tool(
+                    event, req, func_tool, func_tool_args, func_tool_id
+                )
+                if self.tool_call_timeout > 0:
+                    segments, message_result = await asyncio.wait_for(
+                        coro, self.tool_call_timeout
+                    )
+                else:
+                    segments, message_result = await coro
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"函数工具 {func_tool.name} 执行超时({self.tool_call_timeout}s)"
+                )
+                segments = [
+                    ToolCallMessageSegment(
+                        role="tool",
+                        tool_call_id=func_tool_id,
+                        content=f"error: tool call timed out after {self.tool_call_timeout}s",
+                    )
+                ]
+            except Exception as e:
+                logger.warning(traceback.format_exc())
+                segments = [
+                    ToolCallMessageSegment(
+                        role="tool",
+                        tool_call_id=func_tool_id,
+                        content=f"error: {str(e)}",
+                    )
+                ]
+        return func_tool_id, segments, message_result
+
+    async def _call_tool(
+        self,
+        event: AstrMessageEvent,
+        req: ProviderRequest,
+        func_tool: FuncTool,
+        func_tool_args: dict,
+        func_tool_id: str,
+    ) -> tuple[list[ToolCallMessageSegment], Union[MessageEventResult, None]]:
+        """执行一个可并发的函数调用
+
+        Returns:
+            tuple: (segments, message_result)
+                - segments: 返回给 LLM 的工具调用结果
+                - message_result: 工具返回的 MessageEventResult，需要由管道发送
+        """
+        segments = []
+        if func_tool.origin == "mcp":
+            logger.info(
+                "调用 MCP 工具函数 %s",
+                lazy_fields(
+                    server=func_tool.mcp_server_name,
+                    name=func_tool.name,
+                    args=func_tool_args,
+                    max_len=500,
+                ),
+            )
+            client = req.func_tool.mcp_client_dict.get(func_tool.mcp_server_name)
+            if not client:
+                raise Exception(f"MCP 服务 {func_tool.mcp_server_name} 当前不可用")
+            res = await client.call_tool(func_tool.name, func_tool_args)
+            if res:
+                # TODO content的类型可能包括list[TextContent | ImageContent | EmbeddedResource]，这里只处理了TextContent。
+                segments.append(
+                    ToolCallMessageSegment(
+                        role="tool",
+                        tool_call_id=func_tool_id,
+                        content=res.content[0].text,
+                    )
+                )
+            return segments, None
+
+        logger.info(
+            "调用工具函数 %s",
+            lazy_fields(name=func_tool.name, args=func_tool_args, max_len=500),
+        )
+        # 不经过 _call_handler，避免并发的工具同时写入 event 的结果
+        try:
+            ret = func_tool.handler(event, **func_tool_args)
+        except TypeError:
+            # 向下兼容，与 _call_handler 一致
+            ret = func_tool.handler(
+                event, self.ctx.plugin_manager.context, **func_tool_args
+            )
+        if inspect.isawaitable(ret):
+            ret = await ret
+        if isinstance(ret, MessageEventResult):
+            return segments, ret
+        if ret is not None:
+            segments.append(
+                ToolCallMessageSegment(
+                    role="tool",
+                    tool_call_id=func_tool_id,
+                    content=ret,
+                )
+            )
+        return segments, None
+
     async def _save_to_history(
         self, event: AstrMessageEvent, req: ProviderRequest, llm_response: LLMResponse
     ):
@@ -456,11 +740,26 @@ class LLMRequestSubStage(Stage):
         if llm_response.role == "assistant":
             # 文本回复
             contexts = req.contexts.copy()
-            contexts.append(await req.assemble_context())
+            if req.history_prompt is not None:
+                # 只对本轮有效的附加内容不写入历史，避免历史对话随之膨胀
+                contexts.append(
+                    await dataclasses.replace(
+                        req, prompt=req.history_prompt
+                    ).assemble_context()
+                )
+            else:
+                contexts.append(await req.assemble_context())
 
             # 记录并标记函数调用结果
             if req.tool_calls_result:
-                tool_calls_messages = req.tool_calls_result.to_openai_messages()
+                tool_calls_results = req.tool_calls_result
+                if isinstance(tool_calls_results, ToolCallsResult):
+                    tool_calls_results = [tool_calls_results]
+                tool_calls_messages = [
+                    message
+                    for tcr in tool_calls_results
+                    for message in tcr.to_openai_messages()
+                ]
 
                 # 添加标记
                 for message in tool_calls_messages:
@@ -28,18 +28,33 @@ class WakingCheckStage(Stage):
             ctx (PipelineContext): 消息管道上下文对象, 包括配置和插件管理器
         """
         self.ctx = ctx
-        self.no_permission_reply = self.ctx.astrbot_config["platform_settings"].get(
-            "no_permission_reply", True
+        self._load_config()
+        # 修改平台设置后无需重启即可生效。wake_prefix、admins_id 在处理消息时直接读取
+        ctx.astrbot_config.subscribe(
+            self._on_config_changed,
+            [
+                "platform_settings.no_permission_reply",
+                "platform_settings.friend_message_needs_wake_prefix",
+                "platform_settings.ignore_bot_self_message",
+            ],
         )
+
+    def _load_config(self):
+        platform_settings = self.ctx.astrbot_config["platform_settings"]
+        self.no_permission_reply = platform_settings.get("no_permission_reply", True)
         # 私聊是否需要 wake_prefix 才能唤醒机器人
-        self.friend_message_needs_wake_prefix = self.ctx.astrbot_config[
-            "platform_settings"
-        ].get("friend_message_needs_wake_prefix", False)
+        self.friend_message_needs_wake_prefix = platform_settings.get(
+            "friend_message_needs_wake_prefix", False
+        )
         # 是否忽略机器人自己发送的消息
-        self.ignore_bot_self_message = self.ctx.astrbot_config["platform_settings"].get(
+        self.ignore_bot_self_message = platform_settings.get(
             "ignore_bot_self_message", False
         )
 
+    def _on_config_changed(self, changed: set):
+        self._load_config()
+        logger.debug(f"唤醒检查阶段已重新加载配置: {sorted(changed)}")
+
     async def process(
         self, event: AstrMessageEvent
     ) -> Union[None, AsyncGenerator[None, None]]:
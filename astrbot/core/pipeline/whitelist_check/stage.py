@@ -11,20 +11,34 @@ class WhitelistCheckStage(Stage):
     """检查是否在群聊/私聊白名单"""
 
     async def initialize(self, ctx: PipelineContext) -> None:
-        self.enable_whitelist_check = ctx.astrbot_config["platform_settings"][
-            "enable_id_white_list"
-        ]
-        self.whitelist = ctx.astrbot_config["platform_settings"]["id_whitelist"]
+        self.ctx = ctx
+        self._load_config()
+        # /wl、/dwl 或面板修改白名单后无需重启即可生效
+        ctx.astrbot_config.subscribe(
+            self._on_config_changed,
+            [
+                "platform_settings.enable_id_white_list",
+                "platform_settings.id_whitelist",
+                "platform_settings.wl_ignore_admin_on_group",
+                "platform_settings.wl_ignore_admin_on_friend",
+                "platform_settings.id_whitelist_log",
+            ],
+        )
+
+    def _load_config(self):
+        platform_settings = self.ctx.astrbot_config["platform_settings"]
+        self.enable_whitelist_check = platform_settings["enable_id_white_list"]
+        self.whitelist = platform_settings["id_whitelist"]
         self.whitelist = [
             str(i).strip() for i in self.whitelist if str(i).strip() != ""
         ]
-        self.wl_ignore_admin_on_group = ctx.astrbot_config["platform_settings"][
-            "wl_ignore_admin_on_group"
-        ]
-        self.wl_ignore_admin_on_friend = ctx.astrbot_config["platform_settings"][
-            "wl_ignore_admin_on_friend"
-        ]
-        self.wl_log = ctx.astrbot_config["platform_settings"]["id_whitelist_log"]
+        self.wl_ignore_admin_on_group = platform_settings["wl_ignore_admin_on_group"]
+        self.wl_ignore_admin_on_friend = platform_settings["wl_ignore_admin_on_friend"]
+        self.wl_log = platform_settings["id_whitelist_log"]
+
+    def _on_config_changed(self, changed: set):
+        self._load_config()
+        logger.debug(f"白名单检查阶段已重新加载配置: {sorted(changed)}")
 
     async def process(
         self, event: AstrMessageEvent
@@ -2,6 +2,7 @@ from .platform import Platform
 from .astr_message_event import AstrMessageEvent
 from .platform_metadata import PlatformMetadata
 from .astrbot_message import AstrBotMessage, MessageMember, MessageType, Group
+from .send_scheduler import RetryAfter
 
 __all__ = [
     "Platform",
@@ -11,4 +12,5 @@ __all__ = [
     "MessageMember",
     "MessageType",
     "Group",
+    "RetryAfter",
 ]
@@ -1,5 +1,6 @@
 import abc
 import asyncio
+import functools
 import re
 import hashlib
 import uuid
@@ -21,8 +22,10 @@ from astrbot.core.message.message_event_result import MessageEventResult, Messag
 from astrbot.core.platform.message_type import MessageType
 from astrbot.core.provider.entities import ProviderRequest
 from astrbot.core.utils.metrics import Metric
+from astrbot.core import logger
 from .astrbot_message import AstrBotMessage, Group
 from .platform_metadata import PlatformMetadata
+from .send_scheduler import dispatched, outbound_dispatcher
 
 
 @dataclass
@@ -41,6 +44,12 @@ class MessageSesion:
 
 
 class AstrMessageEvent(abc.ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 适配器实现的 send() 统一经过出站调度器, 由调度器负责限速、重试与合并
+        if "send" in cls.__dict__:
+            cls.send = dispatched(cls.__dict__["send"])
+
     def __init__(
         self,
         message_str: str,
@@ -75,6 +84,8 @@ class AstrMessageEvent(abc.ABC):
 
         self._has_send_oper = False
         """在此次事件中是否有过至少一次发送消息的操作"""
+        self._queued_sends: List[asyncio.Future] = []
+        """已交给出站调度器但还未确认发送完成的消息"""
         self.call_llm = False
         """是否在此消息事件中禁止默认的 LLM 请求"""
 
@@ -217,11 +228,32 @@ class AstrMessageEvent(abc.ABC):
             if not match:
                 break
             matched_text = match.group()
-            await self.send(MessageChain([Plain(matched_text)]))
+            fut = self._enqueue_send(MessageChain([Plain(matched_text)]))
+            if fut is not None:
+                # 由出站调度器限速, 限速期间排队的文本会被合并为一条发送
+                self._queued_sends.append(fut)
+            else:
+                await self.send(MessageChain([Plain(matched_text)]))
+                await asyncio.sleep(1.5)  # 限速
             buffer = buffer[match.end() :]
-            await asyncio.sleep(1.5)  # 限速
         return buffer
 
+    def _enqueue_send(self, message: MessageChain) -> Optional[asyncio.Future]:
+        """将消息交给出站调度器后立即返回, 不等待发送完成。未启用调度器时返回 None"""
+        send = getattr(type(self).send, "__wrapped__", None)
+        if send is None:
+            return None
+        return outbound_dispatcher.enqueue(self, message, functools.partial(send, self))
+
+    async def _wait_queued_sends(self):
+        """等待之前交给出站调度器的消息全部发送完成"""
+        if not self._queued_sends:
+            return
+        queued, self._queued_sends = self._queued_sends, []
+        for ret in await asyncio.gather(*queued, return_exceptions=True):
+            if isinstance(ret, Exception):
+                logger.error(f"发送消息失败: {ret}")
+
     async def send_streaming(
         self, generator: AsyncGenerator[MessageChain, None], use_fallback: bool = False
     ):
@@ -229,6 +261,7 @@ class AstrMessageEvent(abc.ABC):
         目前仅支持: telegram，qq official 私聊。
         Fallback仅支持 aiocqhttp, gewechat。
         """
+        await self._wait_queued_sends()
         asyncio.create_task(
             Metric.upload(msg_event_tick=1, adapter_name=self.platform_meta.name)
         )
@@ -5,6 +5,7 @@ from .platform import Platform
 from typing import List
 from asyncio import Queue
 from .register import platform_cls_map
+from .send_scheduler import outbound_dispatcher
 from astrbot.core import logger
 from .sources.webchat.webchat_adapter import WebChatAdapter
 
@@ -19,6 +20,7 @@ class PlatformManager:
         self.platforms_config = config["platform"]
         self.settings = config["platform_settings"]
         self.event_queue = event_queue
+        outbound_dispatcher.configure(self.settings.get("send_scheduler", {}))
 
     async def initialize(self):
         """初始化所有平台适配器"""
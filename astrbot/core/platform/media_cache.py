@@ -0,0 +1,154 @@
+"""
+平台媒体句柄缓存
+
+发送图片、语音时, 飞书、企业微信、QQ 官方等平台都需要先上传文件换取媒体句柄(image_key / media_id / file_info)。
+同一份内容发送到多个会话时, 此缓存按内容哈希复用有效期内的句柄, 避免重复上传。
+
+各平台句柄的有效期不同:
+
+- 飞书 image_key: 长期有效
+- 企业微信临时素材 media_id: 3 天
+- QQ 官方 file_info: 由上传接口返回的 ttl 决定, 并且只能发送给上传时指定的用户或群
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from astrbot.core import logger
+
+WECOM_MEDIA_TTL = 3 * 24 * 3600
+"""企业微信临时素材的有效期"""
+
+
+class MediaHandleCache:
+    """内容哈希 -> 平台媒体句柄
+
+    Args:
+        name (str): 缓存名称, 用于日志与统计
+        ttl (float): 句柄默认有效期(秒), None 表示长期有效
+        max_entries (int): 最多缓存的句柄数量, 超出后淘汰最久未使用的
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: Optional[float] = None,
+        max_entries: int = 2048,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[str, Tuple[Any, Optional[float]]] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @staticmethod
+    def make_key(data: bytes, kind: str = "", scope: str = "") -> str:
+        """kind 区分媒体类型(image / voice), scope 用于只能在特定目标中使用的句柄"""
+        return f"{kind}:{scope}:{hashlib.sha256(data).hexdigest()}"
+
+    def _expires_at(self, ttl: Optional[float]) -> Optional[float]:
+        if not ttl or ttl <= 0:
+            return None
+        # 提前一点过期, 避免句柄在发送途中失效
+        return self.clock() + ttl - max(60.0, ttl * 0.05)
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        handle, expires_at = entry
+        if expires_at is not None and self.clock() >= expires_at:
+            del self._entries[key]
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return handle
+
+    def put(self, key: str, handle: Any, ttl: Optional[float] = None):
+        """ttl 为 None 时使用默认有效期, 为 0 时表示长期有效"""
+        self._entries[key] = (
+            handle,
+            self._expires_at(self.ttl if ttl is None else ttl),
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        """平台拒绝了缓存的句柄时调用, 下次发送会重新上传"""
+        self._entries.pop(key, None)
+
+    async def get_or_upload(
+        self,
+        key: str,
+        upload: Callable[[], Awaitable[Any]],
+        ttl_of: Optional[Callable[[Any], Optional[float]]] = None,
+    ) -> Any:
+        """返回缓存的句柄, 没有时调用 upload() 上传。同一内容的并发上传只会执行一次
+
+        Args:
+            upload: 上传并返回句柄的协程函数。返回 None 表示上传失败, 不会被缓存
+            ttl_of: 从句柄中读取有效期的函数, 用于有效期由平台返回的情况
+        """
+        handle = self.get(key)
+        if handle is not None:
+            self.hits += 1
+            logger.debug(f"{self.name} 复用已上传的媒体: {key[:48]}")
+            return handle
+        if key in self._inflight:
+            self.hits += 1
+            return await asyncio.shield(self._inflight[key])
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            handle = await upload()
+            if handle is not None:
+                self.put(key, handle, ttl_of(handle) if ttl_of else None)
+            fut.set_result(handle)
+            return handle
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            # 避免没有其他等待者时出现 "exception was never retrieved"
+            fut.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_media_caches: Dict[str, MediaHandleCache] = {}
+
+
+def get_media_cache(name: str, ttl: Optional[float] = None) -> MediaHandleCache:
+    """获取平台实例对应的媒体句柄缓存, name 一般为平台 id"""
+    cache = _media_caches.get(name)
+    if cache is None:
+        cache = _media_caches[name] = MediaHandleCache(name, ttl)
+    return cache
+
+
+def media_cache_stats() -> Dict[str, dict]:
+    """所有平台媒体句柄缓存的命中统计"""
+    return {name: cache.stats() for name, cache in _media_caches.items()}
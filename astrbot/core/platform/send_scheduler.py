@@ -0,0 +1,430 @@
+"""
+出站消息调度器
+
+位于 AstrMessageEvent.send 与各平台适配器之间, 每个平台实例对应一个 SendScheduler:
+
+1. 使用令牌桶同时限制整个平台(全局)与单个会话的发送速率, 默认速率按平台类型给出
+2. 适配器抛出带有 retry_after 的异常(如 Telegram 的 RetryAfter 或本模块的 RetryAfter)时, 暂停对应会话并在之后重试
+3. 同一个事件在同一会话中排队的纯文本消息会被合并为一条发送
+4. 多个会话之间轮转调度, 单个会话的大量消息不会饿死其他会话
+
+适配器的 send() 方法会在类定义时被自动包装(见 AstrMessageEvent.__init_subclass__), 适配器本身无需改动。
+"""
+
+import asyncio
+import contextvars
+import functools
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from astrbot.core import logger
+from astrbot.core.message.components import Plain
+from astrbot.core.message.message_event_result import MessageChain
+
+SendFunc = Callable[[MessageChain], Awaitable[Any]]
+
+_dispatching = contextvars.ContextVar("astrbot_outbound_dispatching", default=None)
+"""当前是否处于调度器发起的发送中, 值为 (SendScheduler, 会话标识)。适配器在 send() 中再次调用 send() 时直接发送, 避免自己等待自己"""
+
+
+class RetryAfter(Exception):
+    """平台返回限流响应时, 适配器可以抛出此异常, 调度器会在 retry_after 秒后重试
+
+    Args:
+        retry_after (float): 需要等待的秒数
+        scope (str): chat 表示只暂停当前会话, global 表示暂停整个平台
+    """
+
+    def __init__(self, retry_after: float, scope: str = "chat"):
+        super().__init__(f"触发平台限流, 需要在 {retry_after} 秒后重试")
+        self.retry_after = retry_after
+        self.scope = scope
+
+
+def get_retry_after(e: Exception) -> Optional[float]:
+    """从异常中取出平台要求等待的秒数, 兼容各 SDK 中常见的 retry_after 字段"""
+    value = getattr(e, "retry_after", None)
+    if value is None:
+        return None
+    if isinstance(value, timedelta):
+        value = value.total_seconds()
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RateLimit:
+    """速率限制。rate 为每秒补充的令牌数, burst 为令牌桶容量。rate 为 0 表示不限制"""
+
+    global_rate: float
+    global_burst: int
+    chat_rate: float
+    chat_burst: int
+
+
+PLATFORM_RATE_LIMITS: Dict[str, Optional[RateLimit]] = {
+    "telegram": RateLimit(25, 25, 1, 3),
+    "aiocqhttp": RateLimit(5, 5, 1, 3),
+    # QQ 官方的 send() 只写入缓冲区, 由 _post_send() 统一被动回复
+    "qq_official": None,
+    "qq_official_webhook": None,
+    "wecom": RateLimit(10, 10, 1, 3),
+    "lark": RateLimit(20, 20, 2, 5),
+    "dingtalk": RateLimit(10, 10, 0.3, 3),
+    "gewechat": RateLimit(2, 3, 0.5, 2),
+    "wcf": RateLimit(2, 3, 0.5, 2),
+    "webchat": None,
+}
+"""各平台默认的发送速率限制。None 表示该平台不经过调度器"""
+
+DEFAULT_RATE_LIMIT = RateLimit(5, 5, 1, 3)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int, clock: Callable[[], float]):
+        self.rate = rate
+        self.capacity = max(int(capacity), 1)
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """距离下一个可用令牌的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        if self.rate <= 0:
+            return
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass
+class _OutboundItem:
+    event: Any
+    message: MessageChain
+    send_func: SendFunc
+    futures: List[asyncio.Future]
+    attempts: int = 0
+
+
+@dataclass
+class _ChatQueue:
+    key: str
+    bucket: TokenBucket
+    items: Deque[_OutboundItem] = field(default_factory=deque)
+    blocked_until: float = 0.0
+    busy: bool = False
+
+
+def _is_plain(message: MessageChain) -> bool:
+    return bool(message.chain) and all(isinstance(c, Plain) for c in message.chain)
+
+
+def _plain_text(message: MessageChain) -> str:
+    return "".join(c.text for c in message.chain)
+
+
+class SendScheduler:
+    """单个平台实例的出站调度器
+
+    Args:
+        limit (RateLimit): 全局与单会话的速率限制
+        merge_text (bool): 是否合并同一事件排队中的纯文本消息
+        max_retries (int): 被限流后的最大重试次数
+        merge_max_chars (int): 合并后文本的最大长度
+    """
+
+    def __init__(
+        self,
+        limit: RateLimit,
+        merge_text: bool = True,
+        max_retries: int = 3,
+        merge_max_chars: int = 2000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = limit
+        self.merge_text = merge_text
+        self.max_retries = max_retries
+        self.merge_max_chars = merge_max_chars
+        self.clock = clock
+        self.global_bucket = TokenBucket(limit.global_rate, limit.global_burst, clock)
+        self.global_blocked_until = 0.0
+        self.chats: Dict[str, _ChatQueue] = {}
+        self.ready: Deque[_ChatQueue] = deque()
+        """有待发送消息且当前没有正在发送的会话, 按轮转顺序排列"""
+        self.loop = asyncio.get_running_loop()
+        self.stats = {"sent": 0, "merged": 0, "retried": 0, "failed": 0}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    def _get_chat(self, chat_key: str) -> _ChatQueue:
+        chat = self.chats.get(chat_key)
+        if chat is None:
+            chat = _ChatQueue(
+                chat_key,
+                TokenBucket(self.limit.chat_rate, self.limit.chat_burst, self.clock),
+            )
+            self.chats[chat_key] = chat
+        return chat
+
+    def enqueue(
+        self, chat_key: str, event, message: MessageChain, send_func: SendFunc
+    ) -> asyncio.Future:
+        """将消息放入会话队列并立即返回, 发送完成后 Future 得到 send_func 的返回值"""
+        fut = self.loop.create_future()
+        chat = self._get_chat(chat_key)
+        if not self._try_merge(chat, event, message, fut):
+            chat.items.append(_OutboundItem(event, message, send_func, [fut]))
+            if not chat.busy and chat not in self.ready:
+                self.ready.append(chat)
+        self._wakeup.set()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return fut
+
+    async def submit(
+        self, chat_key: str, event, message: MessageChain, send_func: SendFunc
+    ):
+        """将消息放入会话队列并等待发送完成"""
+        return await self.enqueue(chat_key, event, message, send_func)
+
+    def _try_merge(
+        self, chat: _ChatQueue, event, message: MessageChain, fut: asyncio.Future
+    ) -> bool:
+        if not self.merge_text or not chat.items:
+            return False
+        tail = chat.items[-1]
+        if tail.event is not event or not _is_plain(tail.message):
+            return False
+        if not _is_plain(message):
+            return False
+        text = _plain_text(tail.message) + "\n" + _plain_text(message)
+        if len(text) > self.merge_max_chars:
+            return False
+        tail.message = MessageChain([Plain(text)], use_t2i_=tail.message.use_t2i_)
+        tail.futures.append(fut)
+        self.stats["merged"] += 1
+        return True
+
+    async def acquire(self, chat_key: str):
+        """直接获取一次发送额度, 供适配器在一次 send() 中分多次调用平台接口时使用"""
+        chat = self._get_chat(chat_key)
+        while True:
+            now = self.clock()
+            wait = max(
+                self.global_blocked_until - now,
+                chat.blocked_until - now,
+                self.global_bucket.wait_time(now),
+                chat.bucket.wait_time(now),
+            )
+            if wait <= 0:
+                self.global_bucket.consume(now)
+                chat.bucket.consume(now)
+                return
+            await asyncio.sleep(wait)
+
+    def _pick(self, now: float):
+        """选出下一个可以发送的会话。返回 (会话, 需要等待的秒数)"""
+        global_wait = max(
+            self.global_blocked_until - now, self.global_bucket.wait_time(now)
+        )
+        chat_wait = math.inf
+        for chat in self.ready:
+            wait = max(chat.blocked_until - now, chat.bucket.wait_time(now))
+            if wait <= 0:
+                if global_wait > 0:
+                    return None, global_wait
+                return chat, 0.0
+            chat_wait = min(chat_wait, wait)
+        return None, max(chat_wait, global_wait)
+
+    async def _run(self):
+        while self.ready or self._inflight:
+            now = self.clock()
+            chat, wait = self._pick(now)
+            if chat is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), None if math.isinf(wait) else wait
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.ready.remove(chat)
+            item = chat.items.popleft()
+            if all(f.done() for f in item.futures):
+                # 发送方已经取消
+                if chat.items:
+                    self.ready.append(chat)
+                continue
+            chat.bucket.consume(now)
+            self.global_bucket.consume(now)
+            chat.busy = True
+            task = asyncio.create_task(self._deliver(chat, item))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+        self._prune()
+
+    async def _deliver(self, chat: _ChatQueue, item: _OutboundItem):
+        _dispatching.set((self, chat.key))
+        try:
+            result = await item.send_func(item.message)
+        except Exception as e:
+            retry_after = get_retry_after(e)
+            if retry_after is not None and item.attempts < self.max_retries:
+                item.attempts += 1
+                self.stats["retried"] += 1
+                until = self.clock() + retry_after
+                if getattr(e, "scope", "chat") == "global":
+                    self.global_blocked_until = max(self.global_blocked_until, until)
+                else:
+                    chat.blocked_until = max(chat.blocked_until, until)
+                chat.items.appendleft(item)
+                logger.warning(
+                    f"发送消息到 {chat.key} 时被平台限流, 将在 {retry_after:.1f} 秒后重试。"
+                )
+            else:
+                self.stats["failed"] += 1
+                for f in item.futures:
+                    if not f.done():
+                        f.set_exception(e)
+        else:
+            self.stats["sent"] += 1
+            for f in item.futures:
+                if not f.done():
+                    f.set_result(result)
+        finally:
+            chat.busy = False
+            if chat.items:
+                self.ready.append(chat)
+            self._wakeup.set()
+
+    def _prune(self):
+        """清理已经空闲且令牌已补满的会话, 避免会话数量无限增长"""
+        now = self.clock()
+        for key in [
+            key
+            for key, chat in self.chats.items()
+            if not chat.items
+            and not chat.busy
+            and chat.blocked_until <= now
+            and chat.bucket.is_full(now)
+        ]:
+            del self.chats[key]
+
+
+class OutboundDispatcher:
+    """按平台实例管理 SendScheduler, 并读取 platform_settings.send_scheduler 配置"""
+
+    def __init__(self):
+        self.enable = True
+        self.merge_text = True
+        self.global_rate = 0.0
+        self.chat_rate = 0.0
+        self._schedulers: Dict[str, SendScheduler] = {}
+
+    def configure(self, cfg: dict):
+        self.enable = cfg.get("enable", True)
+        self.merge_text = cfg.get("merge_text", True)
+        self.global_rate = float(cfg.get("global_rate", 0) or 0)
+        self.chat_rate = float(cfg.get("chat_rate", 0) or 0)
+        self._schedulers.clear()
+
+    def _rate_limit(self, platform_name: str) -> Optional[RateLimit]:
+        limit = PLATFORM_RATE_LIMITS.get(platform_name, DEFAULT_RATE_LIMIT)
+        if limit is None:
+            return None
+        if self.global_rate > 0 or self.chat_rate > 0:
+            limit = RateLimit(
+                self.global_rate or limit.global_rate,
+                max(limit.global_burst, math.ceil(self.global_rate)),
+                self.chat_rate or limit.chat_rate,
+                limit.chat_burst,
+            )
+        return limit
+
+    def get_scheduler(self, platform_meta) -> Optional[SendScheduler]:
+        if not self.enable:
+            return None
+        key = platform_meta.id or platform_meta.name
+        scheduler = self._schedulers.get(key)
+        if scheduler and scheduler.loop is asyncio.get_running_loop():
+            return scheduler
+        limit = self._rate_limit(platform_meta.name)
+        if limit is None:
+            return None
+        scheduler = SendScheduler(limit, merge_text=self.merge_text)
+        self._schedulers[key] = scheduler
+        return scheduler
+
+    def enqueue(self, event, message: MessageChain, send_func: SendFunc):
+        """将消息放入出站队列并立即返回一个 Future。不经过调度器时返回 None"""
+        if _dispatching.get() is not None:
+            return None
+        scheduler = self.get_scheduler(event.platform_meta)
+        if scheduler is None:
+            return None
+        return scheduler.enqueue(event.unified_msg_origin, event, message, send_func)
+
+    async def send(self, event, message: MessageChain, send_func: SendFunc):
+        fut = self.enqueue(event, message, send_func)
+        if fut is None:
+            return await send_func(message)
+        return await fut
+
+    async def throttle(self, fallback_interval: float):
+        """适配器在一次 send() 中多次调用平台接口之间调用。
+        处于调度器发送中时获取一次发送额度, 否则按原来的固定间隔等待。
+        """
+        current = _dispatching.get()
+        if current is None:
+            await asyncio.sleep(fallback_interval)
+            return
+        scheduler, chat_key = current
+        await scheduler.acquire(chat_key)
+
+    async def pace(self, fallback_interval: float):
+        """连续发送多条消息之间调用。启用调度器时由调度器限速, 否则按原来的固定间隔等待"""
+        if not self.enable:
+            await asyncio.sleep(fallback_interval)
+
+
+outbound_dispatcher = OutboundDispatcher()
+
+
+def dispatched(send):
+    """包装适配器的 send() 方法, 使其经过出站调度器"""
+
+    @functools.wraps(send)
+    async def wrapper(self, message: MessageChain, *args, **kwargs):
+        return await outbound_dispatcher.send(
+            self, message, lambda m: send(self, m, *args, **kwargs)
+        )
+
+    return wrapper
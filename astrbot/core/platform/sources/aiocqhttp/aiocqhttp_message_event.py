@@ -1,59 +1,50 @@
-import asyncio
 import re
 from typing import AsyncGenerator, Dict, List
 from aiocqhttp import CQHttp
 from astrbot.api.event import AstrMessageEvent, MessageChain
-from astrbot.api.message_components import At, Image, Node, Nodes, Plain, Record
+from astrbot.api.message_components import Node, Nodes, Plain
 from astrbot.api.platform import Group, MessageMember
+from astrbot.core.platform.send_scheduler import outbound_dispatcher
+from .onebot_serializer import OneBotSerializer
+
+_default_serializer = OneBotSerializer()
 
 
 class AiocqhttpMessageEvent(AstrMessageEvent):
     def __init__(
-        self, message_str, message_obj, platform_meta, session_id, bot: CQHttp
+        self,
+        message_str,
+        message_obj,
+        platform_meta,
+        session_id,
+        bot: CQHttp,
+        serializer: OneBotSerializer = None,
     ):
         super().__init__(message_str, message_obj, platform_meta, session_id)
         self.bot = bot
+        self.serializer = serializer or _default_serializer
 
     @staticmethod
     async def _parse_onebot_json(message_chain: MessageChain):
         """解析成 OneBot json 格式"""
-        ret = []
-        for segment in message_chain.chain:
-            d = segment.toDict()
-            if isinstance(segment, Plain):
-                d["type"] = "text"
-                d["data"]["text"] = segment.text.strip()
-                # 如果是空文本或者只带换行符的文本，不发送
-                if not d["data"]["text"]:
-                    continue
-            elif isinstance(segment, (Image, Record)):
-                # convert to base64
-                bs64 = await segment.convert_to_base64()
-                d["data"] = {
-                    "file": f"base64://{bs64}",
-                }
-            elif isinstance(segment, At):
-                d["data"] = {
-                    "qq": str(segment.qq)  # 转换为字符串
-                }
-            ret.append(d)
-        return ret
+        return await _default_serializer.to_message(message_chain)
 
     async def send(self, message: MessageChain):
-        ret = await AiocqhttpMessageEvent._parse_onebot_json(message)
+        # 每个消息段只序列化一次, 分段发送时直接复用
+        segments = await self.serializer.serialize(message)
 
-        if not ret:
+        if not segments:
             return
 
         send_one_by_one = False
-        for seg in message.chain:
+        for seg, _ in segments:
             if isinstance(seg, (Node, Nodes)):
                 # 转发消息不能和普通消息混在一起发送
                 send_one_by_one = True
                 break
 
         if send_one_by_one:
-            for seg in message.chain:
+            for seg, d in segments:
                 if isinstance(seg, (Node, Nodes)):
                     # 合并转发消息
 
@@ -71,15 +62,10 @@ class AiocqhttpMessageEvent(AstrMessageEvent):
                             "send_private_forward_msg", **payload
                         )
                 else:
-                    await self.bot.send(
-                        self.message_obj.raw_message,
-                        await AiocqhttpMessageEvent._parse_onebot_json(
-                            MessageChain([seg])
-                        ),
-                    )
-                    await asyncio.sleep(0.5)
+                    await self.bot.send(self.message_obj.raw_message, [d])
+                    await outbound_dispatcher.throttle(0.5)
         else:
-            await self.bot.send(self.message_obj.raw_message, ret)
+            await self.bot.send(self.message_obj.raw_message, [d for _, d in segments])
 
         await super().send(message)
 
@@ -111,7 +97,7 @@ class AiocqhttpMessageEvent(AstrMessageEvent):
                             buffer = await self.process_buffer(buffer, pattern)
                     else:
                         await self.send(MessageChain(chain=[comp]))
-                        await asyncio.sleep(1.5)  # 限速
+                        await outbound_dispatcher.pace(1.5)  # 限速
 
         if buffer.strip():
             await self.send(MessageChain([Plain(buffer)]))
@@ -1,6 +1,8 @@
 import os
 import time
 import asyncio
+import copy
+import functools
 import logging
 import uuid
 from typing import Awaitable, Any
@@ -16,7 +18,10 @@ from astrbot.api.event import MessageChain
 from .aiocqhttp_message_event import *  # noqa: F403
 from astrbot.api.message_components import *  # noqa: F403
 from astrbot.api import logger
+from astrbot.core.log import lazy_repr
 from .aiocqhttp_message_event import AiocqhttpMessageEvent
+from .onebot_serializer import OneBotSerializer
+from .reply_cache import ReplyCache
 from astrbot.core.platform.astr_message_event import MessageSesion
 from ...register import register_platform_adapter
 from aiocqhttp.exceptions import ActionFailed
@@ -37,6 +42,10 @@ class AiocqhttpAdapter(Platform):
         self.unique_session = platform_settings["unique_session"]
         self.host = platform_config["ws_reverse_host"]
         self.port = platform_config["ws_reverse_port"]
+        self.serializer = OneBotSerializer(
+            platform_config.get("onebot_file_mode", "base64")
+        )
+        self.reply_cache = ReplyCache()
 
         self.metadata = PlatformMetadata(
             name="aiocqhttp",
@@ -79,7 +88,7 @@ class AiocqhttpAdapter(Platform):
     async def send_by_session(
         self, session: MessageSesion, message_chain: MessageChain
     ):
-        ret = await AiocqhttpMessageEvent._parse_onebot_json(message_chain)
+        ret = await self.serializer.to_message(message_chain)
         match session.message_type.value:
             case MessageType.GROUP_MESSAGE.value:
                 if "_" in session.session_id:
@@ -95,7 +104,7 @@ class AiocqhttpAdapter(Platform):
         await super().send_by_session(session, message_chain)
 
     async def convert_message(self, event: Event) -> AstrBotMessage:
-        logger.debug(f"[aiocqhttp] RawMessage {event}")
+        logger.debug("[aiocqhttp] RawMessage %s", lazy_repr(event))
 
         if event["post_type"] == "message":
             abm = await self._convert_handle_message_event(event)
@@ -251,26 +260,17 @@ class AiocqhttpAdapter(Platform):
                     abm.message.append(a)
                 else:
                     try:
-                        reply_event_data = await self.bot.call_action(
-                            action="get_msg",
-                            message_id=int(m["data"]["id"]),
-                        )
-                        abm_reply = await self._convert_handle_message_event(
-                            Event.from_payload(reply_event_data), get_reply=False
+                        abm_reply = await self.reply_cache.get_or_fetch(
+                            str(m["data"]["id"]),
+                            functools.partial(self._fetch_reply, m["data"]["id"]),
                         )
-
-                        reply_seg = Reply(
-                            id=abm_reply.message_id,
-                            chain=abm_reply.message,
-                            sender_id=abm_reply.sender.user_id,
-                            sender_nickname=abm_reply.sender.nickname,
-                            time=abm_reply.timestamp,
-                            message_str=abm_reply.message_str,
-                            text=abm_reply.message_str,  # for compatibility
-                            qq=abm_reply.sender.user_id,  # for compatibility
+                        abm.message.append(self._build_reply(abm_reply))
+                    except asyncio.TimeoutError:
+                        logger.warning(
+                            f"获取引用消息 {m['data']['id']} 超时，将只保留引用消息 ID。"
                         )
-
-                        abm.message.append(reply_seg)
+                        a = ComponentTypes[t](**m["data"])  # noqa: F405
+                        abm.message.append(a)
                     except BaseException as e:
                         logger.error(f"获取引用消息失败: {e}。")
                         a = ComponentTypes[t](**m["data"])  # noqa: F405
@@ -283,8 +283,41 @@ class AiocqhttpAdapter(Platform):
         abm.message_str = message_str
         abm.raw_message = event
 
+        if get_reply:
+            # abm 之后会交给管道处理并可能被修改, 缓存它的浅拷贝
+            cached = copy.copy(abm)
+            cached.message = list(abm.message)
+            self.reply_cache.put(abm.message_id, cached)
+
         return abm
 
+    async def _fetch_reply(self, message_id) -> AstrBotMessage:
+        reply_event_data = await self.bot.call_action(
+            action="get_msg",
+            message_id=int(message_id),
+        )
+        return await self._convert_handle_message_event(
+            Event.from_payload(reply_event_data), get_reply=False
+        )
+
+    @staticmethod
+    def _build_reply(abm_reply: AstrBotMessage) -> Reply:
+        # 只保留一层引用, 被引用消息中的引用消息段不再展开
+        chain = [
+            Reply(id=seg.id) if isinstance(seg, Reply) else seg
+            for seg in abm_reply.message
+        ]
+        return Reply(
+            id=abm_reply.message_id,
+            chain=chain,
+            sender_id=abm_reply.sender.user_id,
+            sender_nickname=abm_reply.sender.nickname,
+            time=abm_reply.timestamp,
+            message_str=abm_reply.message_str,
+            text=abm_reply.message_str,  # for compatibility
+            qq=abm_reply.sender.user_id,  # for compatibility
+        )
+
     def run(self) -> Awaitable[Any]:
         if not self.host or not self.port:
             logger.warning(
@@ -322,6 +355,7 @@ class AiocqhttpAdapter(Platform):
             platform_meta=self.meta(),
             session_id=message.session_id,
             bot=self.bot,
+            serializer=self.serializer,
         )
 
         self.commit_event(message_event)
@@ -0,0 +1,96 @@
+"""
+OneBot v11 消息段序列化
+
+一条消息链只序列化一次: 每个消息段的 OneBot dict 只构建一次, 分段发送(如包含合并转发的消息链)时直接复用。
+图片和语音的 base64 编码缓存在组件上, 同一个组件再次发送时不会重新读取文件。
+
+当 OneBot 实现(NapCat、Lagrange 等)与 AstrBot 共享文件系统时, 可以把 file_mode 设为 path,
+本地文件以 file:/// 路径发送, 网络图片直接发送 URL, 由 OneBot 实现自行读取, 不再内联 base64。
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+from astrbot.api.message_components import (
+    At,
+    BaseMessageComponent,
+    Image,
+    Plain,
+    Record,
+)
+from astrbot.core.message.message_event_result import MessageChain
+
+FILE_MODE_BASE64 = "base64"
+FILE_MODE_PATH = "path"
+
+
+def _local_path(src: str) -> Optional[str]:
+    """如果 src 指向存在的本地文件, 返回其绝对路径"""
+    if src.startswith("file:///"):
+        # 与 convert_to_file_path 一致地去掉前缀, 同时兼容标准的 file:///abs/path 写法
+        candidates = [src[8:], "/" + src[8:]]
+    elif "://" in src:
+        return None
+    else:
+        candidates = [src]
+    for path in candidates:
+        if path and os.path.isfile(path):
+            return os.path.abspath(path)
+    return None
+
+
+class OneBotSerializer:
+    """
+    Args:
+        file_mode (str): 图片、语音的发送方式。base64: 内联 base64 编码; path: 发送本地路径或 URL,
+            要求 OneBot 实现能访问 AstrBot 的文件系统
+    """
+
+    def __init__(self, file_mode: str = FILE_MODE_BASE64):
+        self.file_mode = file_mode
+
+    async def _file_field(self, segment: Image | Record) -> str:
+        if self.file_mode == FILE_MODE_PATH:
+            if isinstance(segment, Image):
+                src = segment.url or segment.file or ""
+            else:
+                src = segment.file or ""
+            if src.startswith(("http://", "https://", "base64://")):
+                return src
+            path = _local_path(src)
+            if path:
+                return "file:///" + path.lstrip("/")
+        bs64 = await segment.convert_to_base64()
+        return f"base64://{bs64}"
+
+    async def serialize_segment(self, segment: BaseMessageComponent) -> Optional[dict]:
+        """返回消息段的 OneBot dict, 不需要发送的消息段(如空文本)返回 None"""
+        if isinstance(segment, Plain):
+            text = segment.text.strip()
+            # 如果是空文本或者只带换行符的文本，不发送
+            if not text:
+                return None
+            return {"type": "text", "data": {"text": text}}
+        if isinstance(segment, (Image, Record)):
+            return {
+                "type": segment.type.lower(),
+                "data": {"file": await self._file_field(segment)},
+            }
+        if isinstance(segment, At):
+            return {"type": "at", "data": {"qq": str(segment.qq)}}  # 转换为字符串
+        return segment.toDict()
+
+    async def serialize(
+        self, message_chain: MessageChain
+    ) -> List[Tuple[BaseMessageComponent, dict]]:
+        """逐个序列化消息段, 返回 (消息段, OneBot dict) 列表, 已跳过不需要发送的消息段"""
+        ret = []
+        for segment in message_chain.chain:
+            d = await self.serialize_segment(segment)
+            if d is not None:
+                ret.append((segment, d))
+        return ret
+
+    async def to_message(self, message_chain: MessageChain) -> List[dict]:
+        """序列化为可以直接发送的 OneBot 消息段列表"""
+        return [d for _, d in await self.serialize(message_chain)]
@@ -0,0 +1,79 @@
+"""
+引用消息缓存
+
+消息中包含引用(reply)消息段时, 适配器需要调用 get_msg 获取并转换被引用的消息。
+群聊中同一条热门消息经常被多次引用, 这里缓存最近收到或获取过的消息:
+
+1. 收到的消息和 get_msg 的结果都会放入 LRU 缓存, 引用它们时不再请求协议端
+2. 同一条消息的并发获取只请求一次
+3. 获取超时后调用方退回到只包含 id 的引用消息段, 获取仍在后台继续, 完成后放入缓存
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from astrbot.core.platform.astrbot_message import AstrBotMessage
+
+
+class ReplyCache:
+    """
+    Args:
+        max_entries (int): 最多缓存的消息数量, 超出后淘汰最久未使用的
+        timeout (float): 等待 get_msg 的最长时间(秒)
+    """
+
+    def __init__(self, max_entries: int = 512, timeout: float = 5.0):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries: OrderedDict[str, AstrBotMessage] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, message_id: str) -> Optional[AstrBotMessage]:
+        abm = self._entries.get(message_id)
+        if abm is not None:
+            self._entries.move_to_end(message_id)
+        return abm
+
+    def put(self, message_id: str, abm: AstrBotMessage):
+        self._entries[message_id] = abm
+        self._entries.move_to_end(message_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _fetch(
+        self, message_id: str, fetch: Callable[[], Awaitable[AstrBotMessage]]
+    ) -> AstrBotMessage:
+        try:
+            abm = await fetch()
+            if abm is not None:
+                self.put(message_id, abm)
+            return abm
+        finally:
+            self._inflight.pop(message_id, None)
+
+    async def get_or_fetch(
+        self, message_id: str, fetch: Callable[[], Awaitable[AstrBotMessage]]
+    ) -> AstrBotMessage:
+        """返回缓存的消息, 没有时调用 fetch() 获取并转换。
+
+        Raises:
+            asyncio.TimeoutError: 超过 timeout 秒仍未获取到
+        """
+        abm = self.get(message_id)
+        if abm is not None:
+            self.hits += 1
+            return abm
+
+        task = self._inflight.get(message_id)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._fetch(message_id, fetch))
+            # 所有等待者都超时后没有人取走异常
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[message_id] = task
+        else:
+            self.hits += 1
+        return await asyncio.wait_for(asyncio.shield(task), self.timeout)
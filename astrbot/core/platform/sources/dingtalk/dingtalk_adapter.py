@@ -14,6 +14,7 @@ from astrbot.api.platform import (
 from astrbot.api.event import MessageChain
 from astrbot.api.message_components import Image, Plain, At
 from astrbot.core.platform.astr_message_event import MessageSesion
+from astrbot.core.platform.token_manager import TokenManager, fetch_token_json
 from .dingtalk_event import DingtalkMessageEvent
 from ...register import register_platform_adapter
 from astrbot import logger
@@ -46,6 +47,7 @@ class DingtalkPlatformAdapter(Platform):
 
         self.client_id = platform_config["client_id"]
         self.client_secret = platform_config["client_secret"]
+        self.token_manager = TokenManager("dingtalk", self._fetch_access_token)
 
         class AstrCallbackClient(dingtalk_stream.ChatbotHandler):
             async def process(self_, message: dingtalk_stream.CallbackMessage):
@@ -169,22 +171,21 @@ class DingtalkPlatformAdapter(Platform):
                 await download_file(download_url, f_path)
         return f_path
 
+    async def _fetch_access_token(self):
+        return await fetch_token_json(
+            "https://api.dingtalk.com/v1.0/oauth2/accessToken",
+            {"appKey": self.client_id, "appSecret": self.client_secret},
+            "accessToken",
+            "expireIn",
+        )
+
     async def get_access_token(self) -> str:
-        payload = {
-            "appKey": self.client_id,
-            "appSecret": self.client_secret,
-        }
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.dingtalk.com/v1.0/oauth2/accessToken",
-                json=payload,
-            ) as resp:
-                if resp.status != 200:
-                    logger.error(
-                        f"获取钉钉机器人 access_token 失败: {resp.status}, {await resp.text()}"
-                    )
-                    return None
-                return (await resp.json())["data"]["accessToken"]
+        """获取钉钉机器人 access_token。token 有效期为 2 小时, 在有效期内会复用"""
+        try:
+            return await self.token_manager.get_token()
+        except Exception as e:
+            logger.error(f"获取钉钉机器人 access_token 失败: {e}")
+            return None
 
     async def handle_msg(self, abm: AstrBotMessage):
         event = DingtalkMessageEvent(
@@ -223,6 +224,7 @@ class DingtalkPlatformAdapter(Platform):
         self.client_.open_connection = monkey_patch_close
         await self.client_.websocket.close(code=1000, reason="Graceful shutdown")
         self._shutdown_event.set()
+        await self.token_manager.close()
 
     def get_client(self):
         return self.client
@@ -1,4 +1,3 @@
-import asyncio
 import re
 import wave
 import uuid
@@ -11,6 +10,7 @@ from astrbot.core.utils.tencent_record_helper import wav_to_tencent_silk
 from astrbot.api import logger
 from astrbot.api.event import AstrMessageEvent, MessageChain
 from astrbot.api.platform import AstrBotMessage, PlatformMetadata, Group, MessageMember
+from astrbot.core.platform.send_scheduler import outbound_dispatcher
 from astrbot.api.message_components import (
     Plain,
     Image,
@@ -248,7 +248,7 @@ class GewechatPlatformEvent(AstrMessageEvent):
                             buffer = await self.process_buffer(buffer, pattern)
                     else:
                         await self.send(MessageChain(chain=[comp]))
-                        await asyncio.sleep(1.5)  # 限速
+                        await outbound_dispatcher.pace(1.5)  # 限速
 
         if buffer.strip():
             await self.send(MessageChain([Plain(buffer)]))
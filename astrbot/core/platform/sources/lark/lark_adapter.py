@@ -14,6 +14,7 @@ from astrbot.api.platform import (
 )
 from astrbot.api.event import MessageChain
 from astrbot.core.platform.astr_message_event import MessageSesion
+from astrbot.core.platform.media_cache import get_media_cache
 from .lark_event import LarkMessageEvent
 from ...register import register_platform_adapter
 from astrbot import logger
@@ -67,7 +68,9 @@ class LarkPlatformAdapter(Platform):
     async def send_by_session(
         self, session: MessageSesion, message_chain: MessageChain
     ):
-        res = await LarkMessageEvent._convert_to_lark(message_chain, self.lark_api)
+        res = await LarkMessageEvent._convert_to_lark(
+            message_chain, self.lark_api, get_media_cache(self.meta().id or "lark")
+        )
         wrapped = {
             "zh_cn": {
                 "title": "",
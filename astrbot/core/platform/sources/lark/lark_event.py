@@ -7,6 +7,7 @@ from typing import List
 from astrbot.api.event import AstrMessageEvent, MessageChain
 from astrbot.api.message_components import Plain, Image as AstrBotImage, At
 from astrbot.core.utils.io import download_image_by_url
+from astrbot.core.platform.media_cache import MediaHandleCache, get_media_cache
 from lark_oapi.api.im.v1 import *
 from astrbot import logger
 
@@ -19,7 +20,11 @@ class LarkMessageEvent(AstrMessageEvent):
         self.bot = bot
 
     @staticmethod
-    async def _convert_to_lark(message: MessageChain, lark_client: lark.Client) -> List:
+    async def _convert_to_lark(
+        message: MessageChain,
+        lark_client: lark.Client,
+        media_cache: MediaHandleCache = None,
+    ) -> List:
         ret = []
         _stage = []
         for comp in message.chain:
@@ -29,7 +34,6 @@ class LarkMessageEvent(AstrMessageEvent):
                 _stage.append({"tag": "at", "user_id": comp.qq, "style": []})
             elif isinstance(comp, AstrBotImage):
                 file_path = ""
-                image_file = None
 
                 if comp.file and comp.file.startswith("file:///"):
                     file_path = comp.file.replace("file:///", "")
@@ -46,24 +50,36 @@ class LarkMessageEvent(AstrMessageEvent):
                 else:
                     file_path = comp.file
 
-                if image_file is None:
-                    image_file = open(file_path, "rb")
+                async def upload():
+                    with open(file_path, "rb") as image_file:
+                        request = (
+                            CreateImageRequest.builder()
+                            .request_body(
+                                CreateImageRequestBody.builder()
+                                .image_type("message")
+                                .image(image_file)
+                                .build()
+                            )
+                            .build()
+                        )
+                        response = await lark_client.im.v1.image.acreate(request)
+                    if not response.success():
+                        logger.error(
+                            f"无法上传飞书图片({response.code}): {response.msg}"
+                        )
+                        return None
+                    return response.data.image_key
 
-                request = (
-                    CreateImageRequest.builder()
-                    .request_body(
-                        CreateImageRequestBody.builder()
-                        .image_type("message")
-                        .image(image_file)
-                        .build()
-                    )
-                    .build()
-                )
-                response = await lark_client.im.v1.image.acreate(request)
-                if not response.success():
-                    logger.error(f"无法上传飞书图片({response.code}): {response.msg}")
-                image_key = response.data.image_key
+                if media_cache is not None:
+                    # 飞书的 image_key 长期有效, 相同图片只上传一次
+                    with open(file_path, "rb") as f:
+                        key = media_cache.make_key(f.read(), "image")
+                    image_key = await media_cache.get_or_upload(key, upload)
+                else:
+                    image_key = await upload()
                 logger.debug(image_key)
+                if not image_key:
+                    continue
                 ret.append(_stage)
                 ret.append([{"tag": "img", "image_key": image_key}])
                 _stage.clear()
@@ -75,7 +91,11 @@ class LarkMessageEvent(AstrMessageEvent):
         return ret
 
     async def send(self, message: MessageChain):
-        res = await LarkMessageEvent._convert_to_lark(message, self.bot)
+        res = await LarkMessageEvent._convert_to_lark(
+            message,
+            self.bot,
+            get_media_cache(self.platform_meta.id or self.platform_meta.name),
+        )
         wrapped = {
             "zh_cn": {
                 "title": "",
@@ -0,0 +1,32 @@
+from botpy import Token
+from astrbot.core.platform.token_manager import TokenManager, fetch_token_json
+
+QQ_TOKEN_URL = "https://bots.qq.com/app/getAppAccessToken"
+
+
+class ManagedToken(Token):
+    """由 TokenManager 管理 access_token 的 botpy Token。
+
+    botpy 自带的 Token 在过期的那一刻才刷新, 并发请求会各自刷新一次。这里改为提前刷新, 并合并并发的刷新请求。
+    """
+
+    def __init__(self, app_id: str, secret: str, token_url: str = QQ_TOKEN_URL):
+        super().__init__(app_id, secret)
+        self.token_url = token_url
+        self.manager = TokenManager("qq_official", self._fetch)
+
+    async def _fetch(self):
+        return await fetch_token_json(
+            self.token_url,
+            {"appId": self.app_id, "clientSecret": self.secret},
+            "access_token",
+            "expires_in",
+        )
+
+    async def check_token(self):
+        self.access_token = await self.manager.get_token()
+        self.expires_in = int(self.manager.expires_at)
+
+    async def update_access_token(self):
+        self.manager.invalidate()
+        await self.check_token()
@@ -4,6 +4,7 @@ import botpy.types
 import botpy.types.message
 import asyncio
 from astrbot.core.utils.io import file_to_base64, download_image_by_url
+from astrbot.core.platform.media_cache import get_media_cache
 from astrbot.api.event import AstrMessageEvent, MessageChain
 from astrbot.api.platform import AstrBotMessage, PlatformMetadata
 from astrbot.api.message_components import Plain, Image
@@ -148,6 +149,22 @@ class QQOfficialMessageEvent(AstrMessageEvent):
 
     async def upload_group_and_c2c_image(
         self, image_base64: str, file_type: int, **kwargs
+    ) -> botpy.types.message.Media:
+        """上传富媒体文件。file_info 只能发送给上传时指定的用户或群, 在平台返回的 ttl 内复用"""
+        cache = get_media_cache(self.platform_meta.id or self.platform_meta.name)
+        key = cache.make_key(
+            image_base64.encode(),
+            str(file_type),
+            kwargs.get("openid") or kwargs.get("group_openid"),
+        )
+        return await cache.get_or_upload(
+            key,
+            lambda: self._upload_group_and_c2c_image(image_base64, file_type, **kwargs),
+            ttl_of=lambda media: media.get("ttl") if isinstance(media, dict) else None,
+        )
+
+    async def _upload_group_and_c2c_image(
+        self, image_base64: str, file_type: int, **kwargs
     ) -> botpy.types.message.Media:
         payload = {
             "file_data": image_base64,
@@ -23,6 +23,7 @@ from typing import Union, List
 from astrbot.api.message_components import Image, Plain, At
 from astrbot.core.platform.astr_message_event import MessageSesion
 from .qqofficial_message_event import QQOfficialMessageEvent
+from .managed_token import ManagedToken
 from ...register import register_platform_adapter
 from astrbot.core.message.components import BaseMessageComponent
 
@@ -36,6 +37,14 @@ class botClient(Client):
     def set_platform(self, platform: "QQOfficialPlatformAdapter"):
         self.platform = platform
 
+    # 使用 ManagedToken 替换 botpy 在 start() 中创建的 Token
+    async def _bot_login(self, token):
+        self._managed_token = ManagedToken(token.app_id, token.secret)
+        await super()._bot_login(self._managed_token)
+
+    async def _bot_init(self, token):
+        return await super()._bot_init(self._managed_token)
+
     # 收到群消息
     async def on_group_at_message_create(self, message: botpy.message.GroupMessage):
         abm = QQOfficialPlatformAdapter._parse_from_qqofficial(
@@ -1,8 +1,9 @@
 import quart
 import logging
 import asyncio
-from botpy import BotAPI, BotHttp, Client, Token, BotWebSocket, ConnectionSession
+from botpy import BotAPI, BotHttp, Client, BotWebSocket, ConnectionSession
 from astrbot.api import logger
+from astrbot.core.platform.sources.qqofficial.managed_token import ManagedToken
 from cryptography.hazmat.primitives.asymmetric import ed25519
 
 # remove logger handler
@@ -22,7 +23,7 @@ class QQOfficialWebhook:
 
         self.http: BotHttp = BotHttp(timeout=300)
         self.api: BotAPI = BotAPI(http=self.http)
-        self.token = Token(self.appid, self.secret)
+        self.token = ManagedToken(self.appid, self.secret)
 
         self.server = quart.Quart(__name__)
         self.server.add_url_rule(
@@ -19,6 +19,7 @@ from astrbot.api.platform import register_platform_adapter
 from astrbot.core import logger
 from astrbot.core.platform.astr_message_event import MessageSesion
 from astrbot.core.platform.sources.wcf.client import SimpleWcfClient
+from astrbot.core.utils.media_worker import convert_audio
 from .wcf_event import WcfPlatformEvent
 
 if sys.version_info >= (3, 12):
@@ -180,11 +181,8 @@ class WcfPlatformAdapter(Platform):
                 f.write(resp.content)
 
             try:
-                from pydub import AudioSegment
-
                 path_wav = f"data/temp/wecom_{msg.media_id}.wav"
-                audio = AudioSegment.from_file(path)
-                audio.export(path_wav, format="wav")
+                await convert_audio(path, path_wav, "wav")
             except Exception as e:
                 logger.error(f"转换音频失败: {e}。如果没有安装 ffmpeg 请先安装。")
                 path_wav = path
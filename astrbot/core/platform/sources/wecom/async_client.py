@@ -0,0 +1,53 @@
+import asyncio
+from requests import Response
+from wechatpy.enterprise import WeChatClient
+from astrbot.core.platform.token_manager import TokenManager
+
+
+class AsyncWecomClient:
+    """wechatpy 企业微信客户端的异步包装。
+
+    wechatpy 使用同步的 requests 发起请求, 这里把每次调用放到线程池中执行, 避免阻塞事件循环。
+    access_token 由 TokenManager 提前刷新, 避免多个线程在 token 过期时各自重新获取。
+    """
+
+    def __init__(self, client: WeChatClient):
+        self.client = client
+        # wechatpy 在距离过期不足 60 秒时会自行刷新, 这里需要更早
+        self.token_manager = TokenManager("wecom", self._fetch_token, min_valid=90)
+
+    async def _fetch_token(self):
+        # fetch_access_token 会同时把 token 保存到 wechatpy 的 session 中
+        ret = await asyncio.to_thread(self.client.fetch_access_token)
+        return ret["access_token"], ret["expires_in"]
+
+    async def _call(self, func, *args):
+        await self.token_manager.get_token()
+        return await asyncio.to_thread(func, *args)
+
+    async def send_text(self, agent_id: str, user_id: str, content: str) -> dict:
+        return await self._call(
+            self.client.message.send_text, agent_id, user_id, content
+        )
+
+    async def send_image(self, agent_id: str, user_id: str, media_id: str) -> dict:
+        return await self._call(
+            self.client.message.send_image, agent_id, user_id, media_id
+        )
+
+    async def send_voice(self, agent_id: str, user_id: str, media_id: str) -> dict:
+        return await self._call(
+            self.client.message.send_voice, agent_id, user_id, media_id
+        )
+
+    async def upload_media(self, media_type: str, path: str) -> dict:
+        """上传临时素材, 文件的读取也在线程中完成"""
+
+        def _upload():
+            with open(path, "rb") as f:
+                return self.client.media.upload(media_type, f)
+
+        return await self._call(_upload)
+
+    async def download_media(self, media_id: str) -> Response:
+        return await self._call(self.client.media.download, media_id)
@@ -23,6 +23,8 @@ from wechatpy.enterprise.messages import TextMessage, ImageMessage, VoiceMessage
 from wechatpy.exceptions import InvalidSignatureException
 from wechatpy.enterprise import parse_message
 from .wecom_event import WecomPlatformEvent
+from .async_client import AsyncWecomClient
+from astrbot.core.utils.media_worker import convert_audio
 
 if sys.version_info >= (3, 12):
     from typing import override
@@ -132,6 +134,7 @@ class WecomPlatformAdapter(Platform):
             self.config["secret"].strip(),
         )
         self.client.API_BASE_URL = self.api_base_url
+        self.async_client = AsyncWecomClient(self.client)
 
         async def callback(msg):
             await self.convert_message(msg)
@@ -188,19 +191,14 @@ class WecomPlatformAdapter(Platform):
         elif msg.type == "voice":
             assert isinstance(msg, VoiceMessage)
 
-            resp: Response = await asyncio.get_event_loop().run_in_executor(
-                None, self.client.media.download, msg.media_id
-            )
+            resp: Response = await self.async_client.download_media(msg.media_id)
             path = f"data/temp/wecom_{msg.media_id}.amr"
             with open(path, "wb") as f:
                 f.write(resp.content)
 
             try:
-                from pydub import AudioSegment
-
                 path_wav = f"data/temp/wecom_{msg.media_id}.wav"
-                audio = AudioSegment.from_file(path)
-                audio.export(path_wav, format="wav")
+                await convert_audio(path, path_wav, "wav")
             except Exception as e:
                 logger.error(f"转换音频失败: {e}。如果没有安装 ffmpeg 请先安装。")
                 path_wav = path
@@ -229,6 +227,7 @@ class WecomPlatformAdapter(Platform):
             platform_meta=self.meta(),
             session_id=message.session_id,
             client=self.client,
+            async_client=self.async_client,
         )
         self.commit_event(message_event)
 
@@ -1,14 +1,18 @@
-import uuid
 import asyncio
+import uuid
 from astrbot.api.event import AstrMessageEvent, MessageChain
 from astrbot.api.platform import AstrBotMessage, PlatformMetadata
 from astrbot.api.message_components import Plain, Image, Record
 from wechatpy.enterprise import WeChatClient
+from astrbot.core.platform.media_cache import WECOM_MEDIA_TTL, get_media_cache
+from astrbot.core.platform.send_scheduler import outbound_dispatcher
+from astrbot.core.utils.media_worker import convert_audio
+from .async_client import AsyncWecomClient
 
 from astrbot.api import logger
 
 try:
-    import pydub
+    import pydub  # noqa: F401
 except Exception:
     logger.warning(
         "检测到 pydub 库未安装，企业微信将无法语音收发。如需使用语音，请前往管理面板 -> 控制台 -> 安装 Pip 库安装 pydub。"
@@ -24,9 +28,11 @@ class WecomPlatformEvent(AstrMessageEvent):
         platform_meta: PlatformMetadata,
         session_id: str,
         client: WeChatClient,
+        async_client: AsyncWecomClient = None,
     ):
         super().__init__(message_str, message_obj, platform_meta, session_id)
         self.client = client
+        self.async_client = async_client or AsyncWecomClient(client)
 
     @staticmethod
     async def send_with_client(
@@ -70,6 +76,47 @@ class WecomPlatformEvent(AstrMessageEvent):
 
             return result
 
+    @staticmethod
+    async def _wav_to_amr(record_path: str) -> str:
+        record_path_amr = f"data/temp/{uuid.uuid4()}.amr"
+        return await convert_audio(record_path, record_path_amr, "amr", "wav")
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def _send_media(self, media_type: str, path: str, send_func, convert=None):
+        """上传临时素材并发送。相同内容的 media_id 在有效期(3 天)内复用, 不再重复上传和转码
+
+        Args:
+            media_type (str): image 或 voice
+            path (str): 本地文件路径
+            send_func: 使用 media_id 发送消息的协程函数, 如 async_client.send_image
+            convert: 上传前对文件进行转换的协程函数, 返回转换后的文件路径
+        """
+        cache = get_media_cache(
+            self.platform_meta.id or self.platform_meta.name, WECOM_MEDIA_TTL
+        )
+        data = await asyncio.to_thread(self._read_file, path)
+        key = cache.make_key(data, media_type)
+
+        async def upload():
+            upload_path = await convert(path) if convert else path
+            response = await self.async_client.upload_media(media_type, upload_path)
+            logger.info(f"企业微信上传 {media_type} 返回: {response}")
+            return response["media_id"]
+
+        media_id = await cache.get_or_upload(key, upload)
+        try:
+            await send_func(
+                self.message_obj.self_id, self.message_obj.session_id, media_id
+            )
+        except Exception:
+            # media_id 可能已被平台提前回收, 下次发送时重新上传
+            cache.invalidate(key)
+            raise
+
     async def send(self, message: MessageChain):
         message_obj = self.message_obj
 
@@ -77,52 +124,40 @@ class WecomPlatformEvent(AstrMessageEvent):
             if isinstance(comp, Plain):
                 # Split long text messages if needed
                 plain_chunks = await self.split_plain(comp.text)
-                for chunk in plain_chunks:
-                    self.client.message.send_text(
+                for i, chunk in enumerate(plain_chunks):
+                    if i:
+                        await outbound_dispatcher.throttle(0.5)
+                    await self.async_client.send_text(
                         message_obj.self_id, message_obj.session_id, chunk
                     )
-                    await asyncio.sleep(0.5)  # Avoid sending too fast
             elif isinstance(comp, Image):
                 img_path = await comp.convert_to_file_path()
-
-                with open(img_path, "rb") as f:
-                    try:
-                        response = self.client.media.upload("image", f)
-                    except Exception as e:
-                        logger.error(f"企业微信上传图片失败: {e}")
-                        await self.send(
-                            MessageChain().message(f"企业微信上传图片失败: {e}")
-                        )
-                        return
-                    logger.info(f"企业微信上传图片返回: {response}")
-                    self.client.message.send_image(
-                        message_obj.self_id,
-                        message_obj.session_id,
-                        response["media_id"],
+                try:
+                    await self._send_media(
+                        "image", img_path, self.async_client.send_image
+                    )
+                except Exception as e:
+                    logger.error(f"企业微信上传图片失败: {e}")
+                    await self.send(
+                        MessageChain().message(f"企业微信上传图片失败: {e}")
                     )
+                    return
             elif isinstance(comp, Record):
                 record_path = await comp.convert_to_file_path()
-                # 转成amr
-                record_path_amr = f"data/temp/{uuid.uuid4()}.amr"
-                pydub.AudioSegment.from_wav(record_path).export(
-                    record_path_amr, format="amr"
-                )
-
-                with open(record_path_amr, "rb") as f:
-                    try:
-                        response = self.client.media.upload("voice", f)
-                    except Exception as e:
-                        logger.error(f"企业微信上传语音失败: {e}")
-                        await self.send(
-                            MessageChain().message(f"企业微信上传语音失败: {e}")
-                        )
-                        return
-                    logger.info(f"企业微信上传语音返回: {response}")
-                    self.client.message.send_voice(
-                        message_obj.self_id,
-                        message_obj.session_id,
-                        response["media_id"],
+                try:
+                    # 转成amr
+                    await self._send_media(
+                        "voice",
+                        record_path,
+                        self.async_client.send_voice,
+                        convert=self._wav_to_amr,
+                    )
+                except Exception as e:
+                    logger.error(f"企业微信上传语音失败: {e}")
+                    await self.send(
+                        MessageChain().message(f"企业微信上传语音失败: {e}")
                     )
+                    return
 
         await super().send(message)
 
@@ -0,0 +1,117 @@
+"""
+平台 access_token 管理器
+
+钉钉、QQ 官方、企业微信等平台的接口都需要 access_token, 一般有效期为 2 小时。TokenManager:
+
+1. 在有效期内缓存 token, 不再每次请求都重新获取
+2. 距离过期不足 refresh_before 秒时在后台提前刷新, 期间继续返回仍然有效的旧 token
+3. 同一时间的多个刷新请求合并为一次
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+import aiohttp
+
+from astrbot.core import logger
+
+TokenFetcher = Callable[[], Awaitable[Tuple[str, float]]]
+"""获取新 token 的协程函数, 返回 (token, 有效期秒数)"""
+
+
+class TokenManager:
+    """
+    Args:
+        name (str): 名称, 用于日志
+        fetcher (TokenFetcher): 获取新 token 的协程函数
+        refresh_before (float): 距离过期不足该秒数时在后台提前刷新
+        min_valid (float): 距离过期不足该秒数时视为已过期, 需要等待刷新完成
+        retry_interval (float): 后台刷新失败后, 至少间隔该秒数再重试
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetcher: TokenFetcher,
+        refresh_before: float = 300,
+        min_valid: float = 30,
+        retry_interval: float = 10,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.name = name
+        self.fetcher = fetcher
+        self.refresh_before = refresh_before
+        self.min_valid = min_valid
+        self.retry_interval = retry_interval
+        self.clock = clock
+        self.token: Optional[str] = None
+        self.expires_at = 0.0
+        self.refresh_count = 0
+        self._refreshing: Optional[asyncio.Task] = None
+        self._next_retry = 0.0
+
+    async def get_token(self) -> str:
+        now = self.clock()
+        if self.token and now < self.expires_at - self.min_valid:
+            if now >= self.expires_at - self.refresh_before and now >= self._next_retry:
+                # 提前在后台刷新, 本次仍然返回旧 token
+                self._refresh()
+            return self.token
+        return await asyncio.shield(self._refresh())
+
+    def invalidate(self):
+        """平台提示 token 失效时调用, 下次 get_token() 会重新获取"""
+        self.token = None
+        self.expires_at = 0.0
+
+    def _refresh(self) -> asyncio.Task:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._do_refresh())
+            # 后台刷新失败时没有等待者, 在这里取走异常
+            self._refreshing.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._refreshing
+
+    async def _do_refresh(self) -> str:
+        try:
+            token, expires_in = await self.fetcher()
+        except Exception as e:
+            self._next_retry = self.clock() + self.retry_interval
+            logger.warning(f"刷新 {self.name} access_token 失败: {e}")
+            raise
+        self.token = token
+        self.expires_at = self.clock() + float(expires_in)
+        self.refresh_count += 1
+        logger.debug(f"已刷新 {self.name} access_token, 有效期 {expires_in} 秒")
+        return token
+
+    async def close(self):
+        if self._refreshing and not self._refreshing.done():
+            self._refreshing.cancel()
+
+
+async def fetch_token_json(
+    url: str,
+    payload: dict,
+    token_field: str,
+    expires_field: str,
+    timeout: float = 20,
+) -> Tuple[str, float]:
+    """POST JSON 获取 token 的通用实现。返回的 JSON 中没有对应字段时会在 data 字段中查找
+
+    Args:
+        token_field (str): token 的字段名
+        expires_field (str): 有效期(秒)的字段名
+    """
+    async with aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as session:
+        async with session.post(url, json=payload) as resp:
+            if resp.status != 200:
+                raise Exception(f"{resp.status}, {await resp.text()}")
+            data = await resp.json(content_type=None)
+    if token_field not in data and isinstance(data.get("data"), dict):
+        data = data["data"]
+    if token_field not in data:
+        raise Exception(f"返回结果中没有 {token_field}: {data}")
+    return data[token_field], float(data.get(expires_field, 7200))
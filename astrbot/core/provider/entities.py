@@ -4,7 +4,7 @@ import json
 from astrbot.core.utils.io import download_image_by_url
 from astrbot import logger
 from dataclasses import dataclass, field
-from typing import List, Dict, Type
+from typing import List, Dict, Type, Union
 from .func_tool_manager import FuncCall
 from openai.types.chat.chat_completion import ChatCompletion
 from openai.types.chat.chat_completion_message_tool_call import (
@@ -106,8 +106,11 @@ class ProviderRequest:
     """系统提示词"""
     conversation: Conversation = None
 
-    tool_calls_result: ToolCallsResult = None
-    """附加的上次请求后工具调用的结果。参考: https://platform.openai.com/docs/guides/function-calling#handling-function-calls"""
+    tool_calls_result: Union[ToolCallsResult, List[ToolCallsResult]] = None
+    """附加的上次请求后工具调用的结果。多步工具调用时为按顺序排列的每一步的结果。参考: https://platform.openai.com/docs/guides/function-calling#handling-function-calls"""
+
+    history_prompt: str = None
+    """写入对话历史的提示词。为 None 时使用 prompt。用于不保存只对本轮有效的附加内容(时间、群聊记录等)"""
 
     def __repr__(self):
         return f"ProviderRequest(prompt={self.prompt}, session_id={self.session_id}, image_urls={self.image_urls}, func_tool={self.func_tool}, contexts={self._print_friendly_context()}, system_prompt={self.system_prompt.strip()}, tool_calls_result={self.tool_calls_result})"
@@ -3,8 +3,10 @@ import json
 import textwrap
 import os
 import asyncio
+import bisect
 import copy
 import logging
+import time
 
 from typing import Dict, List, Awaitable, Literal, Any
 from dataclasses import dataclass
@@ -30,6 +32,11 @@ SUPPORTED_TYPES = [
 ]  # json schema 支持的数据类型
 
 
+_SCHEMA_FIELDS = frozenset({"name", "parameters", "description", "active"})
+_tool_state_version = 0
+"""FuncTool 中影响工具描述的字段被修改的次数"""
+
+
 @dataclass
 class FuncTool:
     """
@@ -48,6 +55,11 @@ class FuncTool:
     """
     active: bool = True
     """是否激活"""
+    concurrent: bool = True
+    """是否可以与同一轮的其他函数调用并发执行。
+
+    会通过 event 发送消息、设置结果或者修改共享状态的工具应当设置为 False。异步生成器形式的处理函数始终逐个执行。
+    """
 
     origin: Literal["local", "mcp"] = "local"
     """函数工具的来源, local 为本地函数工具, mcp 为 MCP 服务"""
@@ -58,6 +70,13 @@ class FuncTool:
     mcp_client: MCPClient = None
     """MCP 客户端，当 origin 为 mcp 时有效"""
 
+    def __setattr__(self, name, value):
+        if name in _SCHEMA_FIELDS:
+            # 工具的启停、描述或参数发生变化，使已缓存的工具描述失效
+            global _tool_state_version
+            _tool_state_version += 1
+        super().__setattr__(name, value)
+
     def __repr__(self):
         return f"FuncTool(name={self.name}, parameters={self.parameters}, description={self.description}, active={self.active}, origin={self.origin})"
 
@@ -74,13 +93,43 @@ class FuncTool:
             if ":" in self.name:
                 # 如果名字是格式为 mcp:server:tool_name，提取实际的工具名
                 actual_tool_name = self.name.split(":")[-1]
-                return await self.mcp_client.session.call_tool(actual_tool_name, args)
+                return await self.mcp_client.call_tool(actual_tool_name, args)
             else:
-                return await self.mcp_client.session.call_tool(self.name, args)
+                return await self.mcp_client.call_tool(self.name, args)
         else:
             raise Exception(f"Unknown function origin: {self.origin}")
 
 
+class LatencyHistogram:
+    """工具调用耗时的直方图"""
+
+    BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    """各个桶的上界(秒)，最后还有一个无上界的桶"""
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self.timeouts = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def to_dict(self) -> dict:
+        buckets = {f"<={b}s": c for b, c in zip(self.BUCKETS, self.counts)}
+        buckets[f">{self.BUCKETS[-1]}s"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg": self.sum / self.count if self.count else 0,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "buckets": buckets,
+        }
+
+
 class MCPClient:
     def __init__(self):
         # Initialize session and client objects
@@ -92,6 +141,16 @@ class MCPClient:
         self.tools: List[mcp.Tool] = []
         self.server_errlogs: List[str] = []
 
+        self.call_timeout: float = 60
+        """单次工具调用的超时时间(秒)，<= 0 为不限制"""
+        self.ping_interval: float = 30
+        """健康检查的间隔(秒)，<= 0 为不检查"""
+        self.max_concurrency: int = 4
+        """同时进行的工具调用数量上限"""
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.latency: Dict[str, LatencyHistogram] = {}
+        """各个工具的调用耗时"""
+
     async def connect_to_server(self, mcp_server_config: dict, name: str):
         """连接到 MCP 服务器
 
@@ -103,8 +162,14 @@ class MCPClient:
         cfg = mcp_server_config.copy()
         if "mcpServers" in cfg and len(cfg["mcpServers"]) > 0:
             key_0 = list(cfg["mcpServers"].keys())[0]
-            cfg = cfg["mcpServers"][key_0]
+            # 复制一份，下面的 pop 不能修改调用方的配置，否则重连时会丢失这些参数
+            cfg = cfg["mcpServers"][key_0].copy()
         cfg.pop("active", None)  # Remove active flag from config
+        # 由 AstrBot 使用的调用控制参数
+        self.call_timeout = float(cfg.pop("call_timeout", self.call_timeout))
+        self.ping_interval = float(cfg.pop("ping_interval", self.ping_interval))
+        self.max_concurrency = int(cfg.pop("max_concurrency", self.max_concurrency))
+        self._semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
 
         if "url" in cfg:
             # SSE transport method
@@ -152,20 +217,100 @@ class MCPClient:
         self.tools = response.tools
         return response
 
+    async def call_tool(self, name: str, args: dict) -> mcp.types.CallToolResult:
+        """在并发数和超时限制下调用工具，并记录耗时"""
+        if not self.session:
+            raise Exception(f"MCP 服务 {self.name} 当前不可用")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        histogram = self.latency.setdefault(name, LatencyHistogram())
+        async with self._semaphore:
+            start = time.monotonic()
+            try:
+                return await asyncio.wait_for(
+                    self.session.call_tool(name, args),
+                    self.call_timeout if self.call_timeout > 0 else None,
+                )
+            except asyncio.TimeoutError:
+                histogram.timeouts += 1
+                raise TimeoutError(
+                    f"MCP 服务 {self.name} 的工具 {name} 调用超时({self.call_timeout}s)"
+                )
+            except Exception:
+                histogram.errors += 1
+                raise
+            finally:
+                histogram.observe(time.monotonic() - start)
+
+    async def ping(self, timeout: float = 10) -> bool:
+        if not self.session:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"MCP 服务 {self.name} 健康检查失败: {e!r}")
+            return False
+
+    def latency_stats(self) -> Dict[str, dict]:
+        return {name: h.to_dict() for name, h in self.latency.items()}
+
     async def cleanup(self):
         """Clean up resources"""
+        self.session = None
         await self.exit_stack.aclose()
 
 
 class FuncCall:
     def __init__(self) -> None:
-        self.func_list: List[FuncTool] = []
-        """内部加载的 func tools"""
+        self._func_list: List[FuncTool] = []
+        self._func_index: Dict[str, FuncTool] = {}
+        """函数名到工具的索引，重名时为 func_list 中的第一个"""
+        self._version = 0
+        """工具列表的版本号，增删工具时递增"""
+        self._desc_cache: Dict[tuple, tuple] = {}
+        """各个风格的工具描述缓存, key -> (version, payload)"""
         self.mcp_client_dict: Dict[str, MCPClient] = {}
         """MCP 服务列表"""
         self.mcp_service_queue = asyncio.Queue()
         """用于外部控制 MCP 服务的启停"""
         self.mcp_client_event: Dict[str, asyncio.Event] = {}
+        self.mcp_restart_backoff = (1.0, 60.0)
+        """MCP 服务异常退出后重启的最小与最大等待时间(秒)，每次失败翻倍"""
+        self.mcp_tools_cache_ttl = 600
+        """MCP 服务重启时，在此时间(秒)内且配置未变化则复用之前的工具列表"""
+        self._mcp_tools_cache: Dict[str, tuple] = {}
+        """server name -> (配置, 工具列表, 获取时间)"""
+
+    @property
+    def func_list(self) -> List[FuncTool]:
+        """内部加载的 func tools"""
+        return self._func_list
+
+    @func_list.setter
+    def func_list(self, value: List[FuncTool]):
+        self._func_list = value
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        self._func_index = {}
+        for f in self._func_list:
+            self._func_index.setdefault(f.name, f)
+        self._version += 1
+
+    @property
+    def version(self) -> tuple:
+        """工具描述的版本。增删工具、MCP 服务重连，以及工具的启停都会使其变化"""
+        return (self._version, _tool_state_version)
+
+    def _cached_desc(self, key: tuple, build):
+        version = self.version
+        cached = self._desc_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        payload = build()
+        self._desc_cache[key] = (version, payload)
+        return payload
 
     def empty(self) -> bool:
         return len(self.func_list) == 0
@@ -176,6 +321,7 @@ class FuncCall:
         func_args: list,
         desc: str,
         handler: Awaitable,
+        concurrent: bool = True,
     ) -> None:
         """添加函数调用工具
 
@@ -183,6 +329,7 @@ class FuncCall:
         @param func_args: 函数参数列表，格式为 [{"type": "string", "name": "arg_name", "description": "arg_description"}, ...]
         @param desc: 函数描述
         @param func_obj: 处理函数
+        @param concurrent: 是否允许与其他函数调用并发执行
         """
         # check if the tool has been added before
         self.remove_func(name)
@@ -201,24 +348,34 @@ class FuncCall:
             parameters=params,
             description=desc,
             handler=handler,
+            concurrent=concurrent,
         )
-        self.func_list.append(_func)
+        self._func_list.append(_func)
+        self._func_index.setdefault(name, _func)
+        self._version += 1
         logger.info(f"添加函数调用工具: {name}")
 
     def remove_func(self, name: str) -> None:
         """
         删除一个函数调用工具。
         """
-        for i, f in enumerate(self.func_list):
-            if f.name == name:
-                self.func_list.pop(i)
+        f = self._func_index.get(name)
+        if f is None:
+            return
+        for i, other in enumerate(self._func_list):
+            if other is f:
+                self._func_list.pop(i)
+                break
+        del self._func_index[name]
+        # 可能存在重名的工具
+        for other in self._func_list:
+            if other.name == name:
+                self._func_index[name] = other
                 break
+        self._version += 1
 
     def get_func(self, name) -> FuncTool:
-        for f in self.func_list:
-            if f.name == name:
-                return f
-        return None
+        return self._func_index.get(name)
 
     async def _init_mcp_clients(self) -> None:
         """从项目根目录读取 mcp_server.json 文件，初始化 MCP 服务列表。文件格式如下：
@@ -238,6 +395,9 @@ class FuncCall:
             ...
         }
         ```
+
+        每个服务还可以配置 `call_timeout`(单次调用超时，默认 60 秒)、`ping_interval`(健康检查间隔，默认 30 秒)
+        和 `max_concurrency`(并发调用上限，默认 4)。
         """
         current_dir = os.path.dirname(os.path.abspath(__file__))
         data_dir = os.path.abspath(os.path.join(current_dir, "../../../data"))
@@ -314,10 +474,26 @@ class FuncCall:
     async def _init_mcp_client_task_wrapper(
         self, name: str, cfg: dict, event: asyncio.Event
     ) -> None:
-        """初始化 MCP 客户端的包装函数，用于捕获异常"""
+        """MCP 客户端的监管任务。
+
+        连接后定期进行健康检查，连接失败或服务异常时按指数退避重启，直到收到终止信号。
+        MCP 的连接必须在同一个 Task 中建立和关闭，因此重启也在这个 Task 中完成。
+        """
+        backoff, max_backoff = self.mcp_restart_backoff
         try:
-            await self._init_mcp_client(name, cfg)
-            await event.wait()
+            while not event.is_set():
+                if await self._init_mcp_client(name, cfg):
+                    backoff = self.mcp_restart_backoff[0]
+                    await self._watch_mcp_client(name, event)
+                if event.is_set():
+                    break
+                await self._terminate_mcp_client(name)
+                logger.warning(f"MCP 服务 {name} 不可用，将在 {backoff:.0f} 秒后重启")
+                try:
+                    await asyncio.wait_for(event.wait(), backoff)
+                except asyncio.TimeoutError:
+                    pass
+                backoff = min(backoff * 2, max_backoff)
             logger.info(f"收到 MCP 客户端 {name} 终止信号")
             await self._terminate_mcp_client(name)
         except Exception as e:
@@ -326,6 +502,28 @@ class FuncCall:
             traceback.print_exc()
             logger.error(f"初始化 MCP 客户端 {name} 失败: {e}")
 
+    async def _watch_mcp_client(self, name: str, event: asyncio.Event) -> None:
+        """定期检查 MCP 服务的健康状态，在收到终止信号或连续两次检查失败时返回"""
+        client = self.mcp_client_dict.get(name)
+        if not client:
+            return
+        if client.ping_interval <= 0:
+            await event.wait()
+            return
+        failures = 0
+        while True:
+            try:
+                await asyncio.wait_for(event.wait(), client.ping_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            if await client.ping(timeout=min(10, client.ping_interval)):
+                failures = 0
+                continue
+            failures += 1
+            if failures >= 2:
+                return
+
     async def _init_mcp_client(self, name: str, config: dict) -> None:
         """初始化单个MCP客户端"""
         try:
@@ -337,8 +535,18 @@ class FuncCall:
             mcp_client.name = name
             self.mcp_client_dict[name] = mcp_client
             await mcp_client.connect_to_server(config, name)
-            tools_res = await mcp_client.list_tools_and_save()
-            tool_names = [tool.name for tool in tools_res.tools]
+            cfg_key = json.dumps(config, sort_keys=True, ensure_ascii=False)
+            cached = self._mcp_tools_cache.get(name)
+            if (
+                cached
+                and cached[0] == cfg_key
+                and time.time() - cached[2] < self.mcp_tools_cache_ttl
+            ):
+                mcp_client.tools = cached[1]
+            else:
+                await mcp_client.list_tools_and_save()
+                self._mcp_tools_cache[name] = (cfg_key, mcp_client.tools, time.time())
+            tool_names = [tool.name for tool in mcp_client.tools]
 
             # 移除该MCP服务之前的工具（如有）
             self.func_list = [
@@ -357,7 +565,8 @@ class FuncCall:
                     mcp_server_name=name,
                     mcp_client=mcp_client,
                 )
-                self.func_list.append(func_tool)
+                self._func_list.append(func_tool)
+            self._rebuild_index()
 
             logger.info(f"已连接 MCP 服务 {name}, Tools: {tool_names}")
             return True
@@ -392,6 +601,14 @@ class FuncCall:
         """
         获得 OpenAI API 风格的**已经激活**的工具描述
         """
+        return list(
+            self._cached_desc(
+                ("openai", omit_empty_parameter_field),
+                lambda: self._build_func_desc_openai_style(omit_empty_parameter_field),
+            )
+        )
+
+    def _build_func_desc_openai_style(self, omit_empty_parameter_field: bool) -> list:
         _l = []
         # 处理所有工具（包括本地和MCP工具）
         for f in self.func_list:
@@ -416,6 +633,11 @@ class FuncCall:
         """
         获得 Anthropic API 风格的**已经激活**的工具描述
         """
+        return list(
+            self._cached_desc(("anthropic",), self._build_func_desc_anthropic_style)
+        )
+
+    def _build_func_desc_anthropic_style(self) -> list:
         tools = []
         for f in self.func_list:
             if not f.active:
@@ -439,6 +661,13 @@ class FuncCall:
         """
         获得 Google GenAI API 风格的**已经激活**的工具描述
         """
+        return dict(
+            self._cached_desc(
+                ("google_genai",), self._build_func_desc_google_genai_style
+            )
+        )
+
+    def _build_func_desc_google_genai_style(self) -> dict:
 
         # Gemini API 支持的数据类型和格式
         supported_types = {"string", "number", "integer", "boolean", "array", "object", "null"}
@@ -0,0 +1,241 @@
+"""
+API Key 池。
+
+OpenAI、Gemini、Anthropic 等提供商适配器共用，按 Key 记录并发数、速率限制与冷却状态，每次请求选择负载最低的可用 Key。
+"""
+
+import re
+import time
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Dict, Optional, Iterable, Mapping
+
+
+@dataclass
+class APIKeyState:
+    key: str
+    in_flight: int = 0
+    """正在进行的请求数"""
+    total: int = 0
+    success: int = 0
+    failure: int = 0
+    rate_limited: int = 0
+    """触发速率限制(429)的次数"""
+    cooldown_until: float = 0.0
+    """冷却结束时间(time.monotonic)"""
+    remaining_requests: Optional[int] = None
+    """服务端返回的剩余请求数"""
+    remaining_tokens: Optional[int] = None
+    """服务端返回的剩余 token 数"""
+    last_used: float = 0.0
+    last_error: str = ""
+
+    def cooling(self, now: float = None) -> bool:
+        return self.cooldown_until > (now or time.monotonic())
+
+    def to_dict(self) -> dict:
+        now = time.monotonic()
+        return {
+            "key": self.key[:8] + "..." if len(self.key) > 8 else self.key,
+            "in_flight": self.in_flight,
+            "total": self.total,
+            "success": self.success,
+            "failure": self.failure,
+            "rate_limited": self.rate_limited,
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - now), 1),
+            "remaining_requests": self.remaining_requests,
+            "remaining_tokens": self.remaining_tokens,
+            "last_error": self.last_error,
+        }
+
+
+_DURATION_PATTERN = re.compile(r"([\d.]+)(ms|s|m|h)")
+
+
+def parse_reset_duration(value: str) -> Optional[float]:
+    """解析速率限制重置时间，返回秒数。
+
+    支持 `1s`、`6m0s`、`20ms` 等时长格式(OpenAI)，纯数字秒数(retry-after)，以及 RFC 3339 时间(Anthropic)。
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    matches = _DURATION_PATTERN.findall(value)
+    if matches and "".join(n + u for n, u in matches) == value:
+        unit_map = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * unit_map[u] for n, u in matches)
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return max(0.0, reset_at.timestamp() - time.time())
+    except ValueError:
+        return None
+
+
+def _header_int(headers: Mapping, *names: str) -> Optional[int]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(value)
+            except ValueError:
+                continue
+    return None
+
+
+class APIKeyPool:
+    """API Key 池。
+
+    - `acquire` 选择正在进行的请求数最少、未处于冷却状态的 Key；达到单 Key 并发上限时等待。
+    - 请求结束后必须调用 `release`。
+    - 触发速率限制时调用 `mark_rate_limited`，该 Key 在冷却时间内不会被选择。
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        max_concurrency: int = 0,
+        default_cooldown: float = 60,
+    ):
+        """
+        Args:
+            keys: API Key 列表
+            max_concurrency: 单个 Key 的最大并发请求数，0 表示不限制
+            default_cooldown: 未能从响应中获取重置时间时，触发速率限制后的默认冷却时间(秒)
+        """
+        self.states: Dict[str, APIKeyState] = {k: APIKeyState(key=k) for k in keys}
+        self.max_concurrency = max_concurrency
+        self.default_cooldown = default_cooldown
+        self.preferred: Optional[str] = None
+        """用户指定的 Key，负载相同时优先选择"""
+        self._cond = asyncio.Condition()
+
+    def keys(self) -> List[str]:
+        return list(self.states.keys())
+
+    def prefer(self, key: str):
+        if key not in self.states:
+            self.states[key] = APIKeyState(key=key)
+        self.preferred = key
+
+    def _saturated(self, state: APIKeyState) -> bool:
+        return self.max_concurrency > 0 and state.in_flight >= self.max_concurrency
+
+    def _pick(self, candidates: List[APIKeyState]) -> Optional[APIKeyState]:
+        now = time.monotonic()
+        healthy = [s for s in candidates if not s.cooling(now)]
+        if not healthy:
+            # 所有 Key 都在冷却，选择最早结束冷却的 Key
+            healthy = [min(candidates, key=lambda s: s.cooldown_until)]
+        free = [s for s in healthy if not self._saturated(s)]
+        if not free:
+            return None
+        return min(
+            free,
+            key=lambda s: (
+                s.in_flight,
+                s.key != self.preferred,
+                # 剩余请求数越多越优先
+                -(
+                    s.remaining_requests
+                    if s.remaining_requests is not None
+                    else 1 << 30
+                ),
+                s.last_used,
+            ),
+        )
+
+    async def acquire(self, candidates: Iterable[str] = None) -> str:
+        """获取一个 Key。candidates 为本次请求可选的 Key，默认为所有 Key"""
+        async with self._cond:
+            while True:
+                if candidates is None:
+                    states = list(self.states.values())
+                else:
+                    states = [self.states[k] for k in candidates if k in self.states]
+                if not states:
+                    raise Exception("没有可用的 API Key。")
+                state = self._pick(states)
+                if state:
+                    state.in_flight += 1
+                    state.total += 1
+                    state.last_used = time.monotonic()
+                    return state.key
+                await self._cond.wait()
+
+    async def release(self, key: str, success: bool = True, error: Exception = None):
+        """归还 Key 并记录本次请求结果"""
+        state = self.states.get(key)
+        if not state:
+            return
+        state.in_flight = max(0, state.in_flight - 1)
+        if success:
+            state.success += 1
+        else:
+            state.failure += 1
+            if error is not None:
+                state.last_error = str(error)[:200]
+        async with self._cond:
+            self._cond.notify_all()
+
+    def mark_rate_limited(self, key: str, retry_after: float = None):
+        state = self.states.get(key)
+        if not state:
+            return
+        state.rate_limited += 1
+        cooldown = retry_after if retry_after is not None else self.default_cooldown
+        state.cooldown_until = max(state.cooldown_until, time.monotonic() + cooldown)
+
+    def update_from_headers(self, key: str, headers: Mapping):
+        """根据响应头更新 Key 的速率限制信息。兼容 OpenAI 与 Anthropic 的响应头"""
+        state = self.states.get(key)
+        if not state or headers is None:
+            return
+        remaining_requests = _header_int(
+            headers,
+            "x-ratelimit-remaining-requests",
+            "anthropic-ratelimit-requests-remaining",
+        )
+        remaining_tokens = _header_int(
+            headers,
+            "x-ratelimit-remaining-tokens",
+            "anthropic-ratelimit-tokens-remaining",
+        )
+        if remaining_requests is not None:
+            state.remaining_requests = remaining_requests
+        if remaining_tokens is not None:
+            state.remaining_tokens = remaining_tokens
+
+        if remaining_requests == 0 or remaining_tokens == 0:
+            # 额度已用完，冷却到重置时间
+            reset = None
+            for name in (
+                "x-ratelimit-reset-requests",
+                "x-ratelimit-reset-tokens",
+                "anthropic-ratelimit-requests-reset",
+                "anthropic-ratelimit-tokens-reset",
+            ):
+                reset = parse_reset_duration(headers.get(name))
+                if reset is not None:
+                    break
+            if reset is not None:
+                state.cooldown_until = max(
+                    state.cooldown_until, time.monotonic() + reset
+                )
+
+    @staticmethod
+    def retry_after_from_headers(headers: Mapping) -> Optional[float]:
+        if headers is None:
+            return None
+        return parse_reset_duration(
+            headers.get("retry-after")
+            or headers.get("x-ratelimit-reset-requests")
+            or headers.get("anthropic-ratelimit-requests-reset")
+        )
+
+    def stats(self) -> List[dict]:
+        return [s.to_dict() for s in self.states.values()]
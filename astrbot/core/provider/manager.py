@@ -6,6 +6,8 @@ from .entities import ProviderType
 from typing import List
 from astrbot.core.db import BaseDatabase
 from .register import provider_cls_map, llm_tools
+from .router import ProviderRouter
+from .response_cache import ResponseCache
 from astrbot.core import logger, sp
 
 
@@ -108,6 +110,14 @@ class ProviderManager:
         self.curr_tts_provider_inst: TTSProvider = None
         """当前使用的 Text To Speech Provider 实例"""
         self.db_helper = db_helper
+        self.router = ProviderRouter(
+            self, self.provider_settings.get("provider_fallback", {})
+        )
+        """文本生成 Provider 的故障转移路由"""
+        self.response_cache = ResponseCache(
+            self.provider_settings.get("response_cache", {})
+        )
+        """LLM 响应缓存"""
 
         # kdb(experimental)
         self.curr_kdb_name = ""
@@ -1,5 +1,5 @@
 import abc
-from typing import List
+from typing import List, Union
 from astrbot.core.db import BaseDatabase
 from typing import TypedDict, AsyncGenerator
 from astrbot.core.provider.func_tool_manager import FuncCall
@@ -90,7 +90,7 @@ class Provider(AbstractProvider):
         func_tool: FuncCall = None,
         contexts: List = None,
         system_prompt: str = None,
-        tool_calls_result: ToolCallsResult = None,
+        tool_calls_result: Union[ToolCallsResult, List[ToolCallsResult]] = None,
         **kwargs,
     ) -> LLMResponse:
         """获得 LLM 的文本对话结果。会使用当前的模型进行对话。
@@ -101,7 +101,7 @@ class Provider(AbstractProvider):
             image_urls: 图片 URL 列表
             tools: Function-calling 工具
             contexts: 上下文
-            tool_calls_result: 回传给 LLM 的工具调用结果。参考: https://platform.openai.com/docs/guides/function-calling
+            tool_calls_result: 回传给 LLM 的工具调用结果，多步工具调用时为每一轮结果组成的列表。参考: https://platform.openai.com/docs/guides/function-calling
             kwargs: 其他参数
 
         Notes:
@@ -118,7 +118,7 @@ class Provider(AbstractProvider):
         func_tool: FuncCall = None,
         contexts: List = None,
         system_prompt: str = None,
-        tool_calls_result: ToolCallsResult = None,
+        tool_calls_result: Union[ToolCallsResult, List[ToolCallsResult]] = None,
         **kwargs,
     ) -> AsyncGenerator[LLMResponse, None]:
         """获得 LLM 的流式文本对话结果。会使用当前的模型进行对话。在生成的最后会返回一次完整的结果。
@@ -129,7 +129,7 @@ class Provider(AbstractProvider):
             image_urls: 图片 URL 列表
             tools: Function-calling 工具
             contexts: 上下文
-            tool_calls_result: 回传给 LLM 的工具调用结果。参考: https://platform.openai.com/docs/guides/function-calling
+            tool_calls_result: 回传给 LLM 的工具调用结果，多步工具调用时为每一轮结果组成的列表。参考: https://platform.openai.com/docs/guides/function-calling
             kwargs: 其他参数
 
         Notes:
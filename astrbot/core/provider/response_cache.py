@@ -0,0 +1,240 @@
+"""
+LLM 响应缓存。
+
+在 Provider.text_chat 之前查询缓存，分为两级：
+- 精确匹配：规范化后的 prompt、system prompt、人格、提供商与模型完全一致。
+- 近似匹配：在 system prompt、人格、提供商与模型一致的前提下，prompt 的嵌入向量余弦相似度超过阈值。
+  需要配置 Embedding 服务，未配置时不启用。
+
+缓存默认按会话隔离。带有对话上下文的请求只在 context_turns > 0 时使用缓存，且最近几轮上下文也需要一致。
+"""
+
+import re
+import time
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from astrbot.core import logger, sp
+from .provider import Provider
+from .entities import ProviderRequest, LLMResponse
+
+_WHITESPACE = re.compile(r"\s+")
+_DATETIME_LINE = re.compile(r"Current datetime: [^\n]*")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", (text or "").strip().lower())
+
+
+@dataclass
+class CacheEntry:
+    prompt: str
+    completion_text: str
+    embedding: Optional[List[float]]
+    expire_at: float
+    latency: float
+    """生成该响应原本耗费的时间(秒)"""
+
+
+@dataclass
+class CacheProbe:
+    """一次缓存查询的结果。未命中时用于在请求完成后写入缓存"""
+
+    exact_key: str
+    scope_key: str
+    prompt: str
+    embedding: Optional[List[float]] = None
+    hit: Optional[LLMResponse] = None
+    start_time: float = 0.0
+
+
+class ResponseCache:
+    DISABLED_SESSIONS_KEY = "response_cache_disabled_sessions"
+
+    def __init__(self, cache_cfg: dict):
+        self.enable: bool = cache_cfg.get("enable", False)
+        self.ttl: float = float(cache_cfg.get("ttl", 3600))
+        self.max_entries: int = int(cache_cfg.get("max_entries", 1000))
+        self.context_turns: int = int(cache_cfg.get("context_turns", 0))
+        self.shared: bool = cache_cfg.get("share_across_sessions", False)
+        self.semantic: bool = cache_cfg.get("semantic_enable", False)
+        self.threshold: float = float(cache_cfg.get("semantic_threshold", 0.95))
+
+        self.embedding = None
+        if self.semantic:
+            if cache_cfg.get("embedding_api_key") and cache_cfg.get("embedding_model"):
+                from astrbot.core.rag.embedding.openai_source import (
+                    SimpleOpenAIEmbedding,
+                )
+
+                self.embedding = SimpleOpenAIEmbedding(
+                    model=cache_cfg["embedding_model"],
+                    api_key=cache_cfg["embedding_api_key"],
+                    api_base=cache_cfg.get("embedding_api_base") or None,
+                )
+            else:
+                # 字符相似度无法区分数字、否定等语义差异，不作为近似匹配的依据
+                logger.warning(
+                    "LLM 响应缓存的近似匹配需要配置 Embedding 服务，已禁用。"
+                )
+
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        """exact_key -> CacheEntry，按最近使用排序"""
+        self.scopes: Dict[str, Dict[str, CacheEntry]] = {}
+        """scope_key -> {exact_key: CacheEntry}，用于近似匹配"""
+        self._scope_of: Dict[str, str] = {}
+
+        self.lookups = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.latency_saved = 0.0
+
+    def session_enabled(self, session_id: str) -> bool:
+        return session_id not in sp.get(self.DISABLED_SESSIONS_KEY, [])
+
+    def set_session_enabled(self, session_id: str, enabled: bool):
+        disabled: list = sp.get(self.DISABLED_SESSIONS_KEY, [])
+        if enabled and session_id in disabled:
+            disabled.remove(session_id)
+        elif not enabled and session_id not in disabled:
+            disabled.append(session_id)
+        sp.put(self.DISABLED_SESSIONS_KEY, disabled)
+
+    def _cacheable(self, req: ProviderRequest) -> bool:
+        if not self.enable or not req.prompt:
+            return False
+        # 工具调用轮次与带图片的请求不使用缓存
+        if req.tool_calls_result or req.image_urls:
+            return False
+        # 不比较上下文时，同样的提问在不同的对话中含义可能不同
+        if req.contexts and self.context_turns <= 0:
+            return False
+        return self.session_enabled(req.session_id)
+
+    def _keys(self, provider: Provider, req: ProviderRequest) -> tuple:
+        # 时间戳每分钟都会变化，不参与缓存键的计算(提示词缓存友好模式下时间戳位于 prompt 中)
+        system_prompt = _DATETIME_LINE.sub("", req.system_prompt or "")
+        persona = req.conversation.persona_id if req.conversation else ""
+        context_tail = ""
+        if self.context_turns > 0 and req.contexts:
+            context_tail = repr(req.contexts[-self.context_turns * 2 :])
+        scope = "\x00".join(
+            [
+                "" if self.shared else req.session_id or "",
+                provider.meta().id,
+                provider.get_model(),
+                persona or "",
+                normalize_text(system_prompt),
+                context_tail,
+            ]
+        )
+        prompt = normalize_text(_DATETIME_LINE.sub("", req.prompt))
+        scope_key = hashlib.sha256(scope.encode("utf-8")).hexdigest()
+        exact_key = hashlib.sha256(
+            (scope_key + "\x00" + prompt).encode("utf-8")
+        ).hexdigest()
+        return exact_key, scope_key, prompt
+
+    def _evict(self, exact_key: str):
+        self.entries.pop(exact_key, None)
+        scope_key = self._scope_of.pop(exact_key, None)
+        if scope_key in self.scopes:
+            self.scopes[scope_key].pop(exact_key, None)
+            if not self.scopes[scope_key]:
+                del self.scopes[scope_key]
+
+    def _hit(self, entry: CacheEntry, semantic: bool) -> LLMResponse:
+        if semantic:
+            self.semantic_hits += 1
+        else:
+            self.exact_hits += 1
+        self.latency_saved += entry.latency
+        return LLMResponse("assistant", completion_text=entry.completion_text)
+
+    async def lookup(
+        self, provider: Provider, req: ProviderRequest
+    ) -> Optional[CacheProbe]:
+        """查询缓存。请求不可缓存时返回 None；命中时 probe.hit 为缓存的响应"""
+        if not self._cacheable(req):
+            return None
+        self.lookups += 1
+        now = time.time()
+        exact_key, scope_key, prompt = self._keys(provider, req)
+        probe = CacheProbe(
+            exact_key=exact_key, scope_key=scope_key, prompt=prompt, start_time=now
+        )
+
+        entry = self.entries.get(exact_key)
+        if entry:
+            if entry.expire_at > now:
+                self.entries.move_to_end(exact_key)
+                logger.info(f"LLM 响应缓存命中(精确匹配): {prompt[:30]}")
+                probe.hit = self._hit(entry, semantic=False)
+                return probe
+            self._evict(exact_key)
+
+        if self.embedding:
+            try:
+                probe.embedding = await self.embedding.get_embedding(prompt)
+            except Exception as e:
+                logger.warning(f"获取缓存嵌入向量失败: {e}")
+                return probe
+            best, best_score = None, self.threshold
+            for key, cand in list(self.scopes.get(scope_key, {}).items()):
+                if cand.expire_at <= now:
+                    self._evict(key)
+                    continue
+                if not cand.embedding:
+                    continue
+                score = sum(a * b for a, b in zip(probe.embedding, cand.embedding))
+                if score >= best_score:
+                    best, best_score = (key, cand), score
+            if best:
+                self.entries.move_to_end(best[0])
+                logger.info(
+                    f"LLM 响应缓存命中(近似匹配, 相似度 {best_score:.3f}): {prompt[:30]} ≈ {best[1].prompt[:30]}"
+                )
+                probe.hit = self._hit(best[1], semantic=True)
+        return probe
+
+    def store(self, probe: Optional[CacheProbe], llm_response: LLMResponse):
+        """将 LLM 响应写入缓存。只缓存不含工具调用的文本回复"""
+        if not probe or probe.hit or not llm_response:
+            return
+        if llm_response.role != "assistant" or llm_response.tools_call_name:
+            return
+        completion_text = llm_response.completion_text
+        if not completion_text:
+            return
+        now = time.time()
+        entry = CacheEntry(
+            prompt=probe.prompt,
+            completion_text=completion_text,
+            embedding=probe.embedding,
+            expire_at=now + self.ttl,
+            latency=now - probe.start_time,
+        )
+        self._evict(probe.exact_key)
+        self.entries[probe.exact_key] = entry
+        self.scopes.setdefault(probe.scope_key, {})[probe.exact_key] = entry
+        self._scope_of[probe.exact_key] = probe.scope_key
+        while len(self.entries) > self.max_entries:
+            self._evict(next(iter(self.entries)))
+
+    def clear(self):
+        self.entries.clear()
+        self.scopes.clear()
+        self._scope_of.clear()
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "enable": self.enable,
+            "entries": len(self.entries),
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "latency_saved": round(self.latency_saved, 2),
+        }
@@ -0,0 +1,335 @@
+"""
+LLM 提供商路由。
+
+在 ProviderManager 已加载的 Provider 实例之上提供故障转移(fallback)、健康度评分、熔断以及对冲请求(hedged request)。
+"""
+
+import time
+import asyncio
+import enum
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Dict, AsyncGenerator, Tuple, TYPE_CHECKING
+from astrbot.core import logger
+from .provider import Provider
+from .entities import LLMResponse
+
+if TYPE_CHECKING:
+    from .manager import ProviderManager
+
+
+def prompt_token_usage(llm_response: LLMResponse) -> Tuple[int, int]:
+    """从原始响应中获取 (输入 Token 数, 命中提示词缓存的 Token 数)。提供商没有返回用量时为 (0, 0)"""
+    usage = getattr(llm_response.raw_completion, "usage", None)
+    if not usage:
+        return 0, 0
+    if hasattr(usage, "prompt_tokens"):
+        # OpenAI 兼容格式。DeepSeek 使用 prompt_cache_hit_tokens
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or getattr(
+            usage, "prompt_cache_hit_tokens", 0
+        )
+        return usage.prompt_tokens or 0, cached or 0
+    # Anthropic 的 input_tokens 不包含读写缓存的部分
+    cached = getattr(usage, "cache_read_input_tokens", 0) or 0
+    created = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    return (getattr(usage, "input_tokens", 0) or 0) + cached + created, cached
+
+
+class CircuitState(enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class ProviderHealth:
+    """单个 Provider 的健康状态统计"""
+
+    provider_id: str
+    latencies: deque = field(default_factory=lambda: deque(maxlen=100))
+    """最近成功请求的耗时(秒)"""
+    error_rate: float = 0.0
+    """错误率的指数移动平均值"""
+    success_cnt: int = 0
+    failure_cnt: int = 0
+    consecutive_failures: int = 0
+    state: CircuitState = CircuitState.CLOSED
+    opened_at: float = 0.0
+    half_open_trial: bool = False
+    """半开状态下是否已经放行了一个试探请求"""
+    prompt_tokens: int = 0
+    """累计输入 Token 数"""
+    cached_tokens: int = 0
+    """累计命中提示词缓存的输入 Token 数"""
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        idx = min(len(ordered) - 1, int(len(ordered) * p))
+        return ordered[idx]
+
+    def score(self) -> float:
+        """健康度评分，越高越好。综合错误率与 p50 延迟"""
+        return (1.0 - self.error_rate) / (1.0 + self.percentile(0.5))
+
+    def to_dict(self) -> dict:
+        return {
+            "provider_id": self.provider_id,
+            "state": self.state.value,
+            "success_cnt": self.success_cnt,
+            "failure_cnt": self.failure_cnt,
+            "error_rate": round(self.error_rate, 4),
+            "p50": round(self.percentile(0.5), 3),
+            "p95": round(self.percentile(0.95), 3),
+            "score": round(self.score(), 4),
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_hit_rate": (
+                round(self.cached_tokens / self.prompt_tokens, 4)
+                if self.prompt_tokens
+                else 0.0
+            ),
+        }
+
+
+class ProviderRouter:
+    """在多个文本生成 Provider 之间路由请求。
+
+    - 按 `provider_settings.provider_fallback.chain` 配置的顺序进行故障转移，未配置时按健康度评分排列其余 Provider。
+    - 连续失败达到阈值后熔断，冷却结束后进入半开状态并放行一个试探请求。
+    - 启用对冲请求后，主 Provider 超过其 p95 延迟仍未返回时，向下一个 Provider 发出同样的请求，采用先成功的结果。
+    """
+
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, provider_manager: "ProviderManager", fallback_cfg: dict):
+        self.provider_manager = provider_manager
+        self.enable: bool = fallback_cfg.get("enable", False)
+        self.chain: List[str] = fallback_cfg.get("chain", [])
+        self.hedge: bool = fallback_cfg.get("hedge", False)
+        self.hedge_min_delay: float = float(fallback_cfg.get("hedge_min_delay", 2.0))
+        self.failure_threshold: int = int(
+            fallback_cfg.get("circuit_breaker_threshold", 3)
+        )
+        self.cooldown: float = float(fallback_cfg.get("circuit_breaker_cooldown", 30))
+        self.health: Dict[str, ProviderHealth] = {}
+
+    def get_health(self, provider_id: str) -> ProviderHealth:
+        if provider_id not in self.health:
+            self.health[provider_id] = ProviderHealth(provider_id=provider_id)
+        return self.health[provider_id]
+
+    def _available(self, provider: Provider) -> bool:
+        """熔断器是否放行该 Provider 的请求"""
+        health = self.get_health(provider.meta().id)
+        if health.state == CircuitState.CLOSED:
+            return True
+        if health.state == CircuitState.OPEN:
+            if time.monotonic() - health.opened_at < self.cooldown:
+                return False
+            health.state = CircuitState.HALF_OPEN
+            health.half_open_trial = False
+        # 半开状态只放行一个试探请求
+        if health.half_open_trial:
+            return False
+        health.half_open_trial = True
+        return True
+
+    def record_success(self, provider: Provider, latency: float):
+        health = self.get_health(provider.meta().id)
+        health.latencies.append(latency)
+        health.success_cnt += 1
+        health.consecutive_failures = 0
+        health.error_rate *= 1 - self.EWMA_ALPHA
+        if health.state != CircuitState.CLOSED:
+            logger.info(f"提供商 {health.provider_id} 已恢复，熔断器关闭。")
+        health.state = CircuitState.CLOSED
+        health.half_open_trial = False
+
+    def record_usage(
+        self, provider: Provider, llm_response: LLMResponse
+    ) -> Tuple[int, int]:
+        """记录一次请求的输入 Token 数与命中提示词缓存的 Token 数"""
+        prompt_tokens, cached_tokens = prompt_token_usage(llm_response)
+        if prompt_tokens:
+            health = self.get_health(provider.meta().id)
+            health.prompt_tokens += prompt_tokens
+            health.cached_tokens += cached_tokens
+        return prompt_tokens, cached_tokens
+
+    def record_failure(self, provider: Provider):
+        health = self.get_health(provider.meta().id)
+        health.failure_cnt += 1
+        health.consecutive_failures += 1
+        health.error_rate = health.error_rate * (1 - self.EWMA_ALPHA) + self.EWMA_ALPHA
+        if (
+            health.state == CircuitState.HALF_OPEN
+            or health.consecutive_failures >= self.failure_threshold
+        ):
+            if health.state != CircuitState.OPEN:
+                logger.warning(
+                    f"提供商 {health.provider_id} 连续失败 {health.consecutive_failures} 次，熔断 {self.cooldown} 秒。"
+                )
+            health.state = CircuitState.OPEN
+            health.opened_at = time.monotonic()
+            health.half_open_trial = False
+
+    def candidates(self, primary: Provider) -> List[Provider]:
+        """获得本次请求的候选 Provider 列表(已按优先级排序，未经过熔断器过滤)"""
+        insts = self.provider_manager.provider_insts
+        ret = [primary] if primary else []
+        if self.chain:
+            id_map = {p.meta().id: p for p in insts}
+            for provider_id in self.chain:
+                p = id_map.get(provider_id)
+                if p and p not in ret:
+                    ret.append(p)
+        else:
+            others = [p for p in insts if p not in ret]
+            others.sort(
+                key=lambda p: self.get_health(p.meta().id).score(), reverse=True
+            )
+            ret.extend(others)
+        return ret
+
+    def hedge_delay(self, provider: Provider) -> float:
+        """对冲请求的等待时间：主 Provider 的 p95 延迟，样本不足时使用最小等待时间"""
+        health = self.get_health(provider.meta().id)
+        if len(health.latencies) < 5:
+            return self.hedge_min_delay
+        return max(self.hedge_min_delay, health.percentile(0.95))
+
+    async def _call(self, provider: Provider, kwargs: dict) -> LLMResponse:
+        # 各 Provider 可能会就地修改上下文列表，这里复制一份
+        kwargs = dict(kwargs)
+        if isinstance(kwargs.get("contexts"), list):
+            kwargs["contexts"] = list(kwargs["contexts"])
+        start = time.monotonic()
+        try:
+            llm_response = await provider.text_chat(**kwargs)
+            if llm_response is None or llm_response.role == "err":
+                raise Exception(
+                    llm_response.completion_text
+                    if llm_response
+                    else "LLM response is None."
+                )
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            self.record_failure(provider)
+            raise
+        self.record_success(provider, time.monotonic() - start)
+        return llm_response
+
+    async def text_chat(self, primary: Provider, **kwargs) -> LLMResponse:
+        """带故障转移的 text_chat。所有候选 Provider 均失败时抛出最后一个异常"""
+        if not self.enable:
+            return await primary.text_chat(**kwargs)
+
+        pending = self.candidates(primary)
+        last_exc: BaseException = None
+        while pending:
+            provider = pending.pop(0)
+            if not self._available(provider):
+                continue
+            if not self.hedge or not pending:
+                try:
+                    return await self._call(provider, kwargs)
+                except Exception as e:
+                    last_exc = e
+                    logger.warning(
+                        f"提供商 {provider.meta().id} 请求失败：{e}，尝试下一个提供商。"
+                    )
+                    continue
+            try:
+                return await self._hedged_call(provider, pending, kwargs)
+            except Exception as e:
+                last_exc = e
+
+        if last_exc:
+            raise last_exc
+        raise Exception("没有可用的提供商(均处于熔断状态)。")
+
+    async def _hedged_call(
+        self, provider: Provider, pending: List[Provider], kwargs: dict
+    ) -> LLMResponse:
+        """发出主请求，超过 p95 延迟后向下一个可用 Provider 发出对冲请求。
+
+        使用过的对冲 Provider 会从 pending 中移除。
+        """
+        tasks: Dict[asyncio.Task, Provider] = {
+            asyncio.create_task(self._call(provider, kwargs)): provider
+        }
+        delay = self.hedge_delay(provider)
+        last_exc: BaseException = None
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks.keys(),
+                    timeout=delay,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    p = tasks.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_exc = task.exception()
+                    logger.warning(f"提供商 {p.meta().id} 请求失败：{last_exc}")
+                # 超时或者有请求失败时，发出下一个(对冲)请求
+                while pending:
+                    backup = pending.pop(0)
+                    if self._available(backup):
+                        if not done:
+                            logger.info(
+                                f"提供商 {provider.meta().id} 超过 {delay:.2f}s 未响应，对冲请求 {backup.meta().id}。"
+                            )
+                        tasks[asyncio.create_task(self._call(backup, kwargs))] = backup
+                        break
+                delay = None  # 所有请求已发出，之后只等待结果
+        finally:
+            for task in tasks:
+                task.cancel()
+        raise last_exc
+
+    async def text_chat_stream(
+        self, primary: Provider, **kwargs
+    ) -> AsyncGenerator[LLMResponse, None]:
+        """带故障转移的 text_chat_stream。只有在尚未产生任何输出时才会切换到下一个 Provider"""
+        if not self.enable:
+            async for llm_response in primary.text_chat_stream(**kwargs):
+                yield llm_response
+            return
+
+        last_exc: BaseException = None
+        for provider in self.candidates(primary):
+            if not self._available(provider):
+                continue
+            call_kwargs = dict(kwargs)
+            if isinstance(call_kwargs.get("contexts"), list):
+                call_kwargs["contexts"] = list(call_kwargs["contexts"])
+            start = time.monotonic()
+            yielded = False
+            try:
+                async for llm_response in provider.text_chat_stream(**call_kwargs):
+                    yielded = True
+                    yield llm_response
+            except Exception as e:
+                self.record_failure(provider)
+                if yielded:
+                    raise
+                last_exc = e
+                logger.warning(
+                    f"提供商 {provider.meta().id} 流式请求失败：{e}，尝试下一个提供商。"
+                )
+                continue
+            self.record_success(provider, time.monotonic() - start)
+            return
+
+        if last_exc:
+            raise last_exc
+        raise Exception("没有可用的提供商(均处于熔断状态)。")
+
+    def stats(self) -> List[dict]:
+        return [h.to_dict() for h in self.health.values()]
@@ -1,18 +1,22 @@
-from typing import List
+import json
+from typing import List, Union, AsyncGenerator
 from mimetypes import guess_type
 
-from anthropic import AsyncAnthropic
+from anthropic import AsyncAnthropic, APIStatusError
 from anthropic.types import Message
 
 from astrbot.core.utils.io import download_image_by_url
 from astrbot.core.db import BaseDatabase
 from astrbot.api.provider import Provider, Personality
 from astrbot import logger
+from astrbot.core.log import lazy_repr
 from astrbot.core.provider.func_tool_manager import FuncCall
 from ..register import register_provider_adapter
 from astrbot.core.message.message_event_result import MessageChain
+import astrbot.core.message.components as Comp
 from astrbot.core.provider.entities import LLMResponse, ToolCallsResult
 from .openai_source import ProviderOpenAIOfficial
+from ..key_pool import APIKeyPool
 
 
 @register_provider_adapter(
@@ -48,19 +52,29 @@ class ProviderAnthropic(ProviderOpenAIOfficial):
         self.client = AsyncAnthropic(
             api_key=self.chosen_api_key, timeout=self.timeout, base_url=self.base_url
         )
+        self.key_pool = APIKeyPool(self.api_keys, **self._key_pool_settings())
+        self._key_clients = {}
 
         self.set_model(provider_config["model_config"]["model"])
 
-    async def _query(self, payloads: dict, tools: FuncCall) -> LLMResponse:
+    async def _query(
+        self, payloads: dict, tools: FuncCall, api_key: str = None
+    ) -> LLMResponse:
         if tools:
             tool_list = tools.get_func_desc_anthropic_style()
             if tool_list:
                 payloads["tools"] = tool_list
+        self._apply_cache_control(payloads)
 
-        completion = await self.client.messages.create(**payloads, stream=False)
+        raw_response = await self._client_for_key(
+            api_key
+        ).messages.with_raw_response.create(**payloads, stream=False)
+        if api_key:
+            self.key_pool.update_from_headers(api_key, raw_response.headers)
+        completion = await raw_response.parse()
 
         assert isinstance(completion, Message)
-        logger.debug(f"completion: {completion}")
+        logger.debug("completion: %s", lazy_repr(completion))
 
         if len(completion.content) == 0:
             raise Exception("API 返回的 completion 为空。")
@@ -98,20 +112,132 @@ class ProviderAnthropic(ProviderOpenAIOfficial):
 
         return llm_response
 
-    async def text_chat(
+    async def _query_stream(
+        self, payloads: dict, tools: FuncCall, api_key: str = None
+    ) -> AsyncGenerator[LLMResponse, None]:
+        """流式查询 API。文本增量逐个返回，工具调用的参数在 content_block_stop 时解析，最后返回完整的结果"""
+        if tools:
+            tool_list = tools.get_func_desc_anthropic_style()
+            if tool_list:
+                payloads["tools"] = tool_list
+        self._apply_cache_control(payloads)
+
+        raw_response = await self._client_for_key(
+            api_key
+        ).messages.with_raw_response.create(**payloads, stream=True)
+        if api_key:
+            self.key_pool.update_from_headers(api_key, raw_response.headers)
+        stream = await raw_response.parse()
+
+        message: Message = None
+        text_parts = []
+        tool_blocks = {}  # index -> {"id", "name", "input_json"}
+        tool_calls = []
+
+        async for event in stream:
+            match event.type:
+                case "message_start":
+                    message = event.message
+                case "content_block_start":
+                    block = event.content_block
+                    if block.type == "tool_use":
+                        tool_blocks[event.index] = {
+                            "id": block.id,
+                            "name": block.name,
+                            "input_json": [],
+                        }
+                case "content_block_delta":
+                    delta = event.delta
+                    if delta.type == "text_delta":
+                        text_parts.append(delta.text)
+                        yield LLMResponse(
+                            "assistant",
+                            result_chain=MessageChain(chain=[Comp.Plain(delta.text)]),
+                            is_chunk=True,
+                        )
+                    elif delta.type == "input_json_delta":
+                        if event.index in tool_blocks:
+                            tool_blocks[event.index]["input_json"].append(
+                                delta.partial_json
+                            )
+                case "content_block_stop":
+                    block = tool_blocks.pop(event.index, None)
+                    if block:
+                        input_json = "".join(block["input_json"])
+                        block["input"] = json.loads(input_json) if input_json else {}
+                        tool_calls.append(block)
+                case "message_delta":
+                    if message:
+                        message.stop_reason = event.delta.stop_reason
+                        message.usage.output_tokens = event.usage.output_tokens
+
+        completion_text = "".join(text_parts).strip()
+        llm_response = LLMResponse("assistant")
+        if completion_text:
+            llm_response.result_chain = MessageChain().message(completion_text)
+        if tool_calls:
+            llm_response.role = "tool"
+            llm_response.tools_call_args = [call["input"] for call in tool_calls]
+            llm_response.tools_call_name = [call["name"] for call in tool_calls]
+            llm_response.tools_call_ids = [call["id"] for call in tool_calls]
+        if not completion_text and not tool_calls:
+            raise Exception("API 返回的 completion 为空。")
+        llm_response.raw_completion = message
+        yield llm_response
+
+    def _apply_cache_control(self, payloads: dict):
+        """在工具定义、System Prompt 与历史对话的末尾添加 cache_control 断点，缓存稳定的请求前缀"""
+        if not self.provider_settings.get("prompt_cache_friendly", False):
+            return
+        cache_control = {"type": "ephemeral"}
+        if payloads.get("tools"):
+            payloads["tools"][-1] = {
+                **payloads["tools"][-1],
+                "cache_control": cache_control,
+            }
+        if isinstance(payloads.get("system"), str) and payloads["system"]:
+            payloads["system"] = [
+                {
+                    "type": "text",
+                    "text": payloads["system"],
+                    "cache_control": cache_control,
+                }
+            ]
+        messages = payloads["messages"]
+        if len(messages) < 2:
+            return
+        # 最后一条是本轮的用户消息，断点放在它之前的历史对话上。这里替换为新的字典，不修改原有的上下文
+        last_history = messages[-2]
+        content = last_history.get("content")
+        if isinstance(content, str) and content:
+            blocks = [{"type": "text", "text": content, "cache_control": cache_control}]
+        elif isinstance(content, list) and content:
+            blocks = [*content[:-1], {**content[-1], "cache_control": cache_control}]
+        else:
+            return
+        messages[-2] = {**last_history, "content": blocks}
+
+    async def _prepare_anthropic_payload(
         self,
         prompt: str,
-        session_id: str = None,
         image_urls: List[str] = [],
-        func_tool: FuncCall = None,
         contexts=[],
         system_prompt=None,
-        tool_calls_result: ToolCallsResult = None,
+        tool_calls_result: Union[ToolCallsResult, List[ToolCallsResult]] = None,
         **kwargs,
-    ) -> LLMResponse:
+    ) -> tuple:
         if not prompt:
             prompt = "<image>"
 
+        if tool_calls_result:
+            if isinstance(tool_calls_result, ToolCallsResult):
+                tool_calls_result = [tool_calls_result]
+            # 暂时这样写。
+            results = [
+                seg for tcr in tool_calls_result for seg in tcr.tool_calls_result
+            ]
+            prompt += f"Here are the related results via using tools: {str(results)}"
+
         new_record = await self.assemble_context(prompt, image_urls)
         context_query = [*contexts, new_record]
 
@@ -119,22 +245,68 @@ class ProviderAnthropic(ProviderOpenAIOfficial):
             if "_no_save" in part:
                 del part["_no_save"]
 
-        if tool_calls_result:
-            # 暂时这样写。
-            prompt += f"Here are the related results via using tools: {str(tool_calls_result.tool_calls_result)}"
-
         model_config = self.provider_config.get("model_config", {})
 
         payloads = {"messages": context_query, **model_config}
         # Anthropic has a different way of handling system prompts
         if system_prompt:
             payloads["system"] = system_prompt
+        return payloads, context_query, model_config
+
+    def _handle_rate_limit(
+        self, e: Exception, chosen_key: str, available_api_keys: List[str]
+    ) -> bool:
+        """处理 429 错误。返回 True 表示可以换一个 Key 重试"""
+        if not (isinstance(e, APIStatusError) and e.status_code == 429 and chosen_key):
+            return False
+        self.key_pool.mark_rate_limited(
+            chosen_key,
+            APIKeyPool.retry_after_from_headers(e.response.headers),
+        )
+        available_api_keys.remove(chosen_key)
+        if available_api_keys:
+            logger.warning(
+                f"API 调用过于频繁，尝试使用其他 Key 重试。当前 Key: {chosen_key[:12]}"
+            )
+            return True
+        return False
 
-        llm_response = None
-        try:
-            llm_response = await self._query(payloads, func_tool)
+    async def text_chat(
+        self,
+        prompt: str,
+        session_id: str = None,
+        image_urls: List[str] = [],
+        func_tool: FuncCall = None,
+        contexts=[],
+        system_prompt=None,
+        tool_calls_result: Union[ToolCallsResult, List[ToolCallsResult]] = None,
+        **kwargs,
+    ) -> LLMResponse:
+        payloads, context_query, model_config = await self._prepare_anthropic_payload(
+            prompt, image_urls, contexts, system_prompt, tool_calls_result
+        )
 
-        except Exception as e:
+        llm_response = None
+        available_api_keys = self.key_pool.keys()
+        while True:
+            chosen_key = (
+                await self.key_pool.acquire(available_api_keys)
+                if available_api_keys
+                else None
+            )
+            try:
+                llm_response = await self._query(payloads, func_tool, chosen_key)
+                await self.key_pool.release(chosen_key)
+                break
+            except Exception as e:
+                await self.key_pool.release(chosen_key, success=False, error=e)
+                if self._handle_rate_limit(e, chosen_key, available_api_keys):
+                    continue
+                error = e
+                break
+
+        if llm_response is None:
+            e = error
             if "maximum context length" in str(e):
                 retry_cnt = 20
                 while retry_cnt > 0:
@@ -166,28 +338,47 @@ class ProviderAnthropic(ProviderOpenAIOfficial):
         self,
         prompt,
         session_id=None,
-        image_urls=...,
+        image_urls=[],
         func_tool=None,
-        contexts=...,
+        contexts=[],
         system_prompt=None,
         tool_calls_result=None,
         **kwargs,
-    ):
-        # raise NotImplementedError("This method is not implemented yet.")
-        # 调用 text_chat 模拟流式
-        llm_response = await self.text_chat(
-            prompt=prompt,
-            session_id=session_id,
-            image_urls=image_urls,
-            func_tool=func_tool,
-            contexts=contexts,
-            system_prompt=system_prompt,
-            tool_calls_result=tool_calls_result,
+    ) -> AsyncGenerator[LLMResponse, None]:
+        payloads, _, _ = await self._prepare_anthropic_payload(
+            prompt, image_urls, contexts, system_prompt, tool_calls_result
         )
-        llm_response.is_chunk = True
-        yield llm_response
-        llm_response.is_chunk = False
-        yield llm_response
+
+        available_api_keys = self.key_pool.keys()
+        while True:
+            chosen_key = (
+                await self.key_pool.acquire(available_api_keys)
+                if available_api_keys
+                else None
+            )
+            started = False
+            success = False
+            try:
+                async for llm_response in self._query_stream(
+                    payloads, func_tool, chosen_key
+                ):
+                    started = True
+                    yield llm_response
+                success = True
+                break
+            except Exception as e:
+                await self.key_pool.release(chosen_key, success=False, error=e)
+                failed_key, chosen_key = chosen_key, None
+                # 已经输出过内容时不再重试，避免重复输出
+                if not started and self._handle_rate_limit(
+                    e, failed_key, available_api_keys
+                ):
+                    continue
+                raise e
+            finally:
+                # 调用方提前关闭生成器或任务被取消时也要归还 Key
+                if chosen_key:
+                    await self.key_pool.release(chosen_key, success=success)
 
     async def assemble_context(self, text: str, image_urls: List[str] = None):
         """组装上下文，支持文本和图片"""
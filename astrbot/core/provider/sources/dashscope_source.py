@@ -10,6 +10,7 @@ from ..register import register_provider_adapter
 from astrbot.core.message.message_event_result import MessageChain
 from .openai_source import ProviderOpenAIOfficial
 from astrbot.core import logger, sp
+from astrbot.core.log import lazy_repr
 from dashscope import Application
 
 
@@ -125,7 +126,7 @@ class ProviderDashscope(ProviderOpenAIOfficial):
             )
             response = await asyncio.get_event_loop().run_in_executor(None, partial)
 
-        logger.debug(f"dashscope resp: {response}")
+        logger.debug("dashscope resp: %s", lazy_repr(response))
 
         if response.status_code != 200:
             logger.error(
@@ -1,6 +1,6 @@
 import astrbot.core.message.components as Comp
 
-from typing import List
+from typing import List, AsyncGenerator
 from .. import Provider, Personality
 from ..entities import LLMResponse
 from ..func_tool_manager import FuncCall
@@ -9,6 +9,7 @@ from ..register import register_provider_adapter
 from astrbot.core.utils.dify_api_client import DifyAPIClient
 from astrbot.core.utils.io import download_image_by_url, download_file
 from astrbot.core import logger, sp
+from astrbot.core.log import LogSampler, lazy_repr
 from astrbot.core.message.message_event_result import MessageChain
 
 
@@ -66,8 +67,33 @@ class ProviderDify(Provider):
         system_prompt: str = None,
         **kwargs,
     ) -> LLMResponse:
+        llm_response = None
+        async for llm_response in self.text_chat_stream(
+            prompt,
+            session_id=session_id,
+            image_urls=image_urls,
+            func_tool=func_tool,
+            contexts=contexts,
+            system_prompt=system_prompt,
+            **kwargs,
+        ):
+            pass
+        return llm_response
+
+    async def text_chat_stream(
+        self,
+        prompt: str,
+        session_id: str = None,
+        image_urls: List[str] = [],
+        func_tool: FuncCall = None,
+        contexts: List = None,
+        system_prompt: str = None,
+        **kwargs,
+    ) -> AsyncGenerator[LLMResponse, None]:
+        """Chat、Agent、Chatflow 应用的 message 与 agent_message 事件会作为 chunk 逐个返回，最后返回完整的结果"""
         result = ""
         conversation_id = self.conversation_ids.get(session_id, "")
+        chunk_log_sampler = LogSampler(20)
 
         files_payload = []
         for image_url in image_urls:
@@ -116,12 +142,21 @@ class ProviderDify(Provider):
                         files=files_payload,
                         timeout=self.timeout,
                     ):
-                        logger.debug(f"dify resp chunk: {chunk}")
+                        if chunk_log_sampler.sample():
+                            logger.debug("dify resp chunk: %s", lazy_repr(chunk))
                         if (
                             chunk["event"] == "message"
                             or chunk["event"] == "agent_message"
                         ):
                             result += chunk["answer"]
+                            if chunk["answer"]:
+                                yield LLMResponse(
+                                    role="assistant",
+                                    result_chain=MessageChain(
+                                        chain=[Comp.Plain(chunk["answer"])]
+                                    ),
+                                    is_chunk=True,
+                                )
                             if not conversation_id:
                                 self.conversation_ids[session_id] = chunk[
                                     "conversation_id"
@@ -160,7 +195,7 @@ class ProviderDify(Provider):
                                 logger.info(
                                     f"Dify 工作流(ID: {chunk['workflow_run_id']})运行结束"
                                 )
-                                logger.debug(f"Dify 工作流结果：{chunk}")
+                                logger.debug("Dify 工作流结果：%s", lazy_repr(chunk))
                                 if chunk["data"]["error"]:
                                     logger.error(
                                         f"Dify 工作流出现错误：{chunk['data']['error']}"
@@ -180,41 +215,15 @@ class ProviderDify(Provider):
                     raise Exception(f"未知的 Dify API 类型：{self.api_type}")
         except Exception as e:
             logger.error(f"Dify 请求失败：{str(e)}")
-            return LLMResponse(role="err", completion_text=f"Dify 请求失败：{str(e)}")
+            yield LLMResponse(role="err", completion_text=f"Dify 请求失败：{str(e)}")
+            return
 
         if not result:
             logger.warning("Dify 请求结果为空，请查看 Debug 日志。")
 
         chain = await self.parse_dify_result(result)
 
-        return LLMResponse(role="assistant", result_chain=chain)
-
-    async def text_chat_stream(
-        self,
-        prompt,
-        session_id=None,
-        image_urls=...,
-        func_tool=None,
-        contexts=...,
-        system_prompt=None,
-        tool_calls_result=None,
-        **kwargs,
-    ):
-        # raise NotImplementedError("This method is not implemented yet.")
-        # 调用 text_chat 模拟流式
-        llm_response = await self.text_chat(
-            prompt=prompt,
-            session_id=session_id,
-            image_urls=image_urls,
-            func_tool=func_tool,
-            contexts=contexts,
-            system_prompt=system_prompt,
-            tool_calls_result=tool_calls_result,
-        )
-        llm_response.is_chunk = True
-        yield llm_response
-        llm_response.is_chunk = False
-        yield llm_response
+        yield LLMResponse(role="assistant", result_chain=chain)
 
     async def parse_dify_result(self, chunk: dict | str) -> MessageChain:
         if isinstance(chunk, str):
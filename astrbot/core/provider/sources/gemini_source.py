@@ -1,8 +1,7 @@
-import asyncio
 import base64
 import json
 import logging
-import random
+import re
 from typing import Dict, List, Optional
 from collections.abc import AsyncGenerator
 
@@ -15,11 +14,12 @@ from astrbot import logger
 from astrbot.api.provider import Personality, Provider
 from astrbot.core.db import BaseDatabase
 from astrbot.core.message.message_event_result import MessageChain
-from astrbot.core.provider.entities import LLMResponse
+from astrbot.core.provider.entities import LLMResponse, ToolCallsResult
 from astrbot.core.provider.func_tool_manager import FuncCall
 from astrbot.core.utils.io import download_image_by_url
 
 from ..register import register_provider_adapter
+from ..key_pool import APIKeyPool
 
 
 class SuppressNonTextPartsWarning(logging.Filter):
@@ -73,20 +73,39 @@ class ProviderGoogleGenAI(Provider):
         if self.api_base and self.api_base.endswith("/"):
             self.api_base = self.api_base[:-1]
 
+        key_pool_cfg = provider_settings.get("key_pool", {})
+        self.key_pool = APIKeyPool(
+            self.api_keys,
+            max_concurrency=int(key_pool_cfg.get("max_concurrency_per_key", 0)),
+            default_cooldown=float(key_pool_cfg.get("rate_limit_cooldown", 60)),
+        )
+        self._key_clients = {}
+
         self._init_client()
         self.set_model(provider_config["model_config"]["model"])
         self._init_safety_settings()
 
     def _init_client(self) -> None:
         """初始化Gemini客户端"""
-        self.client = genai.Client(
-            api_key=self.chosen_api_key,
+        self.client = self._create_client(self.chosen_api_key)
+
+    def _create_client(self, api_key: str):
+        return genai.Client(
+            api_key=api_key,
             http_options=types.HttpOptions(
                 base_url=self.api_base,
                 timeout=self.timeout * 1000,  # 毫秒
             ),
         ).aio
 
+    def _client_for_key(self, api_key: str = None):
+        """获取使用指定 Key 的客户端"""
+        if not api_key:
+            return self.client
+        if api_key not in self._key_clients:
+            self._key_clients[api_key] = self._create_client(api_key)
+        return self._key_clients[api_key]
+
     def _init_safety_settings(self) -> None:
         """初始化安全设置"""
         user_safety_config = self.provider_config.get("gm_safety_settings", {})
@@ -99,20 +118,36 @@ class ProviderGoogleGenAI(Provider):
             and threshold_str in self.THRESHOLD_MAPPING
         ]
 
-    async def _handle_api_error(self, e: APIError, keys: List[str]) -> bool:
+    @staticmethod
+    def _retry_delay(e: APIError) -> Optional[float]:
+        """从 429 错误的 RetryInfo 中解析重试等待时间"""
+        details = e.details if isinstance(e.details, dict) else {}
+        for item in details.get("error", {}).get("details", []):
+            if isinstance(item, dict) and "retryDelay" in item:
+                match = re.match(r"([\d.]+)s", str(item["retryDelay"]))
+                if match:
+                    return float(match.group(1))
+        return None
+
+    async def _handle_api_error(
+        self, e: APIError, keys: List[str], chosen_key: str
+    ) -> bool:
         """处理API错误，返回是否需要重试"""
-        if e.code == 429 or "API key not valid" in e.message:
-            keys.remove(self.chosen_api_key)
+        if chosen_key and (e.code == 429 or "API key not valid" in e.message):
+            if e.code == 429:
+                self.key_pool.mark_rate_limited(chosen_key, self._retry_delay(e))
+            else:
+                # Key 无效，长时间冷却
+                self.key_pool.mark_rate_limited(chosen_key, 3600)
+            keys.remove(chosen_key)
             if len(keys) > 0:
-                self.set_key(random.choice(keys))
                 logger.info(
-                    f"检测到 Key 异常({e.message})，正在尝试更换 API Key 重试... 当前 Key: {self.chosen_api_key[:12]}..."
+                    f"检测到 Key 异常({e.message})，正在尝试更换 API Key 重试... 当前 Key: {chosen_key[:12]}..."
                 )
-                await asyncio.sleep(1)
                 return True
             else:
                 logger.error(
-                    f"检测到 Key 异常({e.message})，且已没有可用的 Key。 当前 Key: {self.chosen_api_key[:12]}..."
+                    f"检测到 Key 异常({e.message})，且已没有可用的 Key。 当前 Key: {chosen_key[:12]}..."
                 )
                 raise Exception("达到了 Gemini 速率限制, 请稍后再试...")
         else:
@@ -314,7 +349,7 @@ class ProviderGoogleGenAI(Provider):
         return MessageChain(chain=chain)
 
     async def _query(
-        self, payloads: dict, tools: FuncCall
+        self, payloads: dict, tools: FuncCall, api_key: str = None
     ) -> LLMResponse:
         """非流式请求 Gemini API"""
         system_instruction = next(
@@ -335,7 +370,7 @@ class ProviderGoogleGenAI(Provider):
                 config = await self._prepare_query_config(
                     payloads, tools, system_instruction, modalities, temperature
                 )
-                result = await self.client.models.generate_content(
+                result = await self._client_for_key(api_key).models.generate_content(
                     model=self.get_model(),
                     contents=conversation,
                     config=config,
@@ -380,7 +415,7 @@ class ProviderGoogleGenAI(Provider):
         return llm_response
 
     async def _query_stream(
-        self, payloads: dict, tools: FuncCall
+        self, payloads: dict, tools: FuncCall, api_key: str = None
     ) -> AsyncGenerator[LLMResponse, None]:
         """流式请求 Gemini API"""
         system_instruction = next(
@@ -396,7 +431,9 @@ class ProviderGoogleGenAI(Provider):
                 config = await self._prepare_query_config(
                     payloads, tools, system_instruction
                 )
-                result = await self.client.models.generate_content_stream(
+                result = await self._client_for_key(
+                    api_key
+                ).models.generate_content_stream(
                     model=self.get_model(),
                     contents=conversation,
                     config=config,
@@ -465,7 +502,10 @@ class ProviderGoogleGenAI(Provider):
 
         # tool calls result
         if tool_calls_result:
-            context_query.extend(tool_calls_result.to_openai_messages())
+            if isinstance(tool_calls_result, ToolCallsResult):
+                tool_calls_result = [tool_calls_result]
+            for tcr in tool_calls_result:
+                context_query.extend(tcr.to_openai_messages())
 
         model_config = self.provider_config.get("model_config", {})
         model_config["model"] = self.get_model()
@@ -473,15 +513,24 @@ class ProviderGoogleGenAI(Provider):
         payloads = {"messages": context_query, **model_config}
 
         retry = 10
-        keys = self.api_keys.copy()
+        keys = self.key_pool.keys()
 
         for _ in range(retry):
+            chosen_key = await self.key_pool.acquire(keys) if keys else None
+            success = False
             try:
-                return await self._query(payloads, func_tool)
+                llm_response = await self._query(payloads, func_tool, chosen_key)
+                success = True
+                return llm_response
             except APIError as e:
-                if await self._handle_api_error(e, keys):
+                await self.key_pool.release(chosen_key, success=False, error=e)
+                failed_key, chosen_key = chosen_key, None
+                if await self._handle_api_error(e, keys, failed_key):
                     continue
                 break
+            finally:
+                if chosen_key:
+                    await self.key_pool.release(chosen_key, success=success)
 
     async def text_chat_stream(
         self,
@@ -505,7 +554,10 @@ class ProviderGoogleGenAI(Provider):
 
         # tool calls result
         if tool_calls_result:
-            context_query.extend(tool_calls_result.to_openai_messages())
+            if isinstance(tool_calls_result, ToolCallsResult):
+                tool_calls_result = [tool_calls_result]
+            for tcr in tool_calls_result:
+                context_query.extend(tcr.to_openai_messages())
 
         model_config = self.provider_config.get("model_config", {})
         model_config["model"] = self.get_model()
@@ -513,17 +565,27 @@ class ProviderGoogleGenAI(Provider):
         payloads = {"messages": context_query, **model_config}
 
         retry = 10
-        keys = self.api_keys.copy()
+        keys = self.key_pool.keys()
 
         for _ in range(retry):
+            chosen_key = await self.key_pool.acquire(keys) if keys else None
+            success = False
             try:
-                async for response in self._query_stream(payloads, func_tool):
+                async for response in self._query_stream(
+                    payloads, func_tool, chosen_key
+                ):
                     yield response
+                success = True
                 break
             except APIError as e:
-                if await self._handle_api_error(e, keys):
+                await self.key_pool.release(chosen_key, success=False, error=e)
+                failed_key, chosen_key = chosen_key, None
+                if await self._handle_api_error(e, keys, failed_key):
                     continue
                 break
+            finally:
+                if chosen_key:
+                    await self.key_pool.release(chosen_key, success=success)
 
     async def get_models(self):
         try:
@@ -545,6 +607,7 @@ class ProviderGoogleGenAI(Provider):
     def set_key(self, key):
         self.chosen_api_key = key
         self._init_client()
+        self.key_pool.prefer(key)
 
     async def assemble_context(self, text: str, image_urls: List[str] = None):
         """
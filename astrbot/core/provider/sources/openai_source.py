@@ -1,16 +1,19 @@
 import base64
 import json
+import hashlib
 import os
 import inspect
-import random
-import asyncio
 import astrbot.core.message.components as Comp
 
 from openai import AsyncOpenAI, AsyncAzureOpenAI
 from openai.types.chat.chat_completion import ChatCompletion
 
 # from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
-from openai._exceptions import NotFoundError, UnprocessableEntityError
+from openai._exceptions import (
+    NotFoundError,
+    UnprocessableEntityError,
+    APIStatusError,
+)
 from openai.lib.streaming.chat._completions import ChatCompletionStreamState
 from astrbot.core.utils.io import download_image_by_url
 from astrbot.core.message.message_event_result import MessageChain
@@ -18,10 +21,12 @@ from astrbot.core.message.message_event_result import MessageChain
 from astrbot.core.db import BaseDatabase
 from astrbot.api.provider import Provider, Personality
 from astrbot import logger
+from astrbot.core.log import lazy_repr
 from astrbot.core.provider.func_tool_manager import FuncCall
 from typing import List, AsyncGenerator
 from ..register import register_provider_adapter
-from astrbot.core.provider.entities import LLMResponse
+from ..key_pool import APIKeyPool
+from astrbot.core.provider.entities import LLMResponse, ToolCallsResult
 
 
 @register_provider_adapter(
@@ -66,6 +71,12 @@ class ProviderOpenAIOfficial(Provider):
                 timeout=self.timeout,
             )
 
+        self.key_pool = APIKeyPool(
+            self.api_keys,
+            **self._key_pool_settings(),
+        )
+        self._key_clients = {}
+
         self.default_params = inspect.signature(
             self.client.chat.completions.create
         ).parameters.keys()
@@ -85,7 +96,24 @@ class ProviderOpenAIOfficial(Provider):
         except NotFoundError as e:
             raise Exception(f"获取模型列表失败：{e}")
 
-    async def _query(self, payloads: dict, tools: FuncCall) -> LLMResponse:
+    def _key_pool_settings(self) -> dict:
+        key_pool_cfg = self.provider_settings.get("key_pool", {})
+        return {
+            "max_concurrency": int(key_pool_cfg.get("max_concurrency_per_key", 0)),
+            "default_cooldown": float(key_pool_cfg.get("rate_limit_cooldown", 60)),
+        }
+
+    def _client_for_key(self, api_key: str = None):
+        """获取使用指定 Key 的客户端。各 Key 的客户端共享同一个连接池"""
+        if not api_key:
+            return self.client
+        if api_key not in self._key_clients:
+            self._key_clients[api_key] = self.client.with_options(api_key=api_key)
+        return self._key_clients[api_key]
+
+    async def _query(
+        self, payloads: dict, tools: FuncCall, api_key: str = None
+    ) -> LLMResponse:
         if tools:
             model = payloads.get("model", "").lower()
             omit_empty_param_field = "gemini" in model
@@ -105,23 +133,28 @@ class ProviderOpenAIOfficial(Provider):
         for key in to_del:
             del payloads[key]
 
-        completion = await self.client.chat.completions.create(
+        raw_response = await self._client_for_key(
+            api_key
+        ).chat.completions.with_raw_response.create(
             **payloads, stream=False, extra_body=extra_body
         )
+        if api_key:
+            self.key_pool.update_from_headers(api_key, raw_response.headers)
+        completion = raw_response.parse()
 
         if not isinstance(completion, ChatCompletion):
             raise Exception(
                 f"API 返回的 completion 类型错误：{type(completion)}: {completion}。"
             )
 
-        logger.debug(f"completion: {completion}")
+        logger.debug("completion: %s", lazy_repr(completion))
 
         llm_response = await self.parse_openai_completion(completion, tools)
 
         return llm_response
 
     async def _query_stream(
-        self, payloads: dict, tools: FuncCall
+        self, payloads: dict, tools: FuncCall, api_key: str = None
     ) -> AsyncGenerator[LLMResponse, None]:
         """流式查询API，逐步返回结果"""
         if tools:
@@ -143,9 +176,14 @@ class ProviderOpenAIOfficial(Provider):
         for key in to_del:
             del payloads[key]
 
-        stream = await self.client.chat.completions.create(
+        raw_response = await self._client_for_key(
+            api_key
+        ).chat.completions.with_raw_response.create(
             **payloads, stream=True, extra_body=extra_body
         )
+        if api_key:
+            self.key_pool.update_from_headers(api_key, raw_response.headers)
+        stream = raw_response.parse()
 
         llm_response = LLMResponse("assistant", is_chunk=True)
 
@@ -193,12 +231,11 @@ class ProviderOpenAIOfficial(Provider):
             func_name_ls = []
             tool_call_ids = []
             for tool_call in choice.message.tool_calls:
-                for tool in tools.func_list:
-                    if tool.name == tool_call.function.name:
-                        args = json.loads(tool_call.function.arguments)
-                        args_ls.append(args)
-                        func_name_ls.append(tool_call.function.name)
-                        tool_call_ids.append(tool_call.id)
+                if tools.get_func(tool_call.function.name):
+                    args = json.loads(tool_call.function.arguments)
+                    args_ls.append(args)
+                    func_name_ls.append(tool_call.function.name)
+                    tool_call_ids.append(tool_call.id)
             llm_response.role = "tool"
             llm_response.tools_call_args = args_ls
             llm_response.tools_call_name = func_name_ls
@@ -240,13 +277,28 @@ class ProviderOpenAIOfficial(Provider):
 
         # tool calls result
         if tool_calls_result:
-            context_query.extend(tool_calls_result.to_openai_messages())
+            if isinstance(tool_calls_result, ToolCallsResult):
+                tool_calls_result = [tool_calls_result]
+            for tcr in tool_calls_result:
+                context_query.extend(tcr.to_openai_messages())
 
         model_config = self.provider_config.get("model_config", {})
         model_config["model"] = self.get_model()
 
         payloads = {"messages": context_query, **model_config}
 
+        if (
+            self.provider_settings.get("prompt_cache_friendly", False)
+            and self.provider_config.get("prompt_cache_key", False)
+            and session_id
+        ):
+            # 同一会话的请求前缀相同，提示服务端将其路由到同一缓存。
+            # 不是所有 OpenAI 兼容服务都接受这个参数，需要在提供商中开启
+            payloads.setdefault(
+                "prompt_cache_key",
+                hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32],
+            )
+
         return payloads, context_query, func_tool
 
     async def _handle_api_error(
@@ -261,16 +313,19 @@ class ProviderOpenAIOfficial(Provider):
         max_retries: int,
     ) -> tuple:
         """处理API错误并尝试恢复"""
-        if "429" in str(e):
+        status_code = getattr(e, "status_code", None)
+        if chosen_key and (
+            status_code == 429 or (status_code is None and "429" in str(e))
+        ):
+            retry_after = None
+            if isinstance(e, APIStatusError):
+                retry_after = APIKeyPool.retry_after_from_headers(e.response.headers)
+            self.key_pool.mark_rate_limited(chosen_key, retry_after)
             logger.warning(
                 f"API 调用过于频繁，尝试使用其他 Key 重试。当前 Key: {chosen_key[:12]}"
             )
-            # 最后一次不等待
-            if retry_cnt < max_retries - 1:
-                await asyncio.sleep(1)
             available_api_keys.remove(chosen_key)
             if len(available_api_keys) > 0:
-                chosen_key = random.choice(available_api_keys)
                 return (
                     False,
                     chosen_key,
@@ -359,15 +414,20 @@ class ProviderOpenAIOfficial(Provider):
 
         llm_response = None
         max_retries = 10
-        available_api_keys = self.api_keys.copy()
-        chosen_key = random.choice(available_api_keys)
+        available_api_keys = self.key_pool.keys()
 
         e = None
         retry_cnt = 0
         for retry_cnt in range(max_retries):
+            chosen_key = (
+                await self.key_pool.acquire(available_api_keys)
+                if available_api_keys
+                else None
+            )
+            success = False
             try:
-                self.client.api_key = chosen_key
-                llm_response = await self._query(payloads, func_tool)
+                llm_response = await self._query(payloads, func_tool, chosen_key)
+                success = True
                 break
             except UnprocessableEntityError as e:
                 logger.warning(f"不可处理的实体错误：{e}，尝试删除图片。")
@@ -376,9 +436,11 @@ class ProviderOpenAIOfficial(Provider):
                 payloads["messages"] = new_contexts
                 context_query = new_contexts
             except Exception as e:
+                await self.key_pool.release(chosen_key, success=False, error=e)
+                failed_key, chosen_key = chosen_key, None
                 (
                     success,
-                    chosen_key,
+                    _,
                     available_api_keys,
                     payloads,
                     context_query,
@@ -388,13 +450,16 @@ class ProviderOpenAIOfficial(Provider):
                     payloads,
                     context_query,
                     func_tool,
-                    chosen_key,
+                    failed_key,
                     available_api_keys,
                     retry_cnt,
                     max_retries,
                 )
                 if success:
                     break
+            finally:
+                if chosen_key:
+                    await self.key_pool.release(chosen_key, success=success)
 
         if retry_cnt == max_retries - 1:
             logger.error(f"API 调用失败，重试 {max_retries} 次仍然失败。")
@@ -425,16 +490,23 @@ class ProviderOpenAIOfficial(Provider):
         )
 
         max_retries = 10
-        available_api_keys = self.api_keys.copy()
-        chosen_key = random.choice(available_api_keys)
+        available_api_keys = self.key_pool.keys()
 
         e = None
         retry_cnt = 0
         for retry_cnt in range(max_retries):
+            chosen_key = (
+                await self.key_pool.acquire(available_api_keys)
+                if available_api_keys
+                else None
+            )
+            success = False
             try:
-                self.client.api_key = chosen_key
-                async for response in self._query_stream(payloads, func_tool):
+                async for response in self._query_stream(
+                    payloads, func_tool, chosen_key
+                ):
                     yield response
+                success = True
                 break
             except UnprocessableEntityError as e:
                 logger.warning(f"不可处理的实体错误：{e}，尝试删除图片。")
@@ -443,9 +515,11 @@ class ProviderOpenAIOfficial(Provider):
                 payloads["messages"] = new_contexts
                 context_query = new_contexts
             except Exception as e:
+                await self.key_pool.release(chosen_key, success=False, error=e)
+                failed_key, chosen_key = chosen_key, None
                 (
                     success,
-                    chosen_key,
+                    _,
                     available_api_keys,
                     payloads,
                     context_query,
@@ -455,13 +529,16 @@ class ProviderOpenAIOfficial(Provider):
                     payloads,
                     context_query,
                     func_tool,
-                    chosen_key,
+                    failed_key,
                     available_api_keys,
                     retry_cnt,
                     max_retries,
                 )
                 if success:
                     break
+            finally:
+                if chosen_key:
+                    await self.key_pool.release(chosen_key, success=success)
 
         if retry_cnt == max_retries - 1:
             logger.error(f"API 调用失败，重试 {max_retries} 次仍然失败。")
@@ -501,6 +578,7 @@ class ProviderOpenAIOfficial(Provider):
 
     def set_key(self, key):
         self.client.api_key = key
+        self.key_pool.prefer(key)
 
     async def assemble_context(self, text: str, image_urls: List[str] = None) -> dict:
         """组装成符合 OpenAI 格式的 role 为 user 的消息段"""
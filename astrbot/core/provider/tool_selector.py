@@ -0,0 +1,234 @@
+"""
+根据当前请求的相关性挑选函数工具的子集，减少每次请求中工具描述占用的 Token。
+
+默认使用 BM25 对工具的名称、描述和参数进行检索；配置了 Embedding 服务时可以使用向量相似度。固定的工具始终会被发送。
+"""
+
+import asyncio
+import json
+import math
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from astrbot.core import logger
+from .entities import ProviderRequest
+from .func_tool_manager import FuncCall, FuncTool
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+|[\u3400-\u9fff]+")
+_CAMEL_PATTERN = re.compile(r"([a-z0-9])([A-Z])")
+
+
+def tokenize(text: str) -> List[str]:
+    """英文按单词切分(拆开下划线与驼峰命名)，中文使用单字与双字"""
+    text = _CAMEL_PATTERN.sub(r"\1 \2", text or "").lower()
+    tokens = []
+    for word in _WORD_PATTERN.findall(text):
+        if word[0].isascii():
+            tokens.append(word)
+        else:
+            tokens.extend(word)
+            tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def tool_text(tool: FuncTool) -> str:
+    parts = [tool.name, tool.name, tool.description or ""]
+    for name, prop in (tool.parameters or {}).get("properties", {}).items():
+        parts.append(name)
+        if isinstance(prop, dict):
+            parts.append(str(prop.get("description", "")))
+    return " ".join(parts)
+
+
+class BM25Index:
+    def __init__(self, docs: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tfs = [Counter(doc) for doc in docs]
+        self.lens = [len(doc) for doc in docs]
+        self.avgdl = sum(self.lens) / len(docs) if docs else 0
+        df = Counter()
+        for tf in self.tfs:
+            df.update(tf.keys())
+        n = len(docs)
+        self.idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def scores(self, query: List[str]) -> List[float]:
+        terms = [t for t in set(query) if t in self.idf]
+        result = []
+        for tf, dl in zip(self.tfs, self.lens):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * dl / (self.avgdl or 1))
+            for t in terms:
+                f = tf.get(t)
+                if f:
+                    score += self.idf[t] * f * (self.k1 + 1) / (f + norm)
+            result.append(score)
+        return result
+
+
+@dataclass
+class SelectionStats:
+    requests: int = 0
+    tools_total: int = 0
+    tools_sent: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "avg_tools_total": self.tools_total / self.requests if self.requests else 0,
+            "avg_tools_sent": self.tools_sent / self.requests if self.requests else 0,
+        }
+
+
+class ToolSelector:
+    SUBSET_CACHE_SIZE = 64
+
+    def __init__(self, cfg: dict) -> None:
+        self.top_k = max(1, int(cfg.get("top_k", 8)))
+        self.pinned = set(cfg.get("pinned_tools", []))
+        self.context_turns = int(cfg.get("context_turns", 1))
+        """除当前 Prompt 外，参与检索的最近几条用户消息"""
+        self.embedding = None
+        if cfg.get("method", "bm25") == "embedding":
+            if cfg.get("embedding_api_key") and cfg.get("embedding_model"):
+                from astrbot.core.rag.embedding.openai_source import (
+                    SimpleOpenAIEmbedding,
+                )
+
+                self.embedding = SimpleOpenAIEmbedding(
+                    model=cfg["embedding_model"],
+                    api_key=cfg["embedding_api_key"],
+                    api_base=cfg.get("embedding_api_base") or None,
+                )
+            else:
+                logger.warning("工具筛选未配置 Embedding 服务，将使用 BM25。")
+
+        self._index: Optional[Tuple[tuple, List[FuncTool], BM25Index]] = None
+        self._tool_vectors: Dict[str, Tuple[str, List[float]]] = {}
+        self._subsets: "OrderedDict[tuple, FuncCall]" = OrderedDict()
+        self.stats = SelectionStats()
+
+    def build_query(self, req: ProviderRequest) -> str:
+        parts = [req.prompt or ""]
+        if self.context_turns > 0 and req.contexts:
+            user_msgs = []
+            for ctx in reversed(req.contexts):
+                if ctx.get("role") == "user" and isinstance(ctx.get("content"), str):
+                    user_msgs.append(ctx["content"])
+                    if len(user_msgs) >= self.context_turns:
+                        break
+            parts.extend(user_msgs)
+        return "\n".join(parts)
+
+    def _bm25(self, func_call: FuncCall) -> Tuple[List[FuncTool], BM25Index]:
+        key = (id(func_call), func_call.version)
+        if self._index is None or self._index[0] != key:
+            tools = [f for f in func_call.func_list if f.active]
+            index = BM25Index([tokenize(tool_text(f)) for f in tools])
+            self._index = (key, tools, index)
+        return self._index[1], self._index[2]
+
+    async def _embedding_scores(self, tools: List[FuncTool], query: str) -> List[float]:
+        missing = []
+        for f in tools:
+            text = tool_text(f)
+            cached = self._tool_vectors.get(f.name)
+            if not cached or cached[0] != text:
+                missing.append((f.name, text))
+        vectors = await asyncio.gather(
+            *[self.embedding.get_embedding(text) for _, text in missing]
+        )
+        for (name, text), vec in zip(missing, vectors):
+            self._tool_vectors[name] = (text, vec)
+        q = await self.embedding.get_embedding(query)
+        return [
+            sum(a * b for a, b in zip(q, self._tool_vectors[f.name][1])) for f in tools
+        ]
+
+    async def rank(
+        self, func_call: FuncCall, query: str
+    ) -> List[Tuple[FuncTool, float]]:
+        """返回按相关性降序排列的已激活工具及其得分"""
+        tools, index = self._bm25(func_call)
+        scores = None
+        if self.embedding:
+            try:
+                scores = await self._embedding_scores(tools, query)
+            except Exception as e:
+                logger.warning(f"工具筛选获取 Embedding 失败，将使用 BM25: {e}")
+        if scores is None:
+            scores = index.scores(tokenize(query))
+        return sorted(zip(tools, scores), key=lambda x: x[1], reverse=True)
+
+    async def select(self, func_call: FuncCall, query: str) -> FuncCall:
+        """返回只包含固定工具与最相关的 top_k 个工具的 FuncCall。工具数量不多时原样返回"""
+        active = [f for f in func_call.func_list if f.active]
+        if len(active) <= self.top_k + len(self.pinned):
+            return func_call
+
+        ranked = await self.rank(func_call, query)
+        chosen = {f.name for f in active if f.name in self.pinned}
+        added = 0
+        for f, score in ranked:
+            if added >= self.top_k or score <= 0:
+                break
+            if f.name not in chosen:
+                chosen.add(f.name)
+                added += 1
+        # 保持原有顺序，使相同的子集得到相同的请求内容，便于利用 Prompt 缓存
+        selected = [f for f in active if f.name in chosen]
+
+        self.stats.requests += 1
+        self.stats.tools_total += len(active)
+        self.stats.tools_sent += len(selected)
+        logger.debug(f"工具筛选: {len(active)} -> {[f.name for f in selected]}")
+        return self._subset(func_call, selected)
+
+    def _subset(self, func_call: FuncCall, tools: List[FuncTool]) -> FuncCall:
+        key = (id(func_call), func_call.version, tuple(f.name for f in tools))
+        subset = self._subsets.get(key)
+        if subset is None:
+            subset = FuncCall()
+            subset.func_list = tools
+            subset.mcp_client_dict = func_call.mcp_client_dict
+            self._subsets[key] = subset
+            if len(self._subsets) > self.SUBSET_CACHE_SIZE:
+                self._subsets.popitem(last=False)
+        else:
+            self._subsets.move_to_end(key)
+        return subset
+
+
+def estimate_tool_tokens(func_call: FuncCall) -> int:
+    """粗略估计 OpenAI 风格工具描述占用的 Token 数"""
+    payload = json.dumps(func_call.get_func_desc_openai_style(), ensure_ascii=False)
+    return len(payload) // 4
+
+
+async def evaluate_selection(
+    selector: ToolSelector, func_call: FuncCall, cases: List[Tuple[str, List[str]]]
+) -> dict:
+    """评估工具筛选的召回率与节省的 Token。
+
+    Args:
+        cases: (查询, 期望被选中的工具名列表) 的列表
+    """
+    full_tokens = estimate_tool_tokens(func_call)
+    sent_tokens = 0
+    hit = total = 0
+    for query, expected in cases:
+        subset = await selector.select(func_call, query)
+        sent_tokens += estimate_tool_tokens(subset)
+        names = {f.name for f in subset.func_list}
+        hit += sum(1 for name in expected if name in names)
+        total += len(expected)
+    return {
+        "recall": hit / total if total else 1.0,
+        "full_tokens_per_request": full_tokens,
+        "sent_tokens_per_request": sent_tokens / len(cases) if cases else 0,
+        "token_saving": 1 - sent_tokens / (full_tokens * len(cases))
+        if cases and full_tokens
+        else 0,
+    }
@@ -306,7 +306,7 @@ def register_on_llm_response(**kwargs):
     return decorator
 
 
-def register_llm_tool(name: str = None):
+def register_llm_tool(name: str = None, concurrent: bool = True):
     """为函数调用（function-calling / tools-use）添加工具。
 
     请务必按照以下格式编写一个工具（包括函数注释，AstrBot 会尝试解析该函数注释）
@@ -337,6 +337,9 @@ def register_llm_tool(name: str = None):
     event.stop_event()
     yield
     ```
+
+    当 LLM 在一次回复中调用多个工具时，工具会被并发执行。如果工具会修改 event 的结果或者不适合并发执行，请设置 `concurrent=False`。
+    使用 yield 的工具始终逐个执行。
     """
 
     name_ = name
@@ -359,7 +362,11 @@ def register_llm_tool(name: str = None):
             )
         md = get_handler_or_create(awaitable, EventType.OnCallingFuncToolEvent)
         llm_tools.add_func(
-            llm_tool_name, args, docstring.description.strip(), md.handler
+            llm_tool_name,
+            args,
+            docstring.description.strip(),
+            md.handler,
+            concurrent=concurrent,
         )
         return awaitable
 
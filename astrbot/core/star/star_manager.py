@@ -8,11 +8,12 @@ import os
 import sys
 import json
 import traceback
+import copy
+import time
 import yaml
-import logging
 import asyncio
 from types import ModuleType
-from typing import List
+from typing import Any, Callable, Dict, List, Tuple
 from astrbot.core.config.astrbot_config import AstrBotConfig
 from astrbot.core import logger, sp, pip_installer
 from .context import Context
@@ -25,6 +26,24 @@ from astrbot.core.provider.register import llm_tools
 
 from .filter.permission import PermissionTypeFilter, PermissionType
 
+_plugin_file_cache: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+"""插件的 metadata.yaml、_conf_schema.json 解析结果。key 是文件路径, 文件的修改时间和大小不变时直接复用"""
+
+
+def _load_plugin_file(path: str, parser: Callable[[str], Any]) -> Any:
+    """读取并解析插件目录中的文件, 解析结果按文件修改时间缓存。
+
+    返回缓存的深拷贝: Schema 中的默认值会被直接放入插件配置, 之后对配置的修改不能影响缓存
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _plugin_file_cache.get(path)
+    if not cached or cached[0] != key:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = (key, parser(f.read()))
+        _plugin_file_cache[path] = cached
+    return copy.deepcopy(cached[1])
+
 
 class PluginManager:
     def __init__(self, context: Context, config: AstrBotConfig):
@@ -57,6 +76,9 @@ class PluginManager:
 
         self.failed_plugin_info = ""
 
+        self.load_timings: Dict[str, Dict[str, float]] = {}
+        """最近一次载入各插件的耗时(毫秒)。key 是插件目录名"""
+
     def _get_classes(self, arg: ModuleType):
         """获取指定模块（可以理解为一个 python 文件）下所有的类"""
         classes = []
@@ -104,28 +126,47 @@ class PluginManager:
             plugins.extend(_p)
         return plugins
 
-    def _check_plugin_dept_update(self, target_plugin: str = None):
+    async def _check_plugin_dept_update(self, target_plugins: List[str] = None):
         """检查插件的依赖
-        如果 target_plugin 为 None，则检查所有插件的依赖
+        如果 target_plugins 为 None，则检查所有插件的依赖
+
+        所有插件的 requirements.txt 在一个 pip 子进程中一起安装，失败时再逐个安装，
+        以免某个插件的依赖冲突影响其他插件。
         """
-        plugin_dir = self.plugin_store_path
-        if not os.path.exists(plugin_dir):
-            return False
         to_update = []
-        if target_plugin:
-            to_update.append(target_plugin)
+        if target_plugins:
+            to_update.extend(target_plugins)
         else:
             for p in self.context.get_all_stars():
                 to_update.append(p.root_dir_name)
-        for p in to_update:
-            plugin_path = os.path.join(plugin_dir, p)
-            if os.path.exists(os.path.join(plugin_path, "requirements.txt")):
-                pth = os.path.join(plugin_path, "requirements.txt")
-                logger.info(f"正在安装插件 {p} 所需的依赖库: {pth}")
-                try:
-                    pip_installer.install(requirements_path=pth)
-                except Exception as e:
-                    logger.error(f"更新插件 {p} 的依赖失败。Code: {str(e)}")
+        requirements = await asyncio.to_thread(self._find_requirements, to_update)
+        if not requirements:
+            return
+        logger.info(f"正在安装插件 {', '.join(requirements)} 所需的依赖库")
+        try:
+            await pip_installer.install_requirements(list(requirements.values()))
+            return
+        except Exception as e:
+            if len(requirements) == 1:
+                logger.error(
+                    f"更新插件 {next(iter(requirements))} 的依赖失败。Code: {str(e)}"
+                )
+                return
+            logger.warning(f"批量安装插件依赖失败，将逐个安装。Code: {str(e)}")
+        for p, pth in requirements.items():
+            try:
+                await pip_installer.install_requirements([pth])
+            except Exception as e:
+                logger.error(f"更新插件 {p} 的依赖失败。Code: {str(e)}")
+
+    def _find_requirements(self, plugins: List[str]) -> Dict[str, str]:
+        """返回插件目录名到 requirements.txt 路径的映射，只包含存在该文件的插件"""
+        requirements = {}
+        for p in plugins:
+            pth = os.path.join(self.plugin_store_path, p, "requirements.txt")
+            if os.path.exists(pth):
+                requirements[p] = pth
+        return requirements
 
     def _load_plugin_metadata(self, plugin_path: str, plugin_obj=None) -> StarMetadata:
         """v3.4.0 以前的方式载入插件元数据
@@ -138,10 +179,9 @@ class PluginManager:
             raise Exception("插件不存在。")
 
         if os.path.exists(os.path.join(plugin_path, "metadata.yaml")):
-            with open(
-                os.path.join(plugin_path, "metadata.yaml"), "r", encoding="utf-8"
-            ) as f:
-                metadata = yaml.safe_load(f)
+            metadata = _load_plugin_file(
+                os.path.join(plugin_path, "metadata.yaml"), yaml.safe_load
+            )
         elif plugin_obj:
             # 使用 info() 函数
             metadata = plugin_obj.info()
@@ -319,58 +359,71 @@ class PluginManager:
 
         fail_rec = ""
 
-        # 导入插件模块，并尝试实例化插件类
+        targets = []
         for plugin_module in plugin_modules:
-            try:
-                module_str = plugin_module["module"]
-                # module_path = plugin_module['module_path']
-                root_dir_name = plugin_module["pname"]  # 插件的目录名
-                reserved = plugin_module.get(
-                    "reserved", False
-                )  # 是否是保留插件。目前在 packages/ 目录下的都是保留插件。保留插件不可以卸载。
-
-                path = "data.plugins." if not reserved else "packages."
-                path += root_dir_name + "." + module_str
-
-                # 检查是否需要载入指定的插件
-                if specified_module_path and path != specified_module_path:
-                    continue
-                if specified_dir_name and root_dir_name != specified_dir_name:
-                    continue
-
-                logger.info(f"正在载入插件 {root_dir_name} ...")
+            module_str = plugin_module["module"]
+            root_dir_name = plugin_module["pname"]  # 插件的目录名
+            reserved = plugin_module.get(
+                "reserved", False
+            )  # 是否是保留插件。目前在 packages/ 目录下的都是保留插件。保留插件不可以卸载。
+
+            path = "data.plugins." if not reserved else "packages."
+            path += root_dir_name + "." + module_str
+
+            # 检查是否需要载入指定的插件
+            if specified_module_path and path != specified_module_path:
+                continue
+            if specified_dir_name and root_dir_name != specified_dir_name:
+                continue
+
+            plugin_module["path"] = path
+            plugin_module["dir_path"] = (
+                os.path.join(self.plugin_store_path, root_dir_name)
+                if not reserved
+                else os.path.join(self.reserved_plugin_path, root_dir_name)
+            )
+            targets.append(plugin_module)
+            self.load_timings[root_dir_name] = {}
+
+        # 插件的元数据和配置 Schema 文件互不相关，在线程中并发读取并缓存
+        await asyncio.gather(
+            *[
+                asyncio.to_thread(self._preload_plugin_files, p["dir_path"])
+                for p in targets
+            ]
+        )
 
-                # 尝试导入模块
-                try:
-                    module = __import__(path, fromlist=[module_str])
-                except (ModuleNotFoundError, ImportError):
-                    # 尝试安装依赖
-                    self._check_plugin_dept_update(target_plugin=root_dir_name)
-                    module = __import__(path, fromlist=[module_str])
-                except Exception as e:
-                    logger.error(traceback.format_exc())
-                    logger.error(f"插件 {root_dir_name} 导入失败。原因：{str(e)}")
-                    continue
+        # 导入插件模块。导入时插件通过装饰器注册到全局的 star_map、handler 注册表中，
+        # handler 的顺序与导入顺序有关，因此按顺序导入
+        modules, import_fail_rec = await self._import_plugin_modules(targets)
+        fail_rec += import_fail_rec
+
+        # 实例化插件类
+        to_initialize = []
+        for plugin_module in targets:
+            root_dir_name = plugin_module["pname"]
+            path = plugin_module["path"]
+            module = modules.get(path)
+            if module is None:
+                continue
+            start = time.perf_counter()
+            try:
+                reserved = plugin_module.get("reserved", False)
+                plugin_dir_path = plugin_module["dir_path"]
 
                 # 检查 _conf_schema.json
                 plugin_config = None
-                plugin_dir_path = (
-                    os.path.join(self.plugin_store_path, root_dir_name)
-                    if not reserved
-                    else os.path.join(self.reserved_plugin_path, root_dir_name)
-                )
                 plugin_schema_path = os.path.join(
                     plugin_dir_path, self.conf_schema_fname
                 )
                 if os.path.exists(plugin_schema_path):
                     # 加载插件配置
-                    with open(plugin_schema_path, "r", encoding="utf-8") as f:
-                        plugin_config = AstrBotConfig(
-                            config_path=os.path.join(
-                                self.plugin_config_path, f"{root_dir_name}_config.json"
-                            ),
-                            schema=json.loads(f.read()),
-                        )
+                    plugin_config = AstrBotConfig(
+                        config_path=os.path.join(
+                            self.plugin_config_path, f"{root_dir_name}_config.json"
+                        ),
+                        schema=_load_plugin_file(plugin_schema_path, json.loads),
+                    )
 
                 if path in star_map:
                     # 通过装饰器的方式注册插件
@@ -525,19 +578,39 @@ class PluginManager:
 
                 # 执行 initialize() 方法
                 if hasattr(metadata.star_cls, "initialize"):
-                    await metadata.star_cls.initialize()
+                    to_initialize.append((root_dir_name, metadata.star_cls))
 
             except BaseException as e:
-                logger.error(f"----- 插件 {root_dir_name} 载入失败 -----")
-                errors = traceback.format_exc()
-                for line in errors.split("\n"):
-                    logger.error(f"| {line}")
-                logger.error("----------------------------------")
-                fail_rec += f"加载 {root_dir_name} 插件时出现问题，原因 {str(e)}。\n"
+                fail_rec += self._log_load_failure(root_dir_name, e)
+            finally:
+                self._record_load_timing(root_dir_name, "instantiate", start)
+
+        # 执行 initialize()。插件可能依赖其他插件先完成初始化，默认按顺序执行
+        if self.config.get("plugin_concurrent_initialize", False):
+            results = await asyncio.gather(
+                *[
+                    self._initialize_plugin(root_dir_name, star_cls)
+                    for root_dir_name, star_cls in to_initialize
+                ],
+                return_exceptions=True,
+            )
+        else:
+            results = []
+            for root_dir_name, star_cls in to_initialize:
+                try:
+                    results.append(
+                        await self._initialize_plugin(root_dir_name, star_cls)
+                    )
+                except BaseException as e:
+                    results.append(e)
+        for (root_dir_name, _), result in zip(to_initialize, results):
+            if isinstance(result, BaseException):
+                fail_rec += self._log_load_failure(root_dir_name, result)
 
-        # 清除 pip.main 导致的多余的 logging handlers
-        for handler in logging.root.handlers[:]:
-            logging.root.removeHandler(handler)
+        for plugin_module in targets:
+            timings = self.load_timings[plugin_module["pname"]]
+            timings["total"] = round(sum(timings.values()), 2)
+            logger.debug(f"插件 {plugin_module['pname']} 载入耗时: {timings}")
 
         if not fail_rec:
             return True, None
@@ -545,6 +618,96 @@ class PluginManager:
             self.failed_plugin_info = fail_rec
             return False, fail_rec
 
+    def _preload_plugin_files(self, plugin_dir_path: str):
+        """读取插件的 metadata.yaml 和 _conf_schema.json 并放入缓存"""
+        for fname, parser in (
+            ("metadata.yaml", yaml.safe_load),
+            (self.conf_schema_fname, json.loads),
+        ):
+            fpath = os.path.join(plugin_dir_path, fname)
+            if not os.path.exists(fpath):
+                continue
+            try:
+                _load_plugin_file(fpath, parser)
+            except Exception:
+                # 载入插件时会再次读取并报告错误
+                pass
+
+    def _record_load_timing(self, root_dir_name: str, stage: str, start: float):
+        timings = self.load_timings.setdefault(root_dir_name, {})
+        timings[stage] = round(
+            timings.get(stage, 0) + (time.perf_counter() - start) * 1000, 2
+        )
+
+    def _log_load_failure(self, root_dir_name: str, e: BaseException) -> str:
+        logger.error(f"----- 插件 {root_dir_name} 载入失败 -----")
+        errors = "".join(traceback.format_exception(e))
+        for line in errors.split("\n"):
+            logger.error(f"| {line}")
+        logger.error("----------------------------------")
+        return f"加载 {root_dir_name} 插件时出现问题，原因 {str(e)}。\n"
+
+    async def _import_plugin_modules(
+        self, targets: List[dict]
+    ) -> Tuple[Dict[str, ModuleType], str]:
+        """导入插件模块
+
+        缺少依赖而导入失败的插件，在所有插件导入后一起安装依赖，再重新导入。
+
+        Returns:
+            tuple: (modules, fail_rec)
+                - modules (dict): 导入成功的模块。key 是模块路径
+                - fail_rec (str): 重新导入仍然失败的插件的错误信息
+        """
+        modules = {}
+        missing_deps = []
+        for plugin_module in targets:
+            root_dir_name = plugin_module["pname"]
+            logger.info(f"正在载入插件 {root_dir_name} ...")
+            start = time.perf_counter()
+            try:
+                modules[plugin_module["path"]] = __import__(
+                    plugin_module["path"], fromlist=[plugin_module["module"]]
+                )
+            except (ModuleNotFoundError, ImportError):
+                missing_deps.append(plugin_module)
+            except Exception as e:
+                logger.error(traceback.format_exc())
+                logger.error(f"插件 {root_dir_name} 导入失败。原因：{str(e)}")
+            finally:
+                self._record_load_timing(root_dir_name, "import", start)
+
+        if not missing_deps:
+            return modules, ""
+
+        # 尝试安装依赖
+        start = time.perf_counter()
+        await self._check_plugin_dept_update(
+            target_plugins=[p["pname"] for p in missing_deps]
+        )
+        for plugin_module in missing_deps:
+            self._record_load_timing(plugin_module["pname"], "install", start)
+
+        fail_rec = ""
+        for plugin_module in missing_deps:
+            start = time.perf_counter()
+            try:
+                modules[plugin_module["path"]] = __import__(
+                    plugin_module["path"], fromlist=[plugin_module["module"]]
+                )
+            except BaseException as e:
+                fail_rec += self._log_load_failure(plugin_module["pname"], e)
+            finally:
+                self._record_load_timing(plugin_module["pname"], "import", start)
+        return modules, fail_rec
+
+    async def _initialize_plugin(self, root_dir_name: str, star_cls):
+        start = time.perf_counter()
+        try:
+            await star_cls.initialize()
+        finally:
+            self._record_load_timing(root_dir_name, "initialize", start)
+
     async def install_plugin(self, repo_url: str, proxy=""):
         """从仓库 URL 安装插件
 
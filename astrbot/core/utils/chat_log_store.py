@@ -0,0 +1,269 @@
+"""
+按会话保存的定长聊天记录存储。
+
+- 每个会话使用一个 `deque(maxlen=N)` 作为环形缓冲区，追加和淘汰都是 O(1)。
+- 渲染后的聊天记录字符串增量维护：只切掉被淘汰的头部、拼接新增的尾部，而不是每次都重新 join。
+- 所有会话的消息总数受全局上限约束，超出时按 LRU 将空闲会话移出内存。
+- 启用持久化时，消息会在后台批量写入 SQLite。被移出内存的会话在下次访问时从 SQLite 中重新加载，
+  并合并尚未写入的消息，重启后也不会丢失。
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+
+from astrbot.core import logger
+
+
+class SessionChatLog:
+    """单个会话的聊天记录环形缓冲区"""
+
+    def __init__(self, max_cnt: int, separator: str, entries: List[str] = None):
+        self.separator = separator
+        self.entries: Deque[str] = deque(maxlen=max_cnt)
+        self._rendered = ""
+        """已经渲染好的字符串（可能包含已经被淘汰的头部）"""
+        self._rendered_cnt = 0
+        """`_rendered` 中包含的仍在缓冲区内的消息数"""
+        self._dropped: Deque[int] = deque()
+        """`_rendered` 中已被淘汰、尚未切除的消息长度(包含分隔符)"""
+        for entry in entries or []:
+            self.append(entry)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, message: str) -> int:
+        """追加一条消息，返回因此被淘汰的消息数量(0 或 1)"""
+        dropped = 0
+        if len(self.entries) == self.entries.maxlen:
+            dropped = 1
+            if self._rendered_cnt:
+                # 被淘汰的是已渲染部分的第一条
+                head = self.entries[0]
+                self._dropped.append(len(head) + len(self.separator))
+                self._rendered_cnt -= 1
+        self.entries.append(message)
+        return dropped
+
+    def render(self) -> str:
+        if self._dropped:
+            cut = sum(self._dropped)
+            self._dropped.clear()
+            self._rendered = self._rendered[cut:] if self._rendered_cnt else ""
+        pending = len(self.entries) - self._rendered_cnt
+        if pending:
+            tail = self.separator.join(
+                self.entries[i] for i in range(self._rendered_cnt, len(self.entries))
+            )
+            if self._rendered_cnt:
+                self._rendered += self.separator + tail
+            else:
+                self._rendered = tail
+            self._rendered_cnt = len(self.entries)
+        return self._rendered
+
+
+class ChatLogStore:
+    """会话聊天记录存储。
+
+    Args:
+        max_cnt: 每个会话保留的最大消息数
+        max_total_cnt: 内存中所有会话的消息总数上限，<= 0 表示不限制
+        db_path: SQLite 数据库路径，为空时不持久化
+        flush_interval: 后台批量写入的间隔(秒)
+    """
+
+    SEPARATOR = "\n---\n"
+
+    def __init__(
+        self,
+        max_cnt: int,
+        max_total_cnt: int = 0,
+        db_path: Optional[str] = None,
+        flush_interval: float = 5.0,
+    ):
+        self.max_cnt = max(1, max_cnt)
+        self.max_total_cnt = max_total_cnt
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+
+        self.sessions: "OrderedDict[str, SessionChatLog]" = OrderedDict()
+        self.total_cnt = 0
+        self._known_empty = set()
+        """已确认在数据库中没有记录的会话，避免重复查询"""
+        self._pending: List[Tuple[str, str, Optional[str], float]] = []
+        """待写入的操作 (op, session_id, message, ts)，op 为 append 或 delete"""
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.db_path:
+            self._init_db()
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chat_log(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                message TEXT NOT NULL,
+                ts REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_log_session ON chat_log(session_id, id)"
+        )
+        self._conn.commit()
+
+    def _load_from_db(self, session_id: str) -> List[str]:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT message FROM chat_log WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_cnt),
+            ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def _write_to_db(self, ops: List[Tuple[str, str, Optional[str], float]]):
+        touched = set()
+        with self._db_lock:
+            cursor = self._conn.cursor()
+            for op, session_id, message, ts in ops:
+                if op == "append":
+                    cursor.execute(
+                        "INSERT INTO chat_log(session_id, message, ts) VALUES (?, ?, ?)",
+                        (session_id, message, ts),
+                    )
+                    touched.add(session_id)
+                elif op == "delete":
+                    cursor.execute(
+                        "DELETE FROM chat_log WHERE session_id = ?", (session_id,)
+                    )
+            # 每个会话只保留最新的 max_cnt 条
+            for session_id in touched:
+                cursor.execute(
+                    """
+                    DELETE FROM chat_log WHERE session_id = ? AND id <= (
+                        SELECT id FROM chat_log WHERE session_id = ?
+                        ORDER BY id DESC LIMIT 1 OFFSET ?
+                    )
+                    """,
+                    (session_id, session_id, self.max_cnt),
+                )
+            self._conn.commit()
+
+    async def _get(self, session_id: str) -> Optional[SessionChatLog]:
+        log = self.sessions.get(session_id)
+        if log is not None:
+            self.sessions.move_to_end(session_id)
+            return log
+        if not self._conn or session_id in self._known_empty:
+            return None
+        async with self._flush_lock:
+            # 持有锁时没有正在进行的写入，数据库中的记录加上尚未写入的操作就是完整的聊天记录
+            entries = await asyncio.to_thread(self._load_from_db, session_id)
+            for op, op_session_id, message, _ in self._pending:
+                if op_session_id != session_id:
+                    continue
+                if op == "append":
+                    entries.append(message)
+                else:
+                    entries = []
+        # 加载期间可能已经有其他协程加载或写入了这个会话
+        log = self.sessions.get(session_id)
+        if log is not None:
+            return log
+        if not entries:
+            if len(self._known_empty) > 10000:
+                self._known_empty.clear()
+            self._known_empty.add(session_id)
+            return None
+        log = SessionChatLog(self.max_cnt, self.SEPARATOR, entries)
+        self._add_session(session_id, log)
+        return log
+
+    def _add_session(self, session_id: str, log: SessionChatLog):
+        self.sessions[session_id] = log
+        self.total_cnt += len(log)
+        self._evict(keep=session_id)
+
+    def _evict(self, keep: str):
+        """按 LRU 将空闲会话移出内存，直到满足全局上限"""
+        if self.max_total_cnt <= 0:
+            return
+        while self.total_cnt > self.max_total_cnt and len(self.sessions) > 1:
+            session_id, log = next(iter(self.sessions.items()))
+            if session_id == keep:
+                break
+            del self.sessions[session_id]
+            self.total_cnt -= len(log)
+            logger.debug(f"ltm | 会话 {session_id} 的聊天记录已移出内存")
+
+    async def exists(self, session_id: str) -> bool:
+        return await self._get(session_id) is not None
+
+    async def append(self, session_id: str, message: str):
+        log = await self._get(session_id)
+        if log is None:
+            log = SessionChatLog(self.max_cnt, self.SEPARATOR)
+            self._known_empty.discard(session_id)
+            self._add_session(session_id, log)
+        self.total_cnt += 1 - log.append(message)
+        self._evict(keep=session_id)
+        self._schedule("append", session_id, message)
+
+    async def render(self, session_id: str) -> Optional[str]:
+        """返回会话的聊天记录字符串，没有记录时返回 None"""
+        log = await self._get(session_id)
+        if log is None:
+            return None
+        return log.render()
+
+    async def remove(self, session_id: str) -> int:
+        """删除会话的聊天记录，返回删除的消息数量"""
+        log = await self._get(session_id)
+        if log is None:
+            return 0
+        del self.sessions[session_id]
+        self.total_cnt -= len(log)
+        self._known_empty.add(session_id)
+        self._schedule("delete", session_id)
+        return len(log)
+
+    def _schedule(self, op: str, session_id: str, message: str = None):
+        if not self._conn:
+            return
+        self._pending.append((op, session_id, message, time.time()))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        """将待写入的操作批量写入数据库"""
+        async with self._flush_lock:
+            if not self._pending or not self._conn:
+                return
+            ops, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write_to_db, ops)
+            except Exception as e:
+                logger.error(f"ltm | 聊天记录写入数据库失败: {e}")
+
+    async def close(self):
+        await self.flush()
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        if self._conn:
+            self._conn.close()
+            self._conn = None
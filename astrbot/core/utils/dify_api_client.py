@@ -1,7 +1,9 @@
 import json
 from astrbot.core import logger
+from astrbot.core.log import lazy_repr
 from aiohttp import ClientSession
 from typing import Dict, List, Any, AsyncGenerator
+from .sse import aiter_sse_events
 
 
 class DifyAPIClient:
@@ -27,7 +29,7 @@ class DifyAPIClient:
         payload = locals()
         payload.pop("self")
         payload.pop("timeout")
-        logger.info(f"chat_messages payload: {payload}")
+        logger.debug("chat_messages payload: %s", lazy_repr(payload))
         async with self.session.post(
             url, json=payload, headers=self.headers, timeout=timeout
         ) as resp:
@@ -35,29 +37,12 @@ class DifyAPIClient:
                 text = await resp.text()
                 raise Exception(f"chat_messages 请求失败：{resp.status}. {text}")
 
-            buffer = ""
-            while True:
-                # 保持原有的8192字节限制，防止数据过大导致高水位报错
-                chunk = await resp.content.read(8192)
-                if not chunk:
-                    break
-
-                buffer += chunk.decode("utf-8")
-                blocks = buffer.split("\n\n")
-
-                # 处理完整的数据块
-                for block in blocks[:-1]:
-                    if block.strip() and block.startswith("data:"):
-                        try:
-                            json_str = block[5:]  # 移除 "data:" 前缀
-                            json_obj = json.loads(json_str)
-                            yield json_obj
-                        except json.JSONDecodeError as e:
-                            logger.error(f"JSON解析错误: {str(e)}")
-                            logger.error(f"原始数据块: {json_str}")
-
-                # 保留最后一个可能不完整的块
-                buffer = blocks[-1] if blocks else ""
+            async for event in aiter_sse_events(resp.content):
+                try:
+                    yield json.loads(event.data)
+                except json.JSONDecodeError as e:
+                    logger.error(f"JSON解析错误: {str(e)}")
+                    logger.error(f"原始数据块: {event.data}")
 
     async def workflow_run(
         self,
@@ -71,7 +56,7 @@ class DifyAPIClient:
         payload = locals()
         payload.pop("self")
         payload.pop("timeout")
-        logger.info(f"workflow_run payload: {payload}")
+        logger.debug("workflow_run payload: %s", lazy_repr(payload))
         async with self.session.post(
             url, json=payload, headers=self.headers, timeout=timeout
         ) as resp:
@@ -79,29 +64,12 @@ class DifyAPIClient:
                 text = await resp.text()
                 raise Exception(f"workflow_run 请求失败：{resp.status}. {text}")
 
-            buffer = ""
-            while True:
-                # 保持原有的8192字节限制，防止数据过大导致高水位报错
-                chunk = await resp.content.read(8192)
-                if not chunk:
-                    break
-
-                buffer += chunk.decode("utf-8")
-                blocks = buffer.split("\n\n")
-
-                # 处理完整的数据块
-                for block in blocks[:-1]:
-                    if block.strip() and block.startswith("data:"):
-                        try:
-                            json_str = block[5:]  # 移除 "data:" 前缀
-                            json_obj = json.loads(json_str)
-                            yield json_obj
-                        except json.JSONDecodeError as e:
-                            logger.error(f"JSON解析错误: {str(e)}")
-                            logger.error(f"原始数据块: {json_str}")
-
-                # 保留最后一个可能不完整的块
-                buffer = blocks[-1] if blocks else ""
+            async for event in aiter_sse_events(resp.content):
+                try:
+                    yield json.loads(event.data)
+                except json.JSONDecodeError as e:
+                    logger.error(f"JSON解析错误: {str(e)}")
+                    logger.error(f"原始数据块: {event.data}")
 
     async def file_upload(
         self,
@@ -0,0 +1,74 @@
+"""
+共享的媒体转码进程池
+
+pydub / ffmpeg 的音频转码是 CPU 密集且阻塞的操作, 直接在事件循环中执行会让所有平台的消息处理停顿。
+这里提供一个懒加载的进程池, 转码任务在子进程中完成; 进程池不可用时(如受限环境)退回到线程池。
+"""
+
+import asyncio
+import os
+import concurrent.futures
+from typing import Callable, Optional
+
+from astrbot.core import logger
+
+_pool: Optional[concurrent.futures.Executor] = None
+
+
+def _max_workers() -> int:
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+def get_media_pool() -> concurrent.futures.Executor:
+    global _pool
+    if _pool is None:
+        try:
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=_max_workers())
+        except (OSError, NotImplementedError, ImportError) as e:
+            logger.warning(f"无法创建媒体转码进程池: {e}, 将使用线程池。")
+            _pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=_max_workers(), thread_name_prefix="media_worker"
+            )
+    return _pool
+
+
+async def run_in_media_pool(func: Callable, *args):
+    """在媒体转码进程池中执行 func(*args)。func 与参数需要可以被 pickle, 即模块级函数"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_media_pool(), func, *args)
+    except concurrent.futures.process.BrokenProcessPool:
+        # 子进程意外退出时重建进程池并重试一次
+        logger.warning("媒体转码进程池已损坏, 正在重建。")
+        shutdown_media_pool()
+        return await loop.run_in_executor(get_media_pool(), func, *args)
+
+
+def _convert_audio(src: str, dst: str, format: str, src_format: str = None) -> str:
+    from pydub import AudioSegment
+
+    if src_format:
+        audio = AudioSegment.from_file(src, format=src_format)
+    else:
+        audio = AudioSegment.from_file(src)
+    audio.export(dst, format=format)
+    return dst
+
+
+async def convert_audio(src: str, dst: str, format: str, src_format: str = None) -> str:
+    """使用 pydub(ffmpeg) 在子进程中转换音频格式, 返回转换后的文件路径
+
+    Args:
+        src (str): 源文件路径
+        dst (str): 目标文件路径
+        format (str): 目标格式, 如 wav、amr
+        src_format (str): 源文件格式, 为空时由 ffmpeg 自动识别
+    """
+    return await run_in_media_pool(_convert_audio, src, dst, format, src_format)
+
+
+def shutdown_media_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
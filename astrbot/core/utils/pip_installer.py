@@ -1,4 +1,8 @@
+import asyncio
+import importlib
 import logging
+import sys
+from typing import List
 from pip import main as pip_main
 
 logger = logging.getLogger("astrbot")
@@ -9,24 +13,29 @@ class PipInstaller:
         self.pip_install_arg = pip_install_arg
         self.pypi_index_url = pypi_index_url
 
+    def _build_args(self, targets: List[str], mirror: str = None) -> List[str]:
+        args = ["install", *targets]
+
+        index_url = mirror or self.pypi_index_url or "https://pypi.org/simple"
+
+        args.extend(["--trusted-host", "mirrors.aliyun.com", "-i", index_url])
+
+        if self.pip_install_arg:
+            args.extend(self.pip_install_arg.split())
+        return args
+
     def install(
         self,
         package_name: str = None,
         requirements_path: str = None,
         mirror: str = None,
     ):
-        args = ["install"]
+        targets = []
         if package_name:
-            args.append(package_name)
+            targets.append(package_name)
         elif requirements_path:
-            args.extend(["-r", requirements_path])
-
-        index_url = mirror or self.pypi_index_url or "https://pypi.org/simple"
-
-        args.extend(["--trusted-host", "mirrors.aliyun.com", "-i", index_url])
-
-        if self.pip_install_arg:
-            args.extend(self.pip_install_arg.split())
+            targets.extend(["-r", requirements_path])
+        args = self._build_args(targets, mirror)
 
         logger.info(f"Pip 包管理器: pip {' '.join(args)}")
 
@@ -38,3 +47,39 @@ class PipInstaller:
 
         if result_code != 0:
             raise Exception(f"安装失败，错误码：{result_code}")
+
+    async def install_requirements(
+        self, requirements_paths: List[str], mirror: str = None
+    ):
+        """在子进程中一次性安装多个 requirements 文件, 不阻塞事件循环"""
+        if not requirements_paths:
+            return
+        targets = []
+        for path in requirements_paths:
+            targets.extend(["-r", path])
+        args = self._build_args(targets, mirror)
+
+        logger.info(f"Pip 包管理器: pip {' '.join(args)}")
+
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "pip",
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        output = []
+        async for line in process.stdout:
+            line = line.decode(errors="replace").rstrip()
+            output.append(line)
+            logger.debug(f"[pip] {line}")
+        result_code = await process.wait()
+
+        if result_code != 0:
+            for line in output[-20:]:
+                logger.error(f"[pip] {line}")
+            raise Exception(f"安装失败，错误码：{result_code}")
+
+        # 新安装的包在 sys.path 中的目录缓存失效前无法被导入
+        importlib.invalidate_caches()
@@ -1,38 +1,209 @@
+"""
+简单的键值偏好设置存储
+
+数据保存在 SQLite 中, 每个键单独一行, 修改某个键时只写入这个键。
+读取直接使用内存中的数据; 修改在事件循环中会被合并, 在 flush_delay 秒后于线程中批量写入,
+不阻塞事件循环。没有运行中的事件循环时(如启动阶段、脚本中)立即写入。
+
+首次启动时会将旧版的 data/shared_preferences.json 迁移到数据库中, 迁移完成后重命名为 .bak。
+"""
+
+import asyncio
+import atexit
 import json
+import logging
 import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger("astrbot")
+
+_MISSING = object()
 
 
 class SharedPreferences:
-    def __init__(self, path="data/shared_preferences.json"):
+    def __init__(
+        self,
+        path="data/shared_preferences.db",
+        json_path="data/shared_preferences.json",
+        flush_delay: float = 1.0,
+    ):
         self.path = path
+        self.json_path = json_path
+        self.flush_delay = flush_delay
+        self._lock = threading.Lock()
+        self._dirty: Set[str] = set()
+        self._pending: Dict[str, Any] = {}
+        """已序列化, 尚未写入数据库的键值"""
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._conn = self._connect()
         self._data = self._load_preferences()
+        self._migrate_json()
+        atexit.register(self.close)
 
-    def _load_preferences(self):
-        if os.path.exists(self.path):
+    def _connect(self) -> sqlite3.Connection:
+        try:
+            conn = self._open()
+            conn.execute("SELECT count(*) FROM preferences").fetchone()
+            return conn
+        except sqlite3.DatabaseError as e:
+            # 与原来处理损坏的 json 文件一致, 放弃损坏的数据重新开始
+            logger.error(f"偏好设置数据库已损坏: {e}, 已重命名为 {self.path}.corrupt")
+            os.replace(self.path, self.path + ".corrupt")
+            return self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS preferences (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        conn.commit()
+        return conn
+
+    def _load_preferences(self) -> Dict[str, Any]:
+        data = {}
+        for key, value in self._conn.execute("SELECT key, value FROM preferences"):
             try:
-                with open(self.path, "r") as f:
-                    return json.load(f)
+                data[key] = json.loads(value)
             except json.JSONDecodeError:
-                os.remove(self.path)
-        return {}
+                logger.warning(f"偏好设置 {key} 无法解析, 已忽略。")
+        return data
+
+    def _migrate_json(self):
+        if not self.json_path or not os.path.exists(self.json_path):
+            return
+        try:
+            with open(self.json_path, "r") as f:
+                legacy = json.load(f)
+        except json.JSONDecodeError:
+            legacy = {}
+        with self._lock:
+            self._write(
+                {k: json.dumps(v, ensure_ascii=False) for k, v in legacy.items()}
+            )
+        self._data.update(legacy)
+        # 写入数据库后再重命名, 迁移中途崩溃时下次启动会重新迁移
+        os.replace(self.json_path, self.json_path + ".bak")
+        logger.info(
+            f"已将 {len(legacy)} 项偏好设置从 {self.json_path} 迁移到 {self.path}"
+        )
 
-    def _save_preferences(self):
-        with open(self.path, "w") as f:
-            json.dump(self._data, f, indent=4, ensure_ascii=False)
-            f.flush()
+    def _write(self, rows: Dict[str, Any]):
+        """在一个事务中写入, value 为 _MISSING 表示删除。调用方需要持有 self._lock"""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO preferences (key, value) VALUES (?, ?)",
+                [(k, v) for k, v in rows.items() if v is not _MISSING],
+            )
+            self._conn.executemany(
+                "DELETE FROM preferences WHERE key = ?",
+                [(k,) for k, v in rows.items() if v is _MISSING],
+            )
+
+    def _take_dirty(self):
+        """序列化待写入的键, 放入 self._pending。在修改数据的线程中调用, 避免与修改同时进行"""
+        rows = {}
+        for key in self._dirty:
+            value = self._data.get(key, _MISSING)
+            rows[key] = (
+                _MISSING if value is _MISSING else json.dumps(value, ensure_ascii=False)
+            )
+        self._dirty.clear()
+        with self._lock:
+            self._pending.update(rows)
+
+    def _write_pending(self):
+        # 取出与写入都在锁内完成, 后写入的总是更新的值
+        with self._lock:
+            rows, self._pending = self._pending, {}
+            if not rows:
+                return
+            try:
+                self._write(rows)
+            except Exception:
+                self._pending = {**rows, **self._pending}
+                raise
+
+    def _mark_dirty(self, key: str):
+        self._dirty.add(key)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._flush_handle is None:
+            # 第一次修改后 flush_delay 秒写入, 期间的修改合并为一次
+            self._flush_handle = loop.call_later(self.flush_delay, self._start_flush)
+
+    async def _flush_in_thread(self):
+        try:
+            await asyncio.to_thread(self._write_pending)
+        except Exception as e:
+            logger.error(f"保存偏好设置失败: {e}")
+
+    def _start_flush(self):
+        self._flush_handle = None
+        self._take_dirty()
+        self._flush_task = asyncio.create_task(self._flush_in_thread())
+
+    def flush(self):
+        """立即写入所有修改"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._take_dirty()
+        self._write_pending()
+
+    async def aflush(self):
+        """在线程中写入所有修改, 并等待写入完成"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._take_dirty()
+        await self._flush_in_thread()
+
+    def close(self):
+        try:
+            self.flush()
+            self._conn.close()
+        except sqlite3.ProgrammingError:
+            # 已经关闭
+            pass
 
     def get(self, key, default=None):
         return self._data.get(key, default)
 
+    def get_by_prefix(self, prefix: str) -> Dict[str, Any]:
+        """获取所有以 prefix 开头的键值, 返回的键不包含 prefix"""
+        return {
+            k[len(prefix) :]: v for k, v in self._data.items() if k.startswith(prefix)
+        }
+
     def put(self, key, value):
         self._data[key] = value
-        self._save_preferences()
+        self._mark_dirty(key)
+
+    def put_many(self, items: Dict[str, Any]):
+        """批量写入, 只触发一次保存"""
+        if not items:
+            return
+        self._data.update(items)
+        self._dirty.update(items)
+        self._mark_dirty(next(iter(items)))
 
     def remove(self, key):
         if key in self._data:
             del self._data[key]
-            self._save_preferences()
+            self._mark_dirty(key)
 
     def clear(self):
+        if not self._data:
+            return
+        keys = list(self._data)
         self._data.clear()
-        self._save_preferences()
+        self._dirty.update(keys)
+        self._mark_dirty(keys[0])
@@ -0,0 +1,110 @@
+"""
+增量 SSE (Server-Sent Events) 解码器。
+
+直接在字节上按行切分，每次只扫描新到达的数据。UTF-8 的多字节字符中不会出现换行符，
+因此按字节切分出的完整行可以安全地解码，跨 chunk 的多字节字符不会被截断。
+"""
+
+from dataclasses import dataclass
+from typing import AsyncGenerator, List, Optional
+
+
+@dataclass
+class SSEEvent:
+    event: str = "message"
+    data: str = ""
+    id: Optional[str] = None
+    retry: Optional[int] = None
+
+
+class SSEDecoder:
+    """增量 SSE 解码器。
+
+    ```
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        for event in decoder.feed(chunk):
+            ...
+    ```
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._scan_pos = 0
+        """缓冲区中已经扫描过、确认不含换行符的位置"""
+        self._event = ""
+        self._data: List[str] = []
+        self._last_id: Optional[str] = None
+        self._retry: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """输入新到达的字节，返回其中所有完整的事件"""
+        events = []
+        buffer = self._buffer
+        buffer += chunk
+        line_start = 0
+        while True:
+            idx = buffer.find(b"\n", self._scan_pos)
+            if idx == -1:
+                self._scan_pos = len(buffer)
+                break
+            end = idx - 1 if idx > line_start and buffer[idx - 1] == 0x0D else idx
+            event = self._process_line(buffer[line_start:end])
+            if event:
+                events.append(event)
+            line_start = self._scan_pos = idx + 1
+        if line_start:
+            del buffer[:line_start]
+            self._scan_pos -= line_start
+        return events
+
+    def _process_line(self, raw: bytearray) -> Optional[SSEEvent]:
+        if not raw:
+            return self._dispatch()
+        line = raw.decode("utf-8", errors="replace")
+        if line.startswith(":"):
+            # 注释
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            if "\0" not in value:
+                self._last_id = value
+        elif field == "retry":
+            if value.isdigit():
+                self._retry = int(value)
+        return None
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if not self._data:
+            # 没有 data 字段的事件 (如 ping) 不分发
+            self._event = ""
+            return None
+        event = SSEEvent(
+            event=self._event or "message",
+            data="\n".join(self._data),
+            id=self._last_id,
+            retry=self._retry,
+        )
+        self._event = ""
+        self._data = []
+        return event
+
+
+async def aiter_sse_events(
+    stream, chunk_size: int = 8192
+) -> AsyncGenerator[SSEEvent, None]:
+    """从 aiohttp 的 `StreamReader`(或任何提供 `async read(n)` 的对象) 中逐个读取 SSE 事件"""
+    decoder = SSEDecoder()
+    while True:
+        # 保持 8192 字节的读取上限，防止数据过大导致高水位报错
+        chunk = await stream.read(chunk_size)
+        if not chunk:
+            break
+        for event in decoder.feed(chunk):
+            yield event
@@ -6,6 +6,10 @@ from .route import Route, RouteContext
 
 
 class LogRoute(Route):
+    FLUSH_INTERVAL = 0.1
+    """收到日志后等待的时间(秒), 期间到达的日志会合并到一次写入中"""
+    MAX_BATCH = 200
+
     def __init__(self, context: RouteContext, log_broker: LogBroker) -> None:
         super().__init__(context)
         self.log_broker = log_broker
@@ -17,12 +21,15 @@ class LogRoute(Route):
             try:
                 queue = self.log_broker.register()
                 while True:
-                    message = await queue.get()
-                    payload = {
-                        "type": "log",
-                        **message,  # see astrbot/core/log.py
-                    }
-                    yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+                    messages = [await queue.get()]
+                    await asyncio.sleep(self.FLUSH_INTERVAL)
+                    while len(messages) < self.MAX_BATCH and not queue.empty():
+                        messages.append(queue.get_nowait())
+                    # 每条日志仍是一个独立的 SSE 事件, 但一次写入多条
+                    yield "".join(
+                        f"data: {json.dumps({'type': 'log', **message}, ensure_ascii=False)}\n\n"
+                        for message in messages  # see astrbot/core/log.py
+                    )
             except asyncio.CancelledError:
                 pass
             except BaseException as e:
@@ -112,6 +112,9 @@ class PluginRoute(Route):
                 "reserved": plugin.reserved,
                 "activated": plugin.activated,
                 "online_vesion": "",
+                "load_timings": self.plugin_manager.load_timings.get(
+                    plugin.root_dir_name, {}
+                ),
                 "handlers": await self.get_plugin_handlers_info(
                     plugin.star_handler_full_names
                 ),
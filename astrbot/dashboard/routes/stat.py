@@ -9,6 +9,7 @@ from astrbot.core.core_lifecycle import AstrBotCoreLifecycle
 from astrbot.core.db import BaseDatabase
 from astrbot.core.config import VERSION
 from astrbot.core import DEMO_MODE
+from astrbot.core.platform.media_cache import media_cache_stats
 
 
 class StatRoute(Route):
@@ -24,6 +25,7 @@ class StatRoute(Route):
             "/stat/version": ("GET", self.get_version),
             "/stat/start-time": ("GET", self.get_start_time),
             "/stat/restart-core": ("POST", self.restart_core),
+            "/stat/provider": ("GET", self.get_provider_stat),
         }
         self.db_helper = db_helper
         self.register_routes()
@@ -51,6 +53,34 @@ class StatRoute(Route):
     async def get_start_time(self):
         return Response().ok({"start_time": self.core_lifecycle.start_time}).__dict__
 
+    async def get_provider_stat(self):
+        """获取各文本生成提供商的 Key 池使用情况与健康状态"""
+        provider_manager = self.core_lifecycle.provider_manager
+        health = {h["provider_id"]: h for h in provider_manager.router.stats()}
+        ret = []
+        for provider in provider_manager.provider_insts:
+            provider_id = provider.meta().id
+            key_pool = getattr(provider, "key_pool", None)
+            ret.append(
+                {
+                    "id": provider_id,
+                    "type": provider.meta().type,
+                    "model": provider.get_model(),
+                    "keys": key_pool.stats() if key_pool else [],
+                    "health": health.get(provider_id),
+                }
+            )
+        return (
+            Response()
+            .ok(
+                {
+                    "providers": ret,
+                    "response_cache": provider_manager.response_cache.stats(),
+                }
+            )
+            .__dict__
+        )
+
     async def get_stat(self):
         offset_sec = request.args.get("offset_sec", 86400)
         offset_sec = int(offset_sec)
@@ -109,6 +139,7 @@ class StatRoute(Route):
                     "cpu_percent": round(cpu_percent, 1),
                     "thread_count": thread_count,
                     "start_time": self.core_lifecycle.start_time,
+                    "media_cache": media_cache_stats(),
                 }
             )
 
@@ -81,6 +81,7 @@ class ToolsRoute(Route):
                     if name_key == name:
                         server_info["tools"] = [tool.name for tool in mcp_client.tools]
                         server_info["errlogs"] = mcp_client.server_errlogs
+                        server_info["latency"] = mcp_client.latency_stats()
                         break
                 else:
                     server_info["tools"] = []
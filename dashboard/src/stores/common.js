@@ -50,6 +50,8 @@ export const useCommonStore = defineStore({
 
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
+        // 一次读取可能在某个事件中间截断，未完整的部分留到下一次读取
+        let buffer = '';
 
         const processStream = ({ done, value }) => {
           if (done) {
@@ -61,8 +63,9 @@ export const useCommonStore = defineStore({
             return;
           }
 
-          const text = decoder.decode(value);
-          const lines = text.split('\n\n');
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split('\n\n');
+          buffer = lines.pop();
           lines.forEach(line => {
             if (line.startsWith('data:')) {
               const data = line.substring(5).trim();
@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import re
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Tuple
+from PIL import Image as PILImage
+from astrbot import logger
+from astrbot.core.db import BaseDatabase
+from astrbot.core.db.po import ATRIVision
+from astrbot.core.provider import Provider
+
+"""
+群聊图片转述
+
+- 以图片的感知哈希(dHash)为键缓存转述结果，并复用 atri_vision 表的 caption 字段持久化。
+- 缓存未命中的图片进入有界的后台队列，由后台任务合并成多图请求进行转述，不阻塞消息处理。
+- 每分钟的转述图片数量受预算限制。
+"""
+
+PLACEHOLDER_PATTERN = re.compile(r"\[Image#([0-9a-f]{16,64})\]")
+BATCH_LINE_PATTERN = re.compile(r"^\s*(\d+)\s*[.．:：、)）]\s*(.+)$")
+
+
+def image_hash(path: str) -> str:
+    """计算图片的感知哈希 (dHash)。重新压缩、缩放后的同一张图片通常会得到相同的哈希。无法解析的图片退化为内容哈希。"""
+    try:
+        with PILImage.open(path) as img:
+            pixels = img.convert("L").resize((9, 8)).tobytes()
+        bits = 0
+        for row in range(8):
+            for col in range(8):
+                left = pixels[row * 9 + col]
+                right = pixels[row * 9 + col + 1]
+                bits = (bits << 1) | (left > right)
+        return f"{bits:016x}"
+    except Exception:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:32]
+
+
+class ImageCaptioner:
+    MEMORY_CACHE_SIZE = 1024
+    QUEUE_SIZE = 64
+    BATCH_WINDOW = 1.0
+    """收到第一张图片后，等待更多图片合并成一批的时间(秒)"""
+
+    def __init__(
+        self,
+        provider_getter: Callable[[], Optional[Provider]],
+        db: Optional[BaseDatabase],
+        prompt: str,
+        batch_size: int = 4,
+        per_minute: int = 10,
+    ):
+        self.provider_getter = provider_getter
+        self.db = db
+        self.prompt = prompt
+        self.batch_size = max(1, batch_size)
+        self.per_minute = per_minute
+        """每分钟最多转述的图片数，<= 0 表示不限制"""
+
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._queued = set()
+        self._budget: deque = deque()
+        """最近一分钟内转述图片的时间戳"""
+        self._worker: Optional[asyncio.Task] = None
+        self.stats = {"hit": 0, "miss": 0, "dropped": 0, "requests": 0}
+
+    def _remember(self, key: str, caption: str):
+        self._cache[key] = caption
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.MEMORY_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    async def lookup(self, key: str) -> Optional[str]:
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if not self.db:
+            return None
+        vision = await asyncio.to_thread(self.db.get_atri_vision_data_by_id, key)
+        if vision and vision.caption:
+            self._remember(key, vision.caption)
+            return vision.caption
+        return None
+
+    async def caption(self, path: str, url: str = "") -> str:
+        """返回图片在聊天记录中的文本。命中缓存时直接返回转述，否则加入后台队列并返回占位符，占位符在 `fill()` 时替换。"""
+        key = await asyncio.to_thread(image_hash, path)
+        caption = await self.lookup(key)
+        if caption:
+            self.stats["hit"] += 1
+            return f"[Image: {caption}]"
+        self.stats["miss"] += 1
+        if key not in self._queued:
+            try:
+                self._queue.put_nowait((key, path, url))
+                self._queued.add(key)
+            except asyncio.QueueFull:
+                self.stats["dropped"] += 1
+                logger.warning("ltm | 图片转述队列已满，跳过此图片。")
+        self._ensure_worker()
+        return f"[Image#{key}]"
+
+    async def fill(self, text: str) -> str:
+        """将聊天记录中的占位符替换为图片转述，尚未完成转述的图片显示为 [Image]"""
+        if "[Image#" not in text:
+            return text
+        captions: Dict[str, Optional[str]] = {}
+        for key in set(PLACEHOLDER_PATTERN.findall(text)):
+            captions[key] = await self.lookup(key)
+
+        def repl(m: re.Match) -> str:
+            caption = captions.get(m.group(1))
+            return f"[Image: {caption}]" if caption else "[Image]"
+
+        return PLACEHOLDER_PATTERN.sub(repl, text)
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _wait_budget(self, n: int) -> int:
+        """等待直到预算允许转述至少一张图片，返回本次允许转述的数量"""
+        if self.per_minute <= 0:
+            return n
+        while True:
+            now = time.monotonic()
+            while self._budget and now - self._budget[0] >= 60:
+                self._budget.popleft()
+            available = self.per_minute - len(self._budget)
+            if available > 0:
+                return min(n, available)
+            await asyncio.sleep(60 - (now - self._budget[0]))
+
+    async def _next_batch(self) -> List[Tuple[str, str, str]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.BATCH_WINDOW
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            allowed = await self._wait_budget(len(batch))
+            # 超出预算的图片放回队列，等待下一批
+            for item in batch[allowed:]:
+                try:
+                    self._queue.put_nowait(item)
+                except asyncio.QueueFull:
+                    self.stats["dropped"] += 1
+                    self._queued.discard(item[0])
+            batch = batch[:allowed]
+            try:
+                await self._caption_batch(batch)
+            except Exception as e:
+                logger.error(f"ltm | 图片转述失败: {e}")
+            finally:
+                for key, _, _ in batch:
+                    self._queued.discard(key)
+
+    async def _caption_batch(self, batch: List[Tuple[str, str, str]]):
+        provider = self.provider_getter()
+        if not provider:
+            raise Exception("没有可用的提供商")
+        now = time.monotonic()
+        self._budget.extend([now] * len(batch))
+
+        if len(batch) == 1:
+            prompt = self.prompt
+        else:
+            prompt = (
+                f"{self.prompt}\n"
+                f"There are {len(batch)} images. Describe each of them in order, "
+                "one line per image, formatted as `<index>. <description>`, "
+                "starting from 1. Do not output anything else."
+            )
+        self.stats["requests"] += 1
+        response = await provider.text_chat(
+            prompt=prompt,
+            session_id=uuid.uuid4().hex,
+            image_urls=[path for _, path, _ in batch],
+            persist=False,
+        )
+        text = (response.completion_text or "").strip()
+        captions = self._parse_batch(text, len(batch))
+        for i, (key, path, url) in enumerate(batch):
+            caption = captions.get(i)
+            if not caption:
+                logger.warning(f"ltm | 未能解析第 {i + 1} 张图片的转述: {text}")
+                continue
+            self._remember(key, caption)
+            if self.db:
+                await asyncio.to_thread(
+                    self.db.insert_atri_vision_data,
+                    ATRIVision(
+                        id=key,
+                        url_or_path=url if url.startswith("http") else path,
+                        caption=caption,
+                        is_meme=False,
+                        keywords=[],
+                        platform_name="",
+                        session_id="",
+                        sender_nickname="",
+                    ),
+                )
+
+    @staticmethod
+    def _parse_batch(text: str, n: int) -> Dict[int, str]:
+        if n == 1:
+            return {0: text} if text else {}
+        captions = {}
+        for line in text.splitlines():
+            m = BATCH_LINE_PATTERN.match(line)
+            if m and 1 <= int(m.group(1)) <= n:
+                captions[int(m.group(1)) - 1] = m.group(2).strip()
+        return captions
+
+    async def terminate(self):
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
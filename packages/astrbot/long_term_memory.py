@@ -1,5 +1,4 @@
 import datetime
-import uuid
 import random
 import astrbot.api.star as star
 from astrbot.api.event import AstrMessageEvent
@@ -7,7 +6,8 @@ from astrbot.api.platform import MessageType
 from astrbot.api.provider import ProviderRequest
 from astrbot.api.message_components import Plain, Image
 from astrbot import logger
-from collections import defaultdict
+from astrbot.core.utils.chat_log_store import ChatLogStore
+from .image_captioner import ImageCaptioner
 
 """
 聊天记忆增强
@@ -18,16 +18,29 @@ class LongTermMemory:
     def __init__(self, config: dict, context: star.Context):
         self.config = config
         self.context = context
-        self.session_chats = defaultdict(list)
-        """记录群成员的群聊记录"""
         try:
             self.max_cnt = int(self.config["group_message_max_cnt"])
         except BaseException as e:
             logger.error(e)
             self.max_cnt = 300
+        self.session_chats = ChatLogStore(
+            max_cnt=self.max_cnt,
+            max_total_cnt=int(self.config.get("group_message_max_total_cnt", 30000)),
+            db_path="data/long_term_memory.db"
+            if self.config.get("group_message_persist", True)
+            else None,
+        )
+        """记录群成员的群聊记录"""
         self.image_caption = self.config["image_caption"]
         self.image_caption_prompt = self.config["image_caption_prompt"]
         self.image_caption_provider_id = self.config["image_caption_provider_id"]
+        self.captioner = ImageCaptioner(
+            provider_getter=self._get_caption_provider,
+            db=self.context.get_db(),
+            prompt=self.image_caption_prompt,
+            batch_size=int(self.config.get("image_caption_batch_size", 4)),
+            per_minute=int(self.config.get("image_caption_per_minute", 10)),
+        )
 
         self.active_reply = self.config["active_reply"]
         self.enable_active_reply = self.active_reply.get("enable", False)
@@ -36,31 +49,26 @@ class LongTermMemory:
         self.ar_prompt = self.active_reply.get("prompt", "")
         self.ar_whitelist = self.active_reply.get("whitelist", [])
 
+        self.prompt_cache_friendly = self.context.get_config()["provider_settings"].get(
+            "prompt_cache_friendly", False
+        )
+
         # self.put_history_to_prompt = self.config["put_history_to_prompt"]
 
     async def remove_session(self, event: AstrMessageEvent) -> int:
-        cnt = 0
-        if event.unified_msg_origin in self.session_chats:
-            cnt = len(self.session_chats[event.unified_msg_origin])
-            del self.session_chats[event.unified_msg_origin]
-        return cnt
+        return await self.session_chats.remove(event.unified_msg_origin)
 
-    async def get_image_caption(self, image_url: str) -> str:
+    async def terminate(self):
+        await self.captioner.terminate()
+        await self.session_chats.close()
+
+    def _get_caption_provider(self):
         if not self.image_caption_provider_id:
-            provider = self.context.get_using_provider()
-        else:
-            provider = self.context.get_provider_by_id(self.image_caption_provider_id)
-            if not provider:
-                raise Exception(
-                    f"没有找到 ID 为 {self.image_caption_provider_id} 的提供商"
-                )
-        response = await provider.text_chat(
-            prompt=self.image_caption_prompt,
-            session_id=uuid.uuid4().hex,
-            image_urls=[image_url],
-            persist=False,
-        )
-        return response.completion_text
+            return self.context.get_using_provider()
+        provider = self.context.get_provider_by_id(self.image_caption_provider_id)
+        if not provider:
+            raise Exception(f"没有找到 ID 为 {self.image_caption_provider_id} 的提供商")
+        return provider
 
     async def need_active_reply(self, event: AstrMessageEvent) -> bool:
         if not self.enable_active_reply:
@@ -98,32 +106,41 @@ class LongTermMemory:
                 elif isinstance(comp, Image):
                     # image_urls.append(comp.url if comp.url else comp.file)
                     if self.image_caption:
+                        # 命中缓存时直接写入转述，否则写入占位符，由后台任务转述
                         try:
-                            caption = await self.get_image_caption(
-                                comp.url if comp.url else comp.file
+                            path = await comp.convert_to_file_path()
+                            final_message += " " + await self.captioner.caption(
+                                path, comp.url or comp.file
                             )
-                            final_message += f" [Image: {caption}]"
                         except Exception as e:
                             logger.error(f"获取图片描述失败: {e}")
                     else:
                         final_message += " [Image]"
             logger.debug(f"ltm | {event.unified_msg_origin} | {final_message}")
-            self.session_chats[event.unified_msg_origin].append(final_message)
-            if len(self.session_chats[event.unified_msg_origin]) > self.max_cnt:
-                self.session_chats[event.unified_msg_origin].pop(0)
+            await self.session_chats.append(event.unified_msg_origin, final_message)
 
     async def on_req_llm(self, event: AstrMessageEvent, req: ProviderRequest):
         """当触发 LLM 请求前，调用此方法修改 req"""
-        if event.unified_msg_origin not in self.session_chats:
+        chats_str = await self.session_chats.render(event.unified_msg_origin)
+        if chats_str is None:
             return
-
-        chats_str = "\n---\n".join(self.session_chats[event.unified_msg_origin])
+        if self.image_caption:
+            chats_str = await self.captioner.fill(chats_str)
 
         if self.enable_active_reply:
             prompt = req.prompt
             req.prompt = f"You are now in a chatroom. The chat history is as follows:\n{chats_str}"
             req.prompt += f"\nNow, a new message is coming: `{prompt}`. Please react to it. Only output your response and do not output any other information."
             req.contexts = []  # 清空上下文，当使用了主动回复，所有聊天记录都在一个prompt中。
+        elif self.prompt_cache_friendly:
+            # 群聊记录每条消息都会变化，放在本轮用户消息末尾，不破坏 System Prompt 的缓存前缀。
+            # 群聊记录不写入对话历史
+            if req.history_prompt is None:
+                req.history_prompt = req.prompt
+            req.prompt += (
+                "\n\nYou are now in a chatroom. The chat history is as follows: \n"
+            )
+            req.prompt += chats_str
         else:
             req.system_prompt += (
                 "You are now in a chatroom. The chat history is as follows: \n"
@@ -131,12 +148,10 @@ class LongTermMemory:
             req.system_prompt += chats_str
 
     async def after_req_llm(self, event: AstrMessageEvent):
-        if event.unified_msg_origin not in self.session_chats:
+        if not await self.session_chats.exists(event.unified_msg_origin):
             return
 
         if event.get_result() and event.get_result().is_llm_result():
             final_message = f"[AstrBot/{datetime.datetime.now().strftime('%H:%M:%S')}]: {event.get_result().get_plain_text()}"
             logger.debug(f"ltm | {event.unified_msg_origin} | {final_message}")
-            self.session_chats[event.unified_msg_origin].append(final_message)
-            if len(self.session_chats[event.unified_msg_origin]) > self.max_cnt:
-                self.session_chats[event.unified_msg_origin].pop(0)
+            await self.session_chats.append(event.unified_msg_origin, final_message)
@@ -39,6 +39,9 @@ class Main(star.Star):
         self.prompt_prefix = cfg["provider_settings"]["prompt_prefix"]
         self.identifier = cfg["provider_settings"]["identifier"]
         self.enable_datetime = cfg["provider_settings"]["datetime_system_prompt"]
+        self.prompt_cache_friendly = cfg["provider_settings"].get(
+            "prompt_cache_friendly", False
+        )
         self.timezone = cfg.get("timezone")
         if not self.timezone:
             # 系统默认时区
@@ -59,6 +62,10 @@ class Main(star.Star):
             except BaseException as e:
                 logger.error(f"聊天增强 err: {e}")
 
+    async def terminate(self):
+        if self.ltm:
+            await self.ltm.terminate()
+
     async def _query_astrbot_notice(self):
         try:
             async with aiohttp.ClientSession(trust_env=True) as session:
@@ -107,6 +114,7 @@ class Main(star.Star):
 /persona: 人格情景(op)
 /tool ls: 函数工具
 /key: API Key(op)
+/llmcache: 开关当前会话的响应缓存
 /websearch: 网页搜索
 {notice}"""
 
@@ -304,6 +312,23 @@ class Main(star.Star):
         config.save_config()
         event.set_result(MessageEventResult().message("已开启文本转语音。"))
 
+    @filter.command("llmcache")
+    async def llmcache(self, event: AstrMessageEvent):
+        """开关当前会话的 LLM 响应缓存"""
+        cache = self.context.provider_manager.response_cache
+        umo = event.unified_msg_origin
+        if cache.session_enabled(umo):
+            cache.set_session_enabled(umo, False)
+            event.set_result(MessageEventResult().message("已为当前会话关闭 LLM 响应缓存。"))
+            return
+        cache.set_session_enabled(umo, True)
+        stats = cache.stats()
+        event.set_result(
+            MessageEventResult().message(
+                f"已为当前会话开启 LLM 响应缓存。当前命中率: {stats['hit_rate']:.1%}，累计节省 {stats['latency_saved']} 秒。"
+            )
+        )
+
     @filter.command("sid")
     async def sid(self, event: AstrMessageEvent):
         """获取会话 ID 和 管理员 ID"""
@@ -1198,6 +1223,12 @@ UID: {user_id} 此 ID 可用于设置管理员。
             user_info = f"\n[User ID: {user_id}, Nickname: {user_nickname}]\n"
             req.prompt = user_info + req.prompt
 
+        # 缓存友好模式下，时间、引用等每轮都会变化的内容放在本轮用户消息末尾，
+        # 使 System Prompt(人格) 与历史对话组成的请求前缀保持不变。这些内容不写入对话历史
+        per_turn_prompts = []
+        if self.prompt_cache_friendly and req.history_prompt is None:
+            req.history_prompt = req.prompt
+
         # 启用附加时间戳
         if self.enable_datetime:
             current_time = None
@@ -1212,7 +1243,10 @@ UID: {user_id} 此 ID 可用于设置管理员。
                 current_time = (
                     datetime.datetime.now().astimezone().strftime("%Y-%m-%d %H:%M (%Z)")
                 )
-            req.system_prompt += f"\nCurrent datetime: {current_time}\n"
+            if self.prompt_cache_friendly:
+                per_turn_prompts.append(f"Current datetime: {current_time}")
+            else:
+                req.system_prompt += f"\nCurrent datetime: {current_time}\n"
 
         if req.conversation:
             persona_id = req.conversation.persona_id
@@ -1241,7 +1275,14 @@ UID: {user_id} 此 ID 可用于设置管理员。
                 sender_info = f"(Sent by {quote.sender_nickname})"
             else:
                 sender_info = ""
-            req.system_prompt += f"\nUser is quoting the message{sender_info}: {quote.message_str}, please consider the context."
+            quote_prompt = f"User is quoting the message{sender_info}: {quote.message_str}, please consider the context."
+            if self.prompt_cache_friendly:
+                per_turn_prompts.append(quote_prompt)
+            else:
+                req.system_prompt += f"\n{quote_prompt}"
+
+        if self.prompt_cache_friendly and per_turn_prompts:
+            req.prompt += "\n\n" + "\n".join(per_turn_prompts)
 
         if self.ltm:
             try:
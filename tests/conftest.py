@@ -0,0 +1,51 @@
+"""
+性能基准测试使用 benchmark 标记，默认跳过，使用 `pytest --run-benchmark` 运行。
+基准测试通过 benchmark_report 记录结果，在测试结束后统一输出。
+"""
+
+import pytest
+
+_benchmark_results = pytest.StashKey[list]()
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-benchmark",
+        action="store_true",
+        default=False,
+        help="运行性能基准测试",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: 性能基准测试，默认跳过，使用 --run-benchmark 运行"
+    )
+    config.stash[_benchmark_results] = []
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmark"):
+        return
+    skip = pytest.mark.skip(reason="性能基准测试，使用 --run-benchmark 运行")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def benchmark_report(request):
+    """记录一行基准测试结果"""
+
+    def report(line: str):
+        request.config.stash[_benchmark_results].append(f"{request.node.name}: {line}")
+
+    return report
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash.get(_benchmark_results, [])
+    if results:
+        terminalreporter.section("benchmark")
+        for line in results:
+            terminalreporter.write_line(line)
@@ -0,0 +1,30 @@
+"""用于测试的 stdio MCP 服务"""
+
+import asyncio
+import os
+from mcp.server.fastmcp import FastMCP
+
+server = FastMCP("stub")
+
+
+@server.tool()
+def echo(text: str) -> str:
+    """Echo the text back"""
+    return text
+
+
+@server.tool()
+async def sleep(seconds: float) -> str:
+    """Sleep for the given seconds"""
+    await asyncio.sleep(seconds)
+    return "done"
+
+
+@server.tool()
+def crash() -> str:
+    """Exit the server process immediately"""
+    os._exit(1)
+
+
+if __name__ == "__main__":
+    server.run("stdio")
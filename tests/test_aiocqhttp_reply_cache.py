@@ -0,0 +1,132 @@
+import asyncio
+import pytest
+from aiocqhttp import Event
+from astrbot.core.message.components import Plain, Reply
+from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_platform_adapter import (
+    AiocqhttpAdapter,
+)
+
+
+def message_event(message_id: int, message: list) -> dict:
+    return {
+        "post_type": "message",
+        "message_type": "group",
+        "sub_type": "normal",
+        "self_id": 10000,
+        "user_id": 20000 + message_id,
+        "group_id": 30000,
+        "message_id": message_id,
+        "message": message,
+        "sender": {"user_id": 20000 + message_id, "nickname": f"user{message_id}"},
+    }
+
+
+def reply_to(message_id: int, quoted: int) -> dict:
+    return message_event(
+        message_id,
+        [
+            {"type": "reply", "data": {"id": str(quoted)}},
+            {"type": "text", "data": {"text": f"回复 {quoted}"}},
+        ],
+    )
+
+
+class StubBot:
+    """模拟协议端, get_msg 需要 delay 秒才返回"""
+
+    def __init__(self, messages: dict, delay: float = 0.05):
+        self.messages = messages
+        self.delay = delay
+        self.get_msg_calls = 0
+
+    async def call_action(self, action, **params):
+        assert action == "get_msg"
+        self.get_msg_calls += 1
+        await asyncio.sleep(self.delay)
+        return self.messages[params["message_id"]]
+
+
+def make_adapter(bot: StubBot) -> AiocqhttpAdapter:
+    adapter = AiocqhttpAdapter(
+        {"id": "reply_cache_test", "ws_reverse_host": "", "ws_reverse_port": 0},
+        {"unique_session": False},
+        asyncio.Queue(),
+    )
+    adapter.bot = bot
+    return adapter
+
+
+async def convert(adapter: AiocqhttpAdapter, payload: dict):
+    return await adapter._convert_handle_message_event(Event.from_payload(payload))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_quotes_share_one_get_msg():
+    popular = message_event(1, [{"type": "text", "data": {"text": "热门消息"}}])
+    bot = StubBot({1: popular})
+    adapter = make_adapter(bot)
+
+    results = await asyncio.gather(
+        *[convert(adapter, reply_to(100 + i, 1)) for i in range(20)]
+    )
+    assert bot.get_msg_calls == 1
+    for abm in results:
+        reply = abm.message[0]
+        assert isinstance(reply, Reply)
+        assert reply.message_str == "热门消息"
+        assert reply.sender_id == "20001"
+
+    # 之后的引用直接命中缓存
+    await convert(adapter, reply_to(200, 1))
+    assert bot.get_msg_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_inbound_messages_fill_cache_and_depth_is_limited():
+    bot = StubBot({})
+    adapter = make_adapter(bot)
+    await convert(adapter, message_event(1, [{"type": "text", "data": {"text": "a"}}]))
+    second = await convert(adapter, reply_to(2, 1))
+    third = await convert(adapter, reply_to(3, 2))
+    assert bot.get_msg_calls == 0
+
+    reply = third.message[0]
+    assert reply.id == "2"
+    # 被引用消息中的引用只保留 id, 不会继续展开
+    nested = reply.chain[0]
+    assert isinstance(nested, Reply) and nested.id == "1" and not nested.chain
+    assert second.message[0].chain == [Plain("a")]
+
+
+@pytest.mark.asyncio
+async def test_timeout_falls_back_to_bare_reply():
+    slow = message_event(1, [{"type": "text", "data": {"text": "慢"}}])
+    bot = StubBot({1: slow}, delay=0.3)
+    adapter = make_adapter(bot)
+    adapter.reply_cache.timeout = 0.05
+
+    abm = await convert(adapter, reply_to(2, 1))
+    reply = abm.message[0]
+    assert isinstance(reply, Reply) and reply.id == "1" and not reply.chain
+
+    # 获取在后台继续, 完成后放入缓存
+    await asyncio.sleep(0.4)
+    abm = await convert(adapter, reply_to(3, 1))
+    assert abm.message[0].message_str == "慢"
+    assert bot.get_msg_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_message_is_not_affected_by_pipeline_changes():
+    bot = StubBot({})
+    adapter = make_adapter(bot)
+    abm = await convert(
+        adapter, message_event(1, [{"type": "text", "data": {"text": "a"}}])
+    )
+    # 管道中的插件会修改收到的消息
+    abm.message.insert(0, Plain("插入"))
+    abm.message_str = "changed"
+
+    reply = (await convert(adapter, reply_to(2, 1))).message[0]
+    assert reply.chain == [Plain("a")]
+    assert reply.message_str == "a"
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+import pytest
+from astrbot.core.config import astrbot_config
+from astrbot.core.config.astrbot_config import AstrBotConfig
+from astrbot.core.pipeline.context import PipelineContext
+from astrbot.core.pipeline.waking_check.stage import WakingCheckStage
+from astrbot.core.pipeline.whitelist_check.stage import WhitelistCheckStage
+
+DEFAULT = {
+    "wake_prefix": ["/"],
+    "admins_id": [],
+    "platform_settings": {
+        "enable_id_white_list": True,
+        "id_whitelist": [],
+        "id_whitelist_log": True,
+        "wl_ignore_admin_on_group": True,
+        "wl_ignore_admin_on_friend": True,
+        "friend_message_needs_wake_prefix": False,
+    },
+}
+
+
+def load(path) -> dict:
+    with open(path, encoding="utf-8-sig") as f:
+        return json.load(f)
+
+
+def test_save_is_atomic(tmp_path, monkeypatch):
+    path = str(tmp_path / "cmd_config.json")
+    config = AstrBotConfig(config_path=path, default_config=DEFAULT)
+    config["wake_prefix"] = ["!"]
+    config.save_config()
+    assert load(path)["wake_prefix"] == ["!"]
+
+    def crash(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "fsync", crash)
+    config["wake_prefix"] = ["?"]
+    with pytest.raises(OSError):
+        config.save_config()
+    # 写入失败时原文件保持完整
+    assert load(path)["wake_prefix"] == ["!"]
+
+    monkeypatch.undo()
+    config.flush()
+    assert load(path)["wake_prefix"] == ["?"]
+    assert not os.path.exists(path + ".tmp")
+
+
+@pytest.mark.asyncio
+async def test_saves_are_coalesced_off_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "cmd_config.json")
+    config = AstrBotConfig(config_path=path, default_config=DEFAULT, save_delay=0.05)
+    writes = []
+    original = astrbot_config._atomic_write
+
+    def counting(p, text):
+        writes.append(text)
+        original(p, text)
+
+    monkeypatch.setattr(astrbot_config, "_atomic_write", counting)
+    for i in range(50):
+        config["platform_settings"]["id_whitelist"].append(str(i))
+        config.save_config()
+    assert writes == []
+    await asyncio.sleep(0.2)
+    assert len(writes) == 1
+    assert len(load(path)["platform_settings"]["id_whitelist"]) == 50
+
+
+@pytest.mark.asyncio
+async def test_reload_sees_unflushed_save(tmp_path):
+    path = str(tmp_path / "plugin_config.json")
+    config = AstrBotConfig(config_path=path, default_config={"a": 1}, save_delay=10)
+    config.save_config({"a": 5})
+    assert load(path)["a"] == 1
+    # 重载插件时会从文件重新创建配置
+    assert AstrBotConfig(config_path=path, default_config={"a": 1})["a"] == 5
+    assert config._save_handle is None
+
+
+def test_subscribers_get_changed_keys(tmp_path):
+    config = AstrBotConfig(
+        config_path=str(tmp_path / "cmd_config.json"), default_config=DEFAULT
+    )
+    all_changes, wl_changes = [], []
+    config.subscribe(all_changes.append)
+    config.subscribe(wl_changes.append, ["platform_settings.id_whitelist"])
+
+    config.save_config({"wake_prefix": ["!"]})
+    config["platform_settings"]["id_whitelist"].append("123")
+    config.save_config()
+    config.save_config()  # 没有变化时不通知
+
+    assert all_changes == [{"wake_prefix"}, {"platform_settings.id_whitelist"}]
+    assert wl_changes == [{"platform_settings.id_whitelist"}]
+
+
+@pytest.mark.asyncio
+async def test_stages_hot_reload(tmp_path):
+    config = AstrBotConfig(
+        config_path=str(tmp_path / "cmd_config.json"), default_config=DEFAULT
+    )
+    ctx = PipelineContext(config, None)
+    whitelist = WhitelistCheckStage()
+    await whitelist.initialize(ctx)
+    waking = WakingCheckStage()
+    await waking.initialize(ctx)
+    assert whitelist.whitelist == []
+
+    # 与 /wl 指令相同的修改方式
+    config["platform_settings"]["id_whitelist"].append(" 123 ")
+    config["platform_settings"]["friend_message_needs_wake_prefix"] = True
+    config.save_config()
+    assert whitelist.whitelist == ["123"]
+    assert waking.friend_message_needs_wake_prefix is True
+
+    # 阶段被回收后自动取消订阅
+    del whitelist, waking
+    config.save_config({"platform_settings": dict(DEFAULT["platform_settings"])})
+    assert config._listeners == []
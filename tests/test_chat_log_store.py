@@ -0,0 +1,73 @@
+import pytest
+from astrbot.core.utils.chat_log_store import ChatLogStore, SessionChatLog
+
+SEP = ChatLogStore.SEPARATOR
+
+
+def test_session_chat_log_incremental_render():
+    log = SessionChatLog(3, SEP)
+    expected = []
+    for i in range(10):
+        log.append(f"msg{i}")
+        expected.append(f"msg{i}")
+        if i % 3 == 0:
+            # 间隔渲染，覆盖淘汰已渲染部分与待渲染部分两种情况
+            assert log.render() == SEP.join(expected[-3:])
+    assert log.render() == SEP.join(expected[-3:])
+    assert len(log) == 3
+
+
+@pytest.mark.asyncio
+async def test_global_cap_evicts_idle_sessions_and_reloads(tmp_path):
+    db_path = str(tmp_path / "ltm.db")
+    store = ChatLogStore(max_cnt=5, max_total_cnt=8, db_path=db_path)
+    for i in range(5):
+        await store.append("a", f"a{i}")
+    await store.append("b", "b0")
+    # 会话 a 最久未活跃，会被移出内存
+    for i in range(1, 5):
+        await store.append("b", f"b{i}")
+    assert "a" not in store.sessions
+    assert store.total_cnt <= 8
+
+    await store.flush()
+    assert await store.render("a") == SEP.join(f"a{i}" for i in range(5))
+    assert "a" in store.sessions
+
+    assert await store.remove("b") == 5
+    assert await store.render("b") is None
+    await store.close()
+
+    # 重启后从数据库中恢复，并且只保留最新的 max_cnt 条
+    store = ChatLogStore(max_cnt=3, db_path=db_path)
+    assert await store.render("a") == SEP.join(["a2", "a3", "a4"])
+    assert not await store.exists("b")
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_evicted_session_keeps_unflushed_messages(tmp_path):
+    store = ChatLogStore(
+        max_cnt=5, max_total_cnt=3, db_path=str(tmp_path / "ltm.db"), flush_interval=60
+    )
+    await store.append("a", "a0")
+    await store.append("a", "a1")
+    await store.flush()
+    await store.append("a", "a2")
+    for i in range(3):
+        await store.append("b", f"b{i}")
+    assert "a" not in store.sessions
+    # a2 尚未写入数据库，重新加载时也不能丢失
+    assert await store.render("a") == SEP.join(["a0", "a1", "a2"])
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_memory_only_store():
+    store = ChatLogStore(max_cnt=2)
+    await store.append("s", "x")
+    await store.append("s", "y")
+    await store.append("s", "z")
+    assert await store.render("s") == f"y{SEP}z"
+    assert await store.render("other") is None
+    await store.close()
@@ -0,0 +1,77 @@
+import time
+import pytest
+from astrbot.core.provider.func_tool_manager import FuncCall, FuncTool
+
+
+async def _handler(**kwargs):
+    return "ok"
+
+
+def make_func_call(n: int) -> FuncCall:
+    fc = FuncCall()
+    for i in range(n):
+        fc.add_func(
+            f"tool_{i}",
+            [{"type": "string", "name": "query", "description": "查询内容"}],
+            f"第 {i} 个工具",
+            _handler,
+        )
+    return fc
+
+
+def test_index_and_cache_invalidation():
+    fc = make_func_call(3)
+    assert fc.get_func("tool_1").name == "tool_1"
+    assert fc.get_func("missing") is None
+
+    first = fc.get_func_desc_openai_style()
+    assert [t["function"]["name"] for t in first] == ["tool_0", "tool_1", "tool_2"]
+    # 未发生变化时返回缓存的描述
+    assert fc.get_func_desc_openai_style()[0] is first[0]
+
+    fc.get_func("tool_1").active = False
+    assert [t["name"] for t in fc.get_func_desc_anthropic_style()] == [
+        "tool_0",
+        "tool_2",
+    ]
+    fc.get_func("tool_1").active = True
+
+    fc.remove_func("tool_0")
+    assert fc.get_func("tool_0") is None
+    decls = fc.get_func_desc_google_genai_style()["function_declarations"]
+    assert [t["name"] for t in decls] == ["tool_1", "tool_2"]
+
+    # 模拟 MCP 服务重连后整体替换工具列表
+    fc.func_list = [f for f in fc.func_list if f.name != "tool_2"] + [
+        FuncTool(name="mcp_tool", parameters={}, description="", origin="mcp")
+    ]
+    assert fc.get_func("mcp_tool").origin == "mcp"
+    assert [t["function"]["name"] for t in fc.get_func_desc_openai_style()] == [
+        "tool_1",
+        "mcp_tool",
+    ]
+
+
+@pytest.mark.benchmark
+def test_schema_cache_benchmark(benchmark_report):
+    fc = make_func_call(200)
+    n = 200
+
+    start = time.perf_counter()
+    for _ in range(n):
+        fc._build_func_desc_openai_style(False)
+        fc._build_func_desc_anthropic_style()
+        fc._build_func_desc_google_genai_style()
+    uncached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n):
+        fc.get_func_desc_openai_style()
+        fc.get_func_desc_anthropic_style()
+        fc.get_func_desc_google_genai_style()
+        fc.get_func("tool_199")
+    cached = time.perf_counter() - start
+
+    benchmark_report(
+        f"200 tools x {n} turns: rebuild {uncached * 1000:.1f} ms, cached {cached * 1000:.1f} ms"
+    )
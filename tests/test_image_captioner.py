@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from PIL import Image as PILImage
+from astrbot.core.db.po import ATRIVision
+from astrbot.core.db.sqlite import SQLiteDatabase
+from astrbot.core.provider.entities import LLMResponse
+from packages.astrbot.image_captioner import ImageCaptioner
+
+
+class StubProvider:
+    def __init__(self):
+        self.calls = []
+
+    async def text_chat(self, prompt, session_id=None, image_urls=[], **kwargs):
+        self.calls.append(list(image_urls))
+        if len(image_urls) == 1:
+            return LLMResponse("assistant", completion_text="single")
+        text = "\n".join(f"{i + 1}. caption{i + 1}" for i in range(len(image_urls)))
+        return LLMResponse("assistant", completion_text=text)
+
+
+class StubDB:
+    def __init__(self):
+        self.rows = {}
+
+    def insert_atri_vision_data(self, vision):
+        self.rows[vision.id] = vision
+
+    def get_atri_vision_data_by_id(self, id):
+        return self.rows.get(id)
+
+
+def make_image(path, seed: int, size=(64, 64)):
+    img = PILImage.new("L", size)
+    img.putdata(
+        [(x * seed + y * 7) % 256 for y in range(size[1]) for x in range(size[0])]
+    )
+    img.save(path)
+    return str(path)
+
+
+async def wait_idle(captioner: ImageCaptioner):
+    for _ in range(100):
+        await asyncio.sleep(0.02)
+        if not captioner._queued:
+            return
+
+
+@pytest.mark.asyncio
+async def test_batched_captioning_and_cache(tmp_path):
+    provider = StubProvider()
+    db = StubDB()
+    captioner = ImageCaptioner(lambda: provider, db, "describe", batch_size=4)
+    captioner.BATCH_WINDOW = 0.1
+
+    paths = [make_image(tmp_path / f"{i}.png", i + 1) for i in range(3)]
+    placeholders = [await captioner.caption(p) for p in paths]
+    # 同一张图片再次出现，不会重复入队
+    assert await captioner.caption(paths[0]) == placeholders[0]
+    await wait_idle(captioner)
+
+    assert len(provider.calls) == 1
+    assert len(provider.calls[0]) == 3
+    filled = await captioner.fill(" ".join(placeholders))
+    assert filled == "[Image: caption1] [Image: caption2] [Image: caption3]"
+
+    # 缩放后的同一张图片命中缓存
+    resized = str(tmp_path / "resized.jpg")
+    PILImage.open(paths[0]).resize((128, 128)).save(resized, quality=70)
+    assert await captioner.caption(resized) == "[Image: caption1]"
+
+    # 新进程只有数据库中的缓存
+    captioner2 = ImageCaptioner(lambda: provider, db, "describe")
+    assert await captioner2.caption(paths[1]) == "[Image: caption2]"
+    assert len(provider.calls) == 1
+    await captioner.terminate()
+
+
+@pytest.mark.asyncio
+async def test_per_minute_budget(tmp_path):
+    provider = StubProvider()
+    captioner = ImageCaptioner(lambda: provider, None, "describe", per_minute=1)
+    captioner.BATCH_WINDOW = 0.05
+
+    paths = [make_image(tmp_path / f"{i}.png", i + 1) for i in range(2)]
+    placeholders = [await captioner.caption(p) for p in paths]
+    await asyncio.sleep(0.3)
+
+    assert provider.calls == [[paths[0]]]
+    assert await captioner.fill(placeholders[1]) == "[Image]"
+    await captioner.terminate()
+
+
+def test_vision_lookup_by_id_uses_index(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "data.db"))
+    db.insert_atri_vision_data(
+        ATRIVision("hash", "", "a cat", False, [], "", "", "", 0)
+    )
+    assert db.get_atri_vision_data_by_id("hash").caption == "a cat"
+    assert db.get_atri_vision_data_by_id("other") is None
+    plan = db.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM atri_vision WHERE id = ?", ("hash",)
+    ).fetchall()
+    assert "idx_atri_vision_id" in str(plan)
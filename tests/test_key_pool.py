@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from astrbot.core.provider.key_pool import APIKeyPool, parse_reset_duration
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("20") == 20
+    assert parse_reset_duration("1s") == 1
+    assert parse_reset_duration("6m0s") == 360
+    assert parse_reset_duration("20ms") == pytest.approx(0.02)
+    assert parse_reset_duration("") is None
+    assert parse_reset_duration("not a duration") is None
+
+
+@pytest.mark.asyncio
+async def test_least_loaded_key():
+    pool = APIKeyPool(["k1", "k2"])
+    a = await pool.acquire()
+    b = await pool.acquire()
+    assert {a, b} == {"k1", "k2"}
+    await pool.release(a)
+    c = await pool.acquire()
+    assert c == a
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_key_is_skipped():
+    pool = APIKeyPool(["k1", "k2"], default_cooldown=60)
+    pool.mark_rate_limited("k1")
+    for _ in range(3):
+        key = await pool.acquire()
+        assert key == "k2"
+        await pool.release(key)
+    assert pool.states["k1"].rate_limited == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_headers():
+    pool = APIKeyPool(["k1", "k2"])
+    pool.update_from_headers(
+        "k1",
+        {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "30s"},
+    )
+    assert pool.states["k1"].remaining_requests == 0
+    assert pool.states["k1"].cooling()
+    assert await pool.acquire() == "k2"
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit():
+    pool = APIKeyPool(["k1"], max_concurrency=1)
+    key = await pool.acquire()
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    await pool.release(key)
+    assert await asyncio.wait_for(waiter, 1) == "k1"
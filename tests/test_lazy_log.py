@@ -0,0 +1,81 @@
+import logging
+import time
+import pytest
+from astrbot.core.log import LogSampler, lazy_fields, lazy_repr
+from astrbot.core.provider.entities import ProviderRequest
+
+
+class CountingRepr:
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "x" * 5000
+
+
+def make_logger() -> logging.Logger:
+    logger = logging.getLogger("test_lazy_log")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+    return logger
+
+
+def test_lazy_repr_is_deferred_and_capped():
+    obj = CountingRepr()
+    logger = make_logger()
+    logger.setLevel(logging.INFO)
+    logger.debug("payload: %s", lazy_repr(obj))
+    assert obj.calls == 0
+
+    text = str(lazy_repr(obj, max_len=100))
+    assert text.startswith("x" * 100)
+    assert "省略 4900 字符" in text
+
+    big = {f"k{i}": list(range(1000)) for i in range(1000)}
+    assert len(str(lazy_repr(big))) < 2000
+    assert str(lazy_fields(a=1, b="hi")) == "a=1 b=hi"
+
+
+def test_log_sampler():
+    sampler = LogSampler(3)
+    assert [sampler.sample() for _ in range(7)] == [
+        True,
+        False,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+@pytest.mark.benchmark
+def test_info_level_overhead_benchmark(benchmark_report):
+    logger = make_logger()
+    logger.setLevel(logging.INFO)
+    req = ProviderRequest(
+        prompt="hello " * 200,
+        contexts=[
+            {"role": "user" if i % 2 == 0 else "assistant", "content": "消息" * 200}
+            for i in range(100)
+        ],
+        system_prompt="You are a helpful assistant.",
+        image_urls=[],
+    )
+    n = 2000
+
+    start = time.perf_counter()
+    for _ in range(n):
+        logger.debug(f"提供商请求 Payload: {req}")
+    eager = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n):
+        logger.debug("提供商请求 Payload: %s", lazy_repr(req))
+    lazy = time.perf_counter() - start
+
+    benchmark_report(
+        f"per-request overhead at INFO: f-string {eager / n * 1e6:.1f} us, lazy {lazy / n * 1e6:.2f} us"
+    )
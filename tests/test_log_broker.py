@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import threading
+import time
+import pytest
+from astrbot.core.log import PLAIN_LOG_FORMAT, LogBroker, LogManager
+
+
+class SlowHandler(logging.Handler):
+    """模拟缓慢的控制台输出"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        time.sleep(0.002)
+        self.threads.add(threading.get_ident())
+        self.records.append(self.format(record))
+
+
+def make_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addFilter(lambda r: setattr(r, "plugin_tag", "[Core]") or True)
+    logger.addFilter(lambda r: setattr(r, "short_levelname", "DBUG") or True)
+    logger.addHandler(handler)
+    return logger
+
+
+@pytest.mark.asyncio
+async def test_publish_from_threads_is_delivered_on_loop():
+    broker = LogBroker()
+    q = broker.register()
+
+    def worker(i):
+        for j in range(50):
+            broker.publish({"level": "INFO", "time": "", "data": f"{i}-{j}"})
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    await asyncio.sleep(0.05)
+
+    received = []
+    while not q.empty():
+        received.append(q.get_nowait()["data"])
+    assert sorted(received) == sorted(f"{i}-{j}" for i in range(4) for j in range(50))
+    broker.unregister(q)
+    assert not broker.subscribers
+
+
+@pytest.mark.asyncio
+async def test_background_listener_and_file_sink(tmp_path):
+    slow = SlowHandler()
+    slow.setFormatter(logging.Formatter(PLAIN_LOG_FORMAT))
+    logger = make_logger("test_log_broker", slow)
+    broker = LogBroker()
+    q = broker.register()
+    LogManager.set_queue_handler(logger, broker)
+    log_path = tmp_path / "logs" / "astrbot.log"
+    LogManager.set_file_handler(logger, str(log_path), max_mb=1)
+    # 重复设置同一个文件不会重复写入
+    LogManager.set_file_handler(logger, str(log_path), max_mb=1)
+
+    n = 100
+    for i in range(n):
+        logger.debug("line %d", i)
+
+    LogManager._listeners.pop(logger.name).stop()
+    await asyncio.sleep(0.05)
+    assert len(slow.records) == n
+    # 缓慢的输出在后台线程中执行，不占用调用方线程
+    assert threading.get_ident() not in slow.threads
+    assert logger.name not in LogManager._listeners
+    assert q.qsize() == n
+    lines = log_path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == n
+    assert lines[-1].endswith("line 99")
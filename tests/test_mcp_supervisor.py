@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+import time
+import pytest
+from astrbot.core.provider.func_tool_manager import FuncCall
+
+STUB_SERVER = os.path.join(os.path.dirname(__file__), "fixtures", "mcp_stub_server.py")
+
+
+async def wait_until(predicate, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met")
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_mcp_supervisor_against_stdio_stub():
+    fc = FuncCall()
+    fc.mcp_restart_backoff = (0.1, 0.5)
+    server_cfg = {
+        "command": sys.executable,
+        "args": [STUB_SERVER],
+        "call_timeout": 1,
+        "ping_interval": 0.3,
+        "max_concurrency": 1,
+    }
+    cfg = {"mcpServers": {"stub": server_cfg}}
+    event = asyncio.Event()
+    fc.mcp_client_event["stub"] = event
+    task = asyncio.create_task(fc._init_mcp_client_task_wrapper("stub", cfg, event))
+    try:
+        await wait_until(lambda: fc.get_func("echo") is not None)
+        client = fc.mcp_client_dict["stub"]
+
+        res = await fc.get_func("echo").execute(text="hello")
+        assert res.content[0].text == "hello"
+
+        # 单次调用超时
+        with pytest.raises(TimeoutError):
+            await fc.get_func("sleep").execute(seconds=5)
+
+        # 每个服务的并发上限为 1，两次调用依次执行
+        start = time.monotonic()
+        await asyncio.gather(
+            fc.get_func("sleep").execute(seconds=0.3),
+            fc.get_func("sleep").execute(seconds=0.3),
+        )
+        assert time.monotonic() - start >= 0.6
+
+        stats = client.latency_stats()
+        assert stats["echo"]["count"] == 1
+        assert stats["sleep"]["timeouts"] == 1
+        assert stats["sleep"]["count"] == 3
+
+        # 服务崩溃后会被自动重启
+        with pytest.raises(Exception):
+            await fc.get_func("crash").execute()
+        await wait_until(
+            lambda: (
+                fc.mcp_client_dict.get("stub") not in (None, client)
+                and fc.get_func("echo") is not None
+            )
+        )
+        res = await fc.get_func("echo").execute(text="again")
+        assert res.content[0].text == "again"
+        # 重启后仍然使用配置中的调用控制参数
+        assert server_cfg["call_timeout"] == 1
+        assert fc.mcp_client_dict["stub"].call_timeout == 1
+        assert fc.mcp_client_dict["stub"].max_concurrency == 1
+    finally:
+        event.set()
+        await asyncio.wait_for(task, 10)
+    assert "stub" not in fc.mcp_client_dict
+    assert fc.get_func("echo") is None
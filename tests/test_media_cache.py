@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from astrbot.core.platform.media_cache import (
+    WECOM_MEDIA_TTL,
+    MediaHandleCache,
+    get_media_cache,
+    media_cache_stats,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_same_content_uploaded_once_for_many_chats():
+    cache = MediaHandleCache("test")
+    uploads = 0
+
+    async def upload():
+        nonlocal uploads
+        uploads += 1
+        await asyncio.sleep(0.01)
+        return "img_v2_key"
+
+    data = b"help card" * 1000
+    key = cache.make_key(data, "image")
+    handles = await asyncio.gather(
+        *[cache.get_or_upload(key, upload) for _ in range(200)]
+    )
+    assert set(handles) == {"img_v2_key"}
+    assert uploads == 1
+    assert cache.stats()["hits"] == 199
+    assert cache.stats()["hit_rate"] == 0.995
+
+    # 不同的内容、媒体类型或目标使用不同的句柄
+    assert cache.make_key(data, "voice") != key
+    assert cache.make_key(data, "image", "group1") != key
+
+
+@pytest.mark.asyncio
+async def test_expiry_and_platform_ttl():
+    clock = FakeClock()
+    cache = MediaHandleCache("wecom", ttl=WECOM_MEDIA_TTL, clock=clock)
+    uploads = []
+
+    async def upload():
+        uploads.append(clock.now)
+        return f"media_{len(uploads)}"
+
+    assert await cache.get_or_upload("k", upload) == "media_1"
+    clock.now += WECOM_MEDIA_TTL - 4 * 3600
+    assert await cache.get_or_upload("k", upload) == "media_1"
+    # 在过期前提前失效
+    clock.now += 3 * 3600 + 1
+    assert await cache.get_or_upload("k", upload) == "media_2"
+    assert cache.stats()["expired"] == 1
+
+    # QQ 官方由上传接口返回 ttl, 0 表示长期有效
+    async def upload_qq():
+        return {"file_info": "abc", "ttl": 0}
+
+    ttl_of = lambda media: media.get("ttl")  # noqa: E731
+    await cache.get_or_upload("qq", upload_qq, ttl_of=ttl_of)
+    clock.now += 100 * WECOM_MEDIA_TTL
+    assert cache.get("qq") == {"file_info": "abc", "ttl": 0}
+
+    cache.invalidate("qq")
+    assert cache.get("qq") is None
+
+
+@pytest.mark.asyncio
+async def test_failed_upload_is_not_cached():
+    cache = MediaHandleCache("test", max_entries=2)
+
+    async def fail():
+        raise RuntimeError("upload failed")
+
+    async def empty():
+        return None
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_upload("k", fail)
+    assert await cache.get_or_upload("k", empty) is None
+    assert cache.get("k") is None
+
+    for i in range(3):
+        cache.put(f"k{i}", i)
+    assert cache.get("k0") is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_registry_stats():
+    cache = get_media_cache("test_registry", ttl=10)
+    assert get_media_cache("test_registry") is cache
+    assert media_cache_stats()["test_registry"]["entries"] == 0
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from astrbot.core.platform.sources.wecom.async_client import AsyncWecomClient
+from astrbot.core.utils.media_worker import (
+    run_in_media_pool,
+    shutdown_media_pool,
+)
+
+
+def cpu_heavy(n: int) -> int:
+    """模拟一次阻塞的音频转码"""
+    total = 0
+    for i in range(n):
+        total += i * i % 7
+    return total
+
+
+async def max_loop_lag(work) -> float:
+    """在执行 work 期间, 每 5ms 记录一次事件循环的调度延迟"""
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - start - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+    try:
+        await work()
+    finally:
+        done.set()
+        await tick
+    return max(lags)
+
+
+@pytest.mark.asyncio
+async def test_media_pool_runs_in_worker_process():
+    results = await asyncio.gather(
+        run_in_media_pool(cpu_heavy, 1000), run_in_media_pool(os.getpid)
+    )
+    shutdown_media_pool()
+    assert results[0] == cpu_heavy(1000)
+    assert results[1] != os.getpid()
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_loop_stays_responsive_during_transcoding(benchmark_report):
+    n = 3_000_000
+
+    async def inline():
+        cpu_heavy(n)
+
+    async def pooled():
+        results = await asyncio.gather(
+            *[run_in_media_pool(cpu_heavy, n) for _ in range(2)]
+        )
+        assert results[0] == results[1]
+
+    # 预热进程池, 避免把进程启动时间算进去
+    await run_in_media_pool(cpu_heavy, 10)
+    inline_lag = await max_loop_lag(inline)
+    pooled_lag = await max_loop_lag(pooled)
+    shutdown_media_pool()
+    benchmark_report(
+        f"max event loop lag: inline {inline_lag * 1000:.1f} ms, "
+        f"media pool {pooled_lag * 1000:.1f} ms"
+    )
+
+
+@pytest.mark.asyncio
+async def test_wecom_sdk_calls_do_not_block_loop():
+    sdk_threads = set()
+
+    def slow_send_text(agent_id, user_id, content):
+        sdk_threads.add(threading.get_ident())
+        time.sleep(0.05)  # 同步的 requests 请求
+        return {"errcode": 0}
+
+    def fetch_access_token():
+        sdk_threads.add(threading.get_ident())
+        time.sleep(0.05)
+        return {"access_token": "token", "expires_in": 7200}
+
+    client = AsyncWecomClient(
+        SimpleNamespace(
+            message=SimpleNamespace(send_text=slow_send_text),
+            fetch_access_token=fetch_access_token,
+        )
+    )
+
+    ret = await asyncio.gather(
+        *[client.send_text("1000002", f"user{i}", "hi") for i in range(3)]
+    )
+    assert ret == [{"errcode": 0}] * 3
+    # 同步的 SDK 调用都在线程中执行
+    assert threading.get_ident() not in sdk_threads
+    # 并发调用只获取了一次 access_token
+    assert client.token_manager.refresh_count == 1
@@ -0,0 +1,92 @@
+import copy
+import time
+import pytest
+from astrbot.core.message.components import (
+    At,
+    AtAll,
+    ComponentType,
+    Face,
+    Image,
+    Node,
+    Plain,
+    Reply,
+    set_component_validation,
+)
+
+
+@pytest.fixture
+def validation():
+    set_component_validation(True)
+    yield
+    set_component_validation(False)
+
+
+def build_and_serialize(n: int):
+    for i in range(n // 4):
+        Plain("hello").toDict()
+        At(qq=i).toDict()
+        Image.fromURL("https://example.com/a.jpg").toDict()
+        Reply(id=i).toDict()
+
+
+@pytest.mark.benchmark
+def test_benchmark_1m_components(validation, benchmark_report):
+    start = time.perf_counter()
+    build_and_serialize(100_000)
+    validated = (time.perf_counter() - start) * 10
+
+    set_component_validation(False)
+    start = time.perf_counter()
+    build_and_serialize(1_000_000)
+    fast = time.perf_counter() - start
+
+    benchmark_report(
+        f"1M components (Plain / At / Image / Reply) + toDict: "
+        f"{fast:.2f}s, with validation (pydantic, extrapolated) {validated:.2f}s"
+    )
+
+
+def test_serialization_is_unchanged():
+    assert Plain("hi").toDict() == {
+        "type": "plain",
+        "data": {"text": "hi", "convert": True},
+    }
+    assert At(qq=123, name="a").toString() == "[CQ:at,qq=123,name=a]"
+    assert AtAll().toDict() == {"type": "at", "data": {"qq": "all", "name": ""}}
+    assert Plain("[x]").toString() == "&#91;x&#93;"
+    assert Image.fromURL("https://example.com/a.jpg").toDict()["data"] == {
+        "file": "https://example.com/a.jpg",
+        "subType": 0,
+        "url": "",
+        "cache": True,
+        "id": 40000,
+        "c": 2,
+        "path": "",
+        "file_unique": "",
+    }
+    assert Node(content=[Plain("x")], name="a", uin=1).toDict()["data"]["content"] == (
+        "x"
+    )
+    assert Plain("x").type == ComponentType.Plain.value
+
+
+def test_component_semantics():
+    # 与 pydantic 一致: 忽略未知参数, 可变默认值不共享, 缺少必填字段时报错
+    assert Plain("x", unknown=1) == Plain("x")
+    assert Reply(id=1).chain is not Reply(id=2).chain
+    with pytest.raises(ValueError):
+        Face()
+    with pytest.raises(AttributeError):
+        Plain("x").foo = 1
+
+    reply = Reply(id=1, chain=[Plain("a"), At(qq=1)])
+    copied = copy.deepcopy(reply)
+    assert copied == reply
+    assert copied.chain[0] is not reply.chain[0]
+    assert repr(Plain("a")) == "Plain(type='Plain', text='a', convert=True)"
+
+
+def test_validation_mode(validation):
+    assert At(qq="123").qq == 123
+    with pytest.raises(ValueError):
+        Face(id="not a number")
@@ -0,0 +1,185 @@
+import os
+import time
+import pytest
+from astrbot.core.message.components import Image, Node, Plain, Record
+from astrbot.core.message.message_event_result import MessageChain
+from astrbot.core.platform import MessageMember, PlatformMetadata
+from astrbot.core.platform.astrbot_message import AstrBotMessage
+from astrbot.core.platform.message_type import MessageType
+from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import (
+    AiocqhttpMessageEvent,
+)
+from astrbot.core.platform.sources.aiocqhttp.onebot_serializer import (
+    OneBotSerializer,
+)
+from astrbot.core.utils.io import file_to_base64
+from astrbot.core.utils.metrics import Metric
+
+
+@pytest.fixture
+def image_files(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"img{i}.jpg"
+        path.write_bytes(os.urandom(512 * 1024))
+        paths.append(str(path))
+    return paths
+
+
+def image_chain(paths, repeat=4):
+    chain = [Plain("图片来了")]
+    for _ in range(repeat):
+        chain.extend(Image.fromFileSystem(p) for p in paths)
+    return MessageChain(chain)
+
+
+async def naive_serialize(message_chain: MessageChain):
+    """原来的实现: 每次都遍历 __dict__ 并重新读取、编码文件"""
+    ret = []
+    for segment in message_chain.chain:
+        d = segment.toDict()
+        if isinstance(segment, Plain):
+            d["type"] = "text"
+            d["data"]["text"] = segment.text.strip()
+        elif isinstance(segment, Image):
+            d["data"] = {"file": file_to_base64(segment.file[8:])}
+        ret.append(d)
+    return ret
+
+
+@pytest.mark.asyncio
+async def test_serialization_matches_naive(image_files):
+    chain = image_chain(image_files, repeat=1)
+    base64_msg = await OneBotSerializer().to_message(chain)
+    assert base64_msg[1:] == (await naive_serialize(chain))[1:]
+
+    path_msg = await OneBotSerializer("path").to_message(chain)
+    assert all(
+        seg["data"]["file"].startswith("file:///")
+        for seg in path_msg
+        if seg["type"] == "image"
+    )
+    assert sum(len(str(seg)) for seg in path_msg) < 10_000
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_benchmark_image_heavy_chain(image_files, benchmark_report):
+    sessions = 10
+    chains = [image_chain(image_files) for _ in range(sessions)]
+
+    start = time.perf_counter()
+    for chain in chains:
+        for _ in range(3):  # 同一条消息链发送到 3 个会话
+            await naive_serialize(chain)
+    naive_time = time.perf_counter() - start
+
+    serializer = OneBotSerializer()
+    start = time.perf_counter()
+    for chain in chains:
+        for _ in range(3):
+            await serializer.to_message(chain)
+    cached_time = time.perf_counter() - start
+
+    path_serializer = OneBotSerializer("path")
+    start = time.perf_counter()
+    for chain in chains:
+        for _ in range(3):
+            await path_serializer.to_message(chain)
+    path_time = time.perf_counter() - start
+
+    benchmark_report(
+        f"{sessions} chains x 21 segments (20 x 512KB images) x 3 sends: "
+        f"naive {naive_time * 1000:.1f}ms, cached base64 {cached_time * 1000:.1f}ms, "
+        f"path {path_time * 1000:.1f}ms"
+    )
+
+
+@pytest.mark.asyncio
+async def test_base64_is_memoized_per_component(image_files):
+    image = Image.fromFileSystem(image_files[0])
+    first = await image.convert_to_base64()
+    os.remove(image_files[0])
+    # 文件已被删除, 仍然可以从缓存中得到编码
+    assert await image.convert_to_base64() == first
+    assert "_base64_cache" not in image.toDict()["data"]
+
+    image.file = "base64://aGVsbG8="
+    assert await image.convert_to_base64() == "aGVsbG8="
+
+
+@pytest.mark.asyncio
+async def test_path_mode_passes_urls_and_falls_back(tmp_path):
+    serializer = OneBotSerializer("path")
+    url = "https://example.com/a.jpg"
+    record = tmp_path / "a.wav"
+    record.write_bytes(b"RIFF")
+    msg = await serializer.to_message(
+        MessageChain(
+            [
+                Image.fromURL(url),
+                Record(file=str(record)),
+                Image.fromBase64("aGVsbG8="),
+                Plain("  \n"),
+            ]
+        )
+    )
+    assert msg == [
+        {"type": "image", "data": {"file": url}},
+        {"type": "record", "data": {"file": "file:///" + str(record).lstrip("/")}},
+        {"type": "image", "data": {"file": "base64://aGVsbG8="}},
+    ]
+
+
+class StubBot:
+    def __init__(self):
+        self.sent = []
+        self.actions = []
+
+    async def send(self, event, message):
+        self.sent.append(message)
+
+    async def call_action(self, action, **params):
+        self.actions.append(action)
+
+
+@pytest.mark.asyncio
+async def test_forward_chain_is_serialized_once(image_files, monkeypatch):
+    async def no_upload(**kwargs):
+        pass
+
+    monkeypatch.setattr(Metric, "upload", no_upload)
+    calls = 0
+    original = OneBotSerializer.serialize_segment
+
+    async def counting(self, segment):
+        nonlocal calls
+        calls += 1
+        return await original(self, segment)
+
+    monkeypatch.setattr(OneBotSerializer, "serialize_segment", counting)
+
+    message_obj = AstrBotMessage()
+    message_obj.type = MessageType.GROUP_MESSAGE
+    message_obj.group_id = "123"
+    message_obj.sender = MessageMember(user_id="456")
+    message_obj.raw_message = {}
+    bot = StubBot()
+    event = AiocqhttpMessageEvent(
+        "",
+        message_obj,
+        PlatformMetadata("aiocqhttp", "", id="onebot_test"),
+        "123",
+        bot=bot,
+    )
+    chain = MessageChain(
+        [
+            Plain("前"),
+            Node(content=[Plain("转发")], name="a", uin=1),
+            Image.fromFileSystem(image_files[0]),
+        ]
+    )
+    await event.send(chain)
+    assert calls == 3
+    assert bot.actions == ["send_group_forward_msg"]
+    assert [m[0]["type"] for m in bot.sent] == ["text", "image"]
@@ -1,6 +1,7 @@
 import pytest
 import os
-from astrbot.core.star.star_manager import PluginManager
+from astrbot.core import pip_installer
+from astrbot.core.star.star_manager import PluginManager, _load_plugin_file
 from astrbot.core.star.star_handler import star_handlers_registry
 from astrbot.core.star.star import star_registry
 from astrbot.core.star.context import Context
@@ -81,3 +82,66 @@ async def test_plugin_crud(plugin_manager_pm: PluginManager):
         await plugin_manager_pm.uninstall_plugin("astrbot_plugin_essentialhaha")
 
     # TODO: file installation
+
+
+@pytest.mark.asyncio
+async def test_plugin_load_timings(plugin_manager_pm: PluginManager):
+    await plugin_manager_pm.reload()
+    for plugin_module in plugin_manager_pm._get_plugin_modules():
+        timings = plugin_manager_pm.load_timings[plugin_module["pname"]]
+        assert timings["total"] >= timings["import"] >= 0
+
+
+def test_plugin_file_cache(tmp_path):
+    path = tmp_path / "metadata.yaml"
+    path.write_text("name: a\n", encoding="utf-8")
+    calls = []
+
+    def parser(text):
+        calls.append(text)
+        return {"text": text, "items": []}
+
+    first = _load_plugin_file(str(path), parser)
+    # Schema 的默认值会被放入插件配置，修改返回的对象不能影响缓存
+    first["items"].append(1)
+    assert _load_plugin_file(str(path), parser)["items"] == []
+    assert len(calls) == 1
+
+    path.write_text("name: ab\n", encoding="utf-8")
+    os.utime(path, ns=(0, 0))
+    assert _load_plugin_file(str(path), parser)["text"] == "name: ab\n"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_plugin_deps_installed_in_one_batch(
+    plugin_manager_pm: PluginManager, tmp_path, monkeypatch
+):
+    for name in ("a", "b", "c"):
+        os.makedirs(tmp_path / name)
+        if name != "c":
+            (tmp_path / name / "requirements.txt").write_text("x\n")
+    plugin_manager_pm.plugin_store_path = str(tmp_path)
+    calls = []
+
+    async def install_requirements(paths, mirror=None):
+        calls.append(paths)
+        if len(paths) > 1 and fail_batch:
+            raise Exception("conflict")
+
+    monkeypatch.setattr(pip_installer, "install_requirements", install_requirements)
+
+    fail_batch = False
+    await plugin_manager_pm._check_plugin_dept_update(["a", "b", "c"])
+    assert calls == [
+        [
+            str(tmp_path / "a" / "requirements.txt"),
+            str(tmp_path / "b" / "requirements.txt"),
+        ]
+    ]
+
+    # 批量安装失败后逐个安装
+    calls.clear()
+    fail_batch = True
+    await plugin_manager_pm._check_plugin_dept_update(["a", "b"])
+    assert len(calls) == 3 and calls[1:] == [[p] for p in calls[0]]
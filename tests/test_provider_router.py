@@ -0,0 +1,148 @@
+import asyncio
+import pytest
+from typing import List
+from astrbot.core.provider.provider import Provider
+from astrbot.core.provider.entities import LLMResponse
+from astrbot.core.provider.router import ProviderRouter, CircuitState
+
+
+class StubProvider(Provider):
+    def __init__(self, provider_id: str, delay: float = 0, fail: bool = False):
+        super().__init__(
+            {"id": provider_id, "type": "stub"},
+            {},
+        )
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def get_current_key(self) -> str:
+        return ""
+
+    def set_key(self, key: str):
+        pass
+
+    def get_models(self) -> List[str]:
+        return []
+
+    async def text_chat(self, prompt: str, **kwargs) -> LLMResponse:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise Exception(f"{self.meta().id} failed")
+        return LLMResponse("assistant", completion_text=self.meta().id)
+
+    async def text_chat_stream(self, prompt: str, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise Exception(f"{self.meta().id} failed")
+        yield LLMResponse("assistant", completion_text="chunk", is_chunk=True)
+        yield LLMResponse("assistant", completion_text=self.meta().id)
+
+
+class StubProviderManager:
+    def __init__(self, providers: List[Provider]):
+        self.provider_insts = providers
+
+
+def make_router(providers, **cfg) -> ProviderRouter:
+    return ProviderRouter(StubProviderManager(providers), {"enable": True, **cfg})
+
+
+@pytest.mark.asyncio
+async def test_fallback_chain():
+    a = StubProvider("a", fail=True)
+    b = StubProvider("b")
+    c = StubProvider("c")
+    router = make_router([a, b, c], chain=["c", "b"])
+    resp = await router.text_chat(a, prompt="hi", contexts=[])
+    assert resp.completion_text == "c"
+    assert router.get_health("a").failure_cnt == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker():
+    a = StubProvider("a", fail=True)
+    b = StubProvider("b")
+    router = make_router(
+        [a, b], circuit_breaker_threshold=2, circuit_breaker_cooldown=0.05
+    )
+    for _ in range(3):
+        resp = await router.text_chat(a, prompt="hi", contexts=[])
+        assert resp.completion_text == "b"
+    # 熔断后不再请求 a
+    assert a.calls == 2
+    assert router.get_health("a").state == CircuitState.OPEN
+
+    await asyncio.sleep(0.06)
+    a.fail = False
+    resp = await router.text_chat(a, prompt="hi", contexts=[])
+    assert resp.completion_text == "a"
+    assert router.get_health("a").state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_hedged_request():
+    slow = StubProvider("slow", delay=1)
+    fast = StubProvider("fast", delay=0.01)
+    router = make_router([slow, fast], hedge=True, hedge_min_delay=0.05)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    resp = await router.text_chat(slow, prompt="hi", contexts=[])
+    assert resp.completion_text == "fast"
+    assert loop.time() - start < 0.5
+    assert slow.calls == 1 and fast.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_fallback():
+    a = StubProvider("a", fail=True)
+    b = StubProvider("b")
+    router = make_router([a, b])
+    results = [r async for r in router.text_chat_stream(a, prompt="hi")]
+    assert results[-1].completion_text == "b"
+    assert results[0].is_chunk
+
+
+@pytest.mark.asyncio
+async def test_disabled_router_passthrough():
+    a = StubProvider("a", fail=True)
+    b = StubProvider("b")
+    router = ProviderRouter(StubProviderManager([a, b]), {})
+    with pytest.raises(Exception):
+        await router.text_chat(a, prompt="hi")
+    assert b.calls == 0
+
+
+def test_prompt_token_usage():
+    from types import SimpleNamespace
+    from openai.types.completion_usage import CompletionUsage
+
+    router = make_router([StubProvider("a")])
+    provider = router.provider_manager.provider_insts[0]
+
+    openai_resp = LLMResponse("assistant", completion_text="x")
+    openai_resp.raw_completion = SimpleNamespace(
+        usage=CompletionUsage(
+            prompt_tokens=1000,
+            completion_tokens=10,
+            total_tokens=1010,
+            prompt_tokens_details={"cached_tokens": 768},
+        )
+    )
+    assert router.record_usage(provider, openai_resp) == (1000, 768)
+
+    anthropic_resp = LLMResponse("assistant", completion_text="x")
+    anthropic_resp.raw_completion = SimpleNamespace(
+        usage=SimpleNamespace(
+            input_tokens=20,
+            output_tokens=5,
+            cache_read_input_tokens=900,
+            cache_creation_input_tokens=80,
+        )
+    )
+    assert router.record_usage(provider, anthropic_resp) == (1000, 900)
+
+    health = router.get_health("a").to_dict()
+    assert health["prompt_tokens"] == 2000
+    assert health["cache_hit_rate"] == pytest.approx(0.834)
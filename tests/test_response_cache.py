@@ -0,0 +1,159 @@
+import math
+import zlib
+import pytest
+from typing import List
+from astrbot.core import sp
+from astrbot.core.provider.provider import Provider
+from astrbot.core.provider.entities import ProviderRequest, LLMResponse
+from astrbot.core.provider.response_cache import ResponseCache
+
+
+class StubProvider(Provider):
+    def __init__(self):
+        super().__init__({"id": "stub", "type": "stub"}, {})
+        self.set_model("stub-model")
+
+    def get_current_key(self) -> str:
+        return ""
+
+    def set_key(self, key: str):
+        pass
+
+    def get_models(self) -> List[str]:
+        return []
+
+    async def text_chat(self, prompt: str, **kwargs) -> LLMResponse:
+        return LLMResponse("assistant", completion_text=f"answer: {prompt}")
+
+
+class HashingEmbedding:
+    """字符 n-gram 哈希向量, 只衡量字面相似度, 用于在测试中代替 Embedding 服务"""
+
+    def __init__(self, dim: int = 256, ngram: int = 2) -> None:
+        self.dim = dim
+        self.ngram = ngram
+
+    async def get_embedding(self, text) -> List[float]:
+        vec = [0.0] * self.dim
+        text = text.lower()
+        grams = [text[i : i + self.ngram] for i in range(len(text) - self.ngram + 1)]
+        for gram in grams or [text]:
+            h = zlib.crc32(gram.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec))
+        return [v / norm for v in vec] if norm else vec
+
+
+def make_req(prompt: str, session_id: str = "test_cache_sid", **kwargs):
+    return ProviderRequest(
+        prompt=prompt,
+        session_id=session_id,
+        image_urls=[],
+        contexts=[],
+        system_prompt="You are a helpful assistant.\nCurrent datetime: 2025-01-01 00:00\n",
+        **kwargs,
+    )
+
+
+async def roundtrip(cache: ResponseCache, provider, req):
+    probe = await cache.lookup(provider, req)
+    if probe and probe.hit:
+        return probe.hit, True
+    resp = await provider.text_chat(req.prompt)
+    cache.store(probe, resp)
+    return resp, False
+
+
+@pytest.mark.asyncio
+async def test_exact_match():
+    cache = ResponseCache({"enable": True})
+    provider = StubProvider()
+    _, hit = await roundtrip(cache, provider, make_req("What is AstrBot?"))
+    assert not hit
+    req = make_req("  what is   astrbot? ")
+    req.system_prompt = req.system_prompt.replace("00:00", "00:05")
+    resp, hit = await roundtrip(cache, provider, req)
+    assert hit
+    assert resp.completion_text == "answer: What is AstrBot?"
+    assert cache.stats()["exact_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_semantic_match():
+    cache = ResponseCache(
+        {"enable": True, "semantic_enable": True, "semantic_threshold": 0.8}
+    )
+    # 未配置 Embedding 服务时不启用近似匹配
+    assert cache.embedding is None
+    cache.embedding = HashingEmbedding()
+    provider = StubProvider()
+    await roundtrip(cache, provider, make_req("how do i install astrbot on docker"))
+    _, hit = await roundtrip(
+        cache, provider, make_req("how do i install astrbot on docker?")
+    )
+    assert hit
+    _, hit = await roundtrip(cache, provider, make_req("tell me a joke"))
+    assert not hit
+    assert cache.stats()["semantic_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_scoped_by_session_and_context():
+    cache = ResponseCache({"enable": True})
+    provider = StubProvider()
+    await roundtrip(cache, provider, make_req("What is AstrBot?", "sid_a"))
+    _, hit = await roundtrip(cache, provider, make_req("What is AstrBot?", "sid_b"))
+    assert not hit
+
+    # 带有对话上下文的请求默认不使用缓存
+    history = [
+        {"role": "user", "content": "my name is a"},
+        {"role": "assistant", "content": "hi a"},
+    ]
+    req = make_req("what did i just say?", "sid_a")
+    req.contexts = history
+    assert await cache.lookup(provider, req) is None
+
+    cache = ResponseCache(
+        {"enable": True, "context_turns": 1, "share_across_sessions": True}
+    )
+    await roundtrip(cache, provider, make_req("what did i just say?", "sid_a"))
+    req = make_req("what did i just say?", "sid_b")
+    req.contexts = history
+    _, hit = await roundtrip(cache, provider, req)
+    assert not hit
+    req = make_req("what did i just say?", "sid_c")
+    req.contexts = history
+    _, hit = await roundtrip(cache, provider, req)
+    assert hit
+
+
+@pytest.mark.asyncio
+async def test_bypass():
+    cache = ResponseCache({"enable": True})
+    provider = StubProvider()
+    req = make_req("hello")
+    req.image_urls = ["a.jpg"]
+    assert await cache.lookup(provider, req) is None
+
+    cache.set_session_enabled("test_cache_opt_out", False)
+    try:
+        assert (
+            await cache.lookup(provider, make_req("hi", "test_cache_opt_out")) is None
+        )
+    finally:
+        cache.set_session_enabled("test_cache_opt_out", True)
+    assert "test_cache_opt_out" not in sp.get(cache.DISABLED_SESSIONS_KEY, [])
+
+    probe = await cache.lookup(provider, make_req("call a tool"))
+    cache.store(probe, LLMResponse("tool", tools_call_name=["web_search"]))
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_ttl():
+    cache = ResponseCache({"enable": True, "ttl": -1})
+    provider = StubProvider()
+    await roundtrip(cache, provider, make_req("expired"))
+    _, hit = await roundtrip(cache, provider, make_req("expired"))
+    assert not hit
@@ -0,0 +1,166 @@
+import asyncio
+import re
+import time
+import pytest
+from astrbot.core.message.components import Image, Plain
+from astrbot.core.message.message_event_result import MessageChain
+from astrbot.core.platform import AstrMessageEvent, PlatformMetadata, RetryAfter
+from astrbot.core.platform.astrbot_message import AstrBotMessage
+from astrbot.core.platform.message_type import MessageType
+from astrbot.core.platform.send_scheduler import (
+    PLATFORM_RATE_LIMITS,
+    RateLimit,
+    outbound_dispatcher,
+)
+
+
+class StubPlatform:
+    """模拟消息平台: 在任意 1 秒内超过全局或单会话的限额时返回限流"""
+
+    def __init__(self, global_limit: int, chat_limit: int):
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.sent = []  # (time, chat, text)
+        self.rejected = 0
+
+    def _recent(self, now, chat=None):
+        return [
+            t for t, c, _ in self.sent if now - t < 1 and (chat is None or c == chat)
+        ]
+
+    async def api_send(self, chat: str, text: str):
+        await asyncio.sleep(0.005)
+        now = time.monotonic()
+        recent_all = self._recent(now)
+        recent_chat = self._recent(now, chat)
+        if len(recent_all) >= self.global_limit or len(recent_chat) >= self.chat_limit:
+            self.rejected += 1
+            oldest = min(
+                recent_chat if len(recent_chat) >= self.chat_limit else recent_all
+            )
+            raise RetryAfter(oldest + 1 - now)
+        self.sent.append((now, chat, text))
+
+
+class StubEvent(AstrMessageEvent):
+    def __init__(self, platform: StubPlatform, chat: str, platform_name="stub"):
+        message_obj = AstrBotMessage()
+        message_obj.type = MessageType.GROUP_MESSAGE
+        super().__init__(
+            "",
+            message_obj,
+            PlatformMetadata(platform_name, "stub", id=platform_name),
+            chat,
+        )
+        self.platform = platform
+        self.chat = chat
+
+    async def send(self, message: MessageChain):
+        for comp in message.chain:
+            text = comp.text if isinstance(comp, Plain) else "[图片]"
+            await self.platform.api_send(self.chat, text)
+
+    async def send_streaming(self, generator, use_fallback=False):
+        await self._wait_queued_sends()
+
+
+@pytest.fixture(autouse=True)
+def stub_limits():
+    PLATFORM_RATE_LIMITS["stub"] = RateLimit(15, 5, 2.5, 1)
+    PLATFORM_RATE_LIMITS["stub_fast"] = RateLimit(0, 1, 10, 1)
+    outbound_dispatcher.configure({})
+    yield
+    PLATFORM_RATE_LIMITS.pop("stub")
+    PLATFORM_RATE_LIMITS.pop("stub_fast")
+    outbound_dispatcher.configure({})
+
+
+async def burst(platform: StubPlatform, chats: int, per_chat: int):
+    # 每条消息来自不同的事件, 不会被合并
+    results = await asyncio.gather(
+        *[
+            StubEvent(platform, f"chat{c}").send(MessageChain([Plain(f"chat{c}-{i}")]))
+            for i in range(per_chat)
+            for c in range(chats)
+        ],
+        return_exceptions=True,
+    )
+    return [r for r in results if isinstance(r, Exception)]
+
+
+@pytest.mark.asyncio
+async def test_simulated_burst_against_stub_platform():
+    naive = StubPlatform(global_limit=20, chat_limit=3)
+    outbound_dispatcher.configure({"enable": False})
+    naive_errors = await burst(naive, chats=6, per_chat=5)
+
+    scheduled = StubPlatform(global_limit=20, chat_limit=3)
+    outbound_dispatcher.configure({"enable": True})
+    scheduled_errors = await burst(scheduled, chats=6, per_chat=5)
+
+    assert naive.rejected > 0 and len(naive_errors) == naive.rejected
+    assert not scheduled_errors
+    assert scheduled.rejected == 0
+    assert len(scheduled.sent) == 30
+    # 每个会话内的顺序保持不变
+    for c in range(6):
+        texts = [t for _, chat, t in scheduled.sent if chat == f"chat{c}"]
+        assert texts == [f"chat{c}-{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_fair_across_chats():
+    platform = StubPlatform(global_limit=1000, chat_limit=1000)
+    busy = StubEvent(platform, "busy", "stub_fast")
+    quiet = StubEvent(platform, "quiet", "stub_fast")
+    tasks = [busy.send(MessageChain([Plain(f"b{i}")])) for i in range(10)]
+    tasks.append(quiet.send(MessageChain([Plain("q")])))
+    await asyncio.gather(*tasks)
+    order = [chat for _, chat, _ in platform.sent]
+    # 安静的会话不需要等待繁忙会话的所有消息发送完
+    assert order.index("quiet") <= 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honoured():
+    platform = StubPlatform(global_limit=1000, chat_limit=1)
+    event = StubEvent(platform, "chat", "stub_fast")
+    start = time.monotonic()
+    await event.send(MessageChain([Plain("a")]))
+    await event.send(MessageChain([Plain("b")]))
+    assert time.monotonic() - start >= 0.9
+    assert platform.rejected == 1
+    assert [t for _, _, t in platform.sent] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_queued_text_is_merged():
+    platform = StubPlatform(global_limit=1000, chat_limit=1000)
+    event = StubEvent(platform, "chat")
+    buffer = await event.process_buffer(
+        "第一句。第二句！第三句？第四句。剩余", re.compile(r"[^。？！~…]+[。？！~…]+")
+    )
+    await event.send(MessageChain([Image.fromURL("https://example.com/a.jpg")]))
+    await event.send_streaming(None)
+    assert buffer == "剩余"
+    texts = [t for _, _, t in platform.sent]
+    # 同一事件排队中的文本被合并为一条, 之后才是图片
+    assert texts == ["第一句。\n第二句！\n第三句？\n第四句。", "[图片]"]
+
+
+@pytest.mark.asyncio
+async def test_nested_send_bypasses_queue():
+    platform = StubPlatform(global_limit=1000, chat_limit=1000)
+
+    class FallbackEvent(StubEvent):
+        async def send(self, message: MessageChain):
+            if isinstance(message.chain[0], Image):
+                await self.send(MessageChain([Plain("上传图片失败")]))
+                return
+            await super().send(message)
+
+    event = FallbackEvent(platform, "chat", "stub_fast")
+    await asyncio.wait_for(
+        event.send(MessageChain([Image.fromURL("https://example.com/a.jpg")])), 2
+    )
+    assert [t for _, _, t in platform.sent] == ["上传图片失败"]
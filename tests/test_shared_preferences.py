@@ -0,0 +1,110 @@
+import asyncio
+import json
+import sqlite3
+import time
+import pytest
+from astrbot.core.utils.shared_preferences import SharedPreferences
+
+
+def make_sp(tmp_path, **kwargs) -> SharedPreferences:
+    return SharedPreferences(
+        path=str(tmp_path / "sp.db"), json_path=str(tmp_path / "sp.json"), **kwargs
+    )
+
+
+def stored(tmp_path) -> dict:
+    conn = sqlite3.connect(tmp_path / "sp.db")
+    try:
+        return {k: json.loads(v) for k, v in conn.execute("SELECT * FROM preferences")}
+    finally:
+        conn.close()
+
+
+def test_migrates_json_on_first_start(tmp_path):
+    legacy = {"curr_provider": "openai", "alter_cmd": {"a": {"b": 1}}}
+    (tmp_path / "sp.json").write_text(json.dumps(legacy))
+    sp = make_sp(tmp_path)
+    assert sp.get("curr_provider") == "openai"
+    assert not (tmp_path / "sp.json").exists()
+    assert (tmp_path / "sp.json.bak").exists()
+    sp.close()
+
+    sp = make_sp(tmp_path)
+    assert sp.get("alter_cmd") == {"a": {"b": 1}}
+    sp.close()
+
+
+def test_sync_writes_are_immediate(tmp_path):
+    sp = make_sp(tmp_path)
+    sp.put("a", [1, 2])
+    sp.put("b", "中文")
+    sp.remove("a")
+    assert stored(tmp_path) == {"b": "中文"}
+    sp.clear()
+    assert stored(tmp_path) == {}
+    sp.close()
+
+
+@pytest.mark.asyncio
+async def test_writes_are_debounced_and_batched(tmp_path):
+    sp = make_sp(tmp_path, flush_delay=0.05)
+    writes = 0
+    original = sp._write
+
+    def counting(rows):
+        nonlocal writes
+        writes += 1
+        original(rows)
+
+    sp._write = counting
+    for i in range(1000):
+        sp.put(f"session_conversation:user{i}", f"cid{i}")
+    sp.remove("session_conversation:user0")
+    assert writes == 0
+    await asyncio.sleep(0.2)
+    assert writes == 1
+    data = stored(tmp_path)
+    assert len(data) == 999 and data["session_conversation:user1"] == "cid1"
+    assert len(sp.get_by_prefix("session_conversation:")) == 999
+
+    sp.put("x", 1)
+    await sp.aflush()
+    assert writes == 2 and stored(tmp_path)["x"] == 1
+
+    # clear() 同样延迟写入, 不在事件循环中同步写数据库
+    sp.clear()
+    assert writes == 2 and sp.get("x") is None
+    await asyncio.sleep(0.2)
+    assert writes == 3 and stored(tmp_path) == {}
+    sp.close()
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_put_does_not_block_event_loop(tmp_path, benchmark_report):
+    """10 万个会话时, 旧实现每次切换对话都要重写整个 json 文件"""
+    sessions = {f"aiocqhttp:GroupMessage:{i}": f"{i:032x}" for i in range(100_000)}
+
+    legacy_path = tmp_path / "legacy.json"
+    start = time.perf_counter()
+    for _ in range(10):
+        with open(legacy_path, "w") as f:
+            json.dump({"session_conversation": sessions}, f, indent=4)
+    legacy = (time.perf_counter() - start) / 10
+
+    sp = make_sp(tmp_path)
+    sp.put_many({f"session_conversation:{k}": v for k, v in sessions.items()})
+    sp.flush_delay = 0.01
+    start = time.perf_counter()
+    for i in range(10):
+        sp.put(f"session_conversation:aiocqhttp:GroupMessage:{i}", "new")
+    per_put = (time.perf_counter() - start) / 10
+    await sp.aflush()
+    benchmark_report(
+        f"100k sessions, one switch: json rewrite {legacy * 1000:.1f}ms, "
+        f"sqlite put {per_put * 1e6:.1f}us on the loop"
+    )
+    assert stored(tmp_path)["session_conversation:aiocqhttp:GroupMessage:3"] == "new"
+    sp.close()
+    stat = await asyncio.to_thread((tmp_path / "sp.db").stat)
+    assert stat.st_size > 0
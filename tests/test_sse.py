@@ -0,0 +1,91 @@
+import json
+import time
+import pytest
+from astrbot.core.utils.sse import SSEDecoder
+
+
+def decode_all(payload: bytes, chunk_size: int):
+    decoder = SSEDecoder()
+    events = []
+    for i in range(0, len(payload), chunk_size):
+        events.extend(decoder.feed(payload[i : i + chunk_size]))
+    return events
+
+
+def test_fields_and_line_endings():
+    payload = (
+        b": comment\r\n"
+        b"event: ping\r\n\r\n"
+        b"event: update\r\nid: 7\r\nretry: 3000\r\ndata: line1\r\ndata:line2\r\n\r\n"
+        b'data: {"a": 1}\n\n'
+        b"data: incomplete"
+    )
+    for chunk_size in (1, 3, len(payload)):
+        events = decode_all(payload, chunk_size)
+        assert len(events) == 2
+        assert events[0].event == "update"
+        assert events[0].data == "line1\nline2"
+        assert events[0].id == "7"
+        assert events[0].retry == 3000
+        assert events[1].event == "message"
+        assert json.loads(events[1].data) == {"a": 1}
+
+
+def test_multibyte_split_across_chunks():
+    payload = "data: 你好，世界🌏\n\n".encode("utf-8") * 3
+    for chunk_size in range(1, 8):
+        events = decode_all(payload, chunk_size)
+        assert [e.data for e in events] == ["你好，世界🌏"] * 3
+
+
+def naive_decode(payload: bytes, chunk_size: int):
+    """旧版 DifyAPIClient 的解析方式"""
+    buffer = ""
+    events = []
+    for i in range(0, len(payload), chunk_size):
+        buffer += payload[i : i + chunk_size].decode("utf-8", errors="ignore")
+        blocks = buffer.split("\n\n")
+        for block in blocks[:-1]:
+            if block.startswith("data:"):
+                events.append(block[5:])
+        buffer = blocks[-1]
+    return events
+
+
+def test_large_event_across_many_chunks():
+    payload = b"data: " + b"x" * (1024 * 1024) + b"\n\n" + b"data: end\n\n"
+    events = decode_all(payload, 8192)
+    assert [len(e.data) for e in events] == [1024 * 1024, 3]
+
+
+@pytest.mark.benchmark
+def test_throughput_large_stream(benchmark_report):
+    """吞吐量基准：单个 4 MB 的事件与 4 MB 的小事件流，按 8 KB 分块输入"""
+    big_event = b"data: " + b"x" * (4 * 1024 * 1024) + b"\n\n"
+    small_events = (
+        "data: " + json.dumps({"event": "message", "answer": "流式输出" * 8}) + "\n\n"
+    ).encode("utf-8") * 20000
+
+    for name, payload in (
+        ("single 4MB event", big_event),
+        ("many events", small_events),
+    ):
+        start = time.perf_counter()
+        events = decode_all(payload, 8192)
+        elapsed = time.perf_counter() - start
+        mb = len(payload) / 1024 / 1024
+        benchmark_report(
+            f"SSEDecoder {name}: {mb:.1f} MB in {elapsed:.3f}s ({mb / elapsed:.1f} MB/s)"
+        )
+        assert events
+
+    # 旧实现在单个大事件上每个分块都要重新切分整个缓冲区，耗时随事件大小平方增长
+    start = time.perf_counter()
+    naive_decode(big_event[: 1024 * 1024], 8192)
+    naive_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    decode_all(big_event[: 1024 * 1024], 8192)
+    benchmark_report(
+        f"1 MB event in 8 KB chunks: naive {naive_elapsed:.3f}s, "
+        f"SSEDecoder {time.perf_counter() - start:.3f}s"
+    )
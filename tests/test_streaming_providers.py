@@ -0,0 +1,294 @@
+import json
+import pytest
+from aiohttp import web
+from astrbot.core.provider.func_tool_manager import FuncCall
+from astrbot.core.provider.sources.anthropic_source import ProviderAnthropic
+from astrbot.core.provider.sources.dify_source import ProviderDify
+from astrbot.core.provider.sources.openai_source import ProviderOpenAIOfficial
+
+
+def sse(event: str = None, data: dict = None) -> bytes:
+    frame = f"event: {event}\n" if event else ""
+    return (frame + f"data: {json.dumps(data)}\n\n").encode("utf-8")
+
+
+async def start_stub(path: str, frames: list, requests: list = None) -> tuple:
+    async def handler(request: web.Request):
+        if requests is not None:
+            requests.append(await request.json())
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        for frame in frames:
+            await resp.write(frame)
+        await resp.write_eof()
+        return resp
+
+    app = web.Application()
+    app.router.add_post(path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+ANTHROPIC_FRAMES = [
+    sse(
+        "message_start",
+        {
+            "type": "message_start",
+            "message": {
+                "id": "msg_1",
+                "type": "message",
+                "role": "assistant",
+                "model": "claude-test",
+                "content": [],
+                "stop_reason": None,
+                "stop_sequence": None,
+                "usage": {"input_tokens": 10, "output_tokens": 1},
+            },
+        },
+    ),
+    sse(
+        "content_block_start",
+        {
+            "type": "content_block_start",
+            "index": 0,
+            "content_block": {"type": "text", "text": ""},
+        },
+    ),
+    sse(
+        "content_block_delta",
+        {
+            "type": "content_block_delta",
+            "index": 0,
+            "delta": {"type": "text_delta", "text": "Let me "},
+        },
+    ),
+    sse(
+        "content_block_delta",
+        {
+            "type": "content_block_delta",
+            "index": 0,
+            "delta": {"type": "text_delta", "text": "check."},
+        },
+    ),
+    sse("content_block_stop", {"type": "content_block_stop", "index": 0}),
+    sse(
+        "content_block_start",
+        {
+            "type": "content_block_start",
+            "index": 1,
+            "content_block": {
+                "type": "tool_use",
+                "id": "toolu_1",
+                "name": "get_weather",
+                "input": {},
+            },
+        },
+    ),
+    sse(
+        "content_block_delta",
+        {
+            "type": "content_block_delta",
+            "index": 1,
+            "delta": {"type": "input_json_delta", "partial_json": '{"location": '},
+        },
+    ),
+    sse(
+        "content_block_delta",
+        {
+            "type": "content_block_delta",
+            "index": 1,
+            "delta": {"type": "input_json_delta", "partial_json": '"Paris"}'},
+        },
+    ),
+    sse("content_block_stop", {"type": "content_block_stop", "index": 1}),
+    sse(
+        "message_delta",
+        {
+            "type": "message_delta",
+            "delta": {"stop_reason": "tool_use", "stop_sequence": None},
+            "usage": {"output_tokens": 25},
+        },
+    ),
+    sse("message_stop", {"type": "message_stop"}),
+]
+
+
+@pytest.mark.asyncio
+async def test_anthropic_stream():
+    runner, base = await start_stub("/v1/messages", ANTHROPIC_FRAMES)
+    try:
+        provider = ProviderAnthropic(
+            {
+                "id": "claude",
+                "type": "anthropic_chat_completion",
+                "key": ["sk-test"],
+                "api_base": base,
+                "model_config": {"model": "claude-test", "max_tokens": 100},
+            },
+            {},
+            None,
+        )
+        tools = FuncCall()
+
+        async def get_weather(event, location: str):
+            return location
+
+        tools.add_func(
+            "get_weather",
+            [{"type": "string", "name": "location", "description": "地点"}],
+            "获取天气",
+            get_weather,
+        )
+        responses = [
+            resp
+            async for resp in provider.text_chat_stream(
+                "weather in Paris?", func_tool=tools, contexts=[]
+            )
+        ]
+        chunks = [r for r in responses if r.is_chunk]
+        assert [c.completion_text for c in chunks] == ["Let me ", "check."]
+        final = responses[-1]
+        assert not final.is_chunk
+        assert final.role == "tool"
+        assert final.completion_text == "Let me check."
+        assert final.tools_call_name == ["get_weather"]
+        assert final.tools_call_args == [{"location": "Paris"}]
+        assert final.tools_call_ids == ["toolu_1"]
+        assert final.raw_completion.usage.output_tokens == 25
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_anthropic_stream_closed_early_releases_key():
+    runner, base = await start_stub("/v1/messages", ANTHROPIC_FRAMES)
+    try:
+        provider = ProviderAnthropic(
+            {
+                "id": "claude",
+                "type": "anthropic_chat_completion",
+                "key": ["sk-test"],
+                "api_base": base,
+                "model_config": {"model": "claude-test", "max_tokens": 100},
+            },
+            {},
+            None,
+        )
+        stream = provider.text_chat_stream("hi", contexts=[])
+        await stream.__anext__()
+        await stream.aclose()
+        assert provider.key_pool.states["sk-test"].in_flight == 0
+    finally:
+        await runner.cleanup()
+
+
+DIFY_FRAMES = [
+    sse(data={"event": "agent_thought", "thought": "", "conversation_id": "c1"}),
+    sse(data={"event": "agent_message", "answer": "你好", "conversation_id": "c1"}),
+    # 多字节字符被拆分到两个 TCP 写入中
+    'data: {"event": "message", "answer": "世界", "conversation_id": "c1"}\n\n'.encode()[
+        :40
+    ],
+    'data: {"event": "message", "answer": "世界", "conversation_id": "c1"}\n\n'.encode()[
+        40:
+    ],
+    sse(data={"event": "message_end", "conversation_id": "c1"}),
+]
+
+
+@pytest.mark.asyncio
+async def test_dify_stream():
+    runner, base = await start_stub("/chat-messages", DIFY_FRAMES)
+    try:
+        provider = ProviderDify(
+            {
+                "id": "dify",
+                "type": "dify",
+                "dify_api_key": "app-test",
+                "dify_api_base": base,
+                "dify_api_type": "chat",
+            },
+            {},
+            None,
+        )
+        responses = [
+            resp
+            async for resp in provider.text_chat_stream(
+                "hi", session_id="test_dify_stream", image_urls=[]
+            )
+        ]
+        assert [r.completion_text for r in responses if r.is_chunk] == ["你好", "世界"]
+        assert responses[-1].completion_text == "你好世界"
+        assert provider.conversation_ids["test_dify_stream"] == "c1"
+
+        final = await provider.text_chat(
+            "hi", session_id="test_dify_stream", image_urls=[]
+        )
+        assert final.completion_text == "你好世界"
+        await provider.terminate()
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_anthropic_cache_control():
+    requests = []
+    runner, base = await start_stub("/v1/messages", ANTHROPIC_FRAMES, requests)
+    try:
+        provider = ProviderAnthropic(
+            {
+                "id": "claude",
+                "type": "anthropic_chat_completion",
+                "key": ["sk-test"],
+                "api_base": base,
+                "model_config": {"model": "claude-test", "max_tokens": 100},
+            },
+            {"prompt_cache_friendly": True},
+            None,
+        )
+        contexts = [
+            {"role": "user", "content": "hello"},
+            {"role": "assistant", "content": "hi"},
+        ]
+        async for _ in provider.text_chat_stream(
+            "weather in Paris?", contexts=contexts, system_prompt="You are a bot."
+        ):
+            pass
+        body = requests[0]
+        assert body["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert body["messages"][-2]["content"][0]["cache_control"] == {
+            "type": "ephemeral"
+        }
+        assert body["messages"][-1] == {"role": "user", "content": "weather in Paris?"}
+        # 原有的上下文不应被修改
+        assert contexts[-1] == {"role": "assistant", "content": "hi"}
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_openai_prompt_cache_key_is_opt_in():
+    def make(provider_config: dict):
+        return ProviderOpenAIOfficial(
+            {
+                "id": "openai",
+                "type": "openai_chat_completion",
+                "key": ["sk-test"],
+                "api_base": "http://127.0.0.1:1/v1",
+                "model_config": {"model": "gpt-test"},
+                **provider_config,
+            },
+            {"prompt_cache_friendly": True},
+            None,
+        )
+
+    payloads, _, _ = await make({})._prepare_chat_payload("hi", session_id="s")
+    assert "prompt_cache_key" not in payloads
+    payloads, _, _ = await make({"prompt_cache_key": True})._prepare_chat_payload(
+        "hi", session_id="s"
+    )
+    assert len(payloads["prompt_cache_key"]) == 32
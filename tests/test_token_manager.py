@@ -0,0 +1,148 @@
+import asyncio
+import contextlib
+import pytest
+from aiohttp import web
+from astrbot.core.platform.sources.qqofficial.managed_token import ManagedToken
+from astrbot.core.platform.token_manager import TokenManager, fetch_token_json
+
+
+class StubAuthServer:
+    """模拟钉钉/QQ 的 access_token 接口"""
+
+    def __init__(self, expires_in: int = 7200, delay: float = 0.05):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.requests = 0
+        self.fail = False
+
+    async def dingtalk(self, request: web.Request):
+        body = await request.json()
+        assert body == {"appKey": "key", "appSecret": "secret"}
+        return await self._issue("accessToken", "expireIn")
+
+    async def qq(self, request: web.Request):
+        body = await request.json()
+        assert body == {"appId": "1024", "clientSecret": "secret"}
+        # QQ 返回的 expires_in 是字符串
+        return await self._issue("access_token", "expires_in", str)
+
+    async def _issue(self, token_field, expires_field, conv=int):
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            return web.json_response({"code": 40001, "message": "bad"}, status=500)
+        return web.json_response(
+            {
+                token_field: f"token-{self.requests}",
+                expires_field: conv(self.expires_in),
+            }
+        )
+
+
+@contextlib.asynccontextmanager
+async def auth_server():
+    stub = StubAuthServer()
+    app = web.Application()
+    app.router.add_post("/v1.0/oauth2/accessToken", stub.dingtalk)
+    app.router.add_post("/app/getAppAccessToken", stub.qq)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    stub.base = f"http://127.0.0.1:{port}"
+    try:
+        yield stub
+    finally:
+        await runner.cleanup()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def dingtalk_manager(stub, clock):
+    async def fetch():
+        return await fetch_token_json(
+            f"{stub.base}/v1.0/oauth2/accessToken",
+            {"appKey": "key", "appSecret": "secret"},
+            "accessToken",
+            "expireIn",
+        )
+
+    return TokenManager("dingtalk", fetch, clock=clock)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_refresh():
+    async with auth_server() as stub:
+        manager = dingtalk_manager(stub, FakeClock())
+        tokens = await asyncio.gather(*[manager.get_token() for _ in range(50)])
+        assert set(tokens) == {"token-1"}
+        assert stub.requests == 1
+
+        # 有效期内直接使用缓存
+        for _ in range(20):
+            assert await manager.get_token() == "token-1"
+        assert stub.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_proactive_and_expired_refresh():
+    async with auth_server() as stub:
+        clock = FakeClock()
+        manager = dingtalk_manager(stub, clock)
+        assert await manager.get_token() == "token-1"
+
+        # 距离过期不足 5 分钟: 仍返回旧 token, 同时在后台刷新
+        clock.now += 7200 - 200
+        assert await manager.get_token() == "token-1"
+        assert await manager.get_token() == "token-1"
+        await asyncio.sleep(0.2)
+        assert stub.requests == 2
+        assert await manager.get_token() == "token-2"
+
+        # 已经过期: 等待刷新完成
+        clock.now += 7200
+        assert await manager.get_token() == "token-3"
+
+        # 刷新失败时抛出异常, 之后可以恢复
+        manager.invalidate()
+        stub.fail = True
+        with pytest.raises(Exception):
+            await manager.get_token()
+        stub.fail = False
+        assert await manager.get_token() == "token-5"
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_failure_keeps_old_token():
+    async with auth_server() as stub:
+        clock = FakeClock()
+        manager = dingtalk_manager(stub, clock)
+        await manager.get_token()
+        stub.fail = True
+        clock.now += 7200 - 200
+        assert await manager.get_token() == "token-1"
+        await asyncio.sleep(0.2)
+        # 失败后一段时间内不再重试
+        assert await manager.get_token() == "token-1"
+        await asyncio.sleep(0.1)
+        assert stub.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_qq_official_managed_token():
+    async with auth_server() as stub:
+        token = ManagedToken(
+            "1024", "secret", token_url=f"{stub.base}/app/getAppAccessToken"
+        )
+        await asyncio.gather(*[token.check_token() for _ in range(10)])
+        assert token.get_string() == "QQBot token-1"
+        assert stub.requests == 1
+        await token.update_access_token()
+        assert token.get_string() == "QQBot token-2"
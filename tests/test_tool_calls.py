@@ -0,0 +1,218 @@
+import asyncio
+import time
+import pytest
+from astrbot.core.pipeline.process_stage.method.llm_request import LLMRequestSubStage
+from astrbot.core.message.message_event_result import MessageEventResult
+from astrbot.core.provider.entities import ProviderRequest, LLMResponse
+from astrbot.core.provider.func_tool_manager import FuncCall, FuncTool
+
+
+class StubEvent:
+    def __init__(self):
+        self.extras = {}
+        self.result = None
+        self.order = []
+
+    def get_platform_id(self):
+        return "stub"
+
+    def get_result(self):
+        return self.result
+
+    def set_result(self, result):
+        self.result = result
+
+    def clear_result(self):
+        self.result = None
+
+    def set_extra(self, key, value):
+        self.extras[key] = value
+
+
+def make_stage(concurrency=4, timeout=1):
+    stage = LLMRequestSubStage()
+    stage.ctx = None
+    stage.tool_call_concurrency = concurrency
+    stage.tool_call_timeout = timeout
+    stage.tool_result_compact_length = 8
+    return stage
+
+
+def make_tools():
+    tools = FuncCall()
+
+    async def search(event, query: str):
+        await asyncio.sleep(0.2)
+        event.order.append(query)
+        return f"result of {query}"
+
+    async def slow(event):
+        await asyncio.sleep(5)
+        return "never"
+
+    async def notify(event, text: str):
+        event.order.append("notify")
+        yield
+
+    tools.add_func("search", [], "", search)
+    tools.add_func("slow", [], "", slow)
+    tools.add_func("notify", [], "", notify)
+    return tools
+
+
+async def run(stage, tools, calls, req=None):
+    event = StubEvent()
+    req = req or ProviderRequest(prompt="hi", func_tool=tools)
+    resp = LLMResponse(
+        "tool",
+        tools_call_name=[c[0] for c in calls],
+        tools_call_args=[c[1] for c in calls],
+        tools_call_ids=[c[2] for c in calls],
+    )
+    result = None
+    async for r in stage._handle_function_tools(event, req, resp):
+        if r is not None:
+            result = r
+    return event, result
+
+
+@pytest.mark.asyncio
+async def test_parallel_tool_calls_keep_order():
+    stage = make_stage()
+    calls = [("search", {"query": f"q{i}"}, f"call_{i}") for i in range(3)]
+    start = time.time()
+    _, req = await run(stage, make_tools(), calls)
+    assert time.time() - start < 0.5
+    segs = req.tool_calls_result[-1].tool_calls_result
+    assert [s.tool_call_id for s in segs] == ["call_0", "call_1", "call_2"]
+    assert segs[2].content == "result of q2"
+
+
+@pytest.mark.asyncio
+async def test_tool_call_timeout():
+    stage = make_stage(timeout=0.3)
+    calls = [("slow", {}, "call_0"), ("search", {"query": "q"}, "call_1")]
+    _, req = await run(stage, make_tools(), calls)
+    segs = req.tool_calls_result[-1].tool_calls_result
+    assert segs[0].content.startswith("error: tool call timed out")
+    assert segs[1].content == "result of q"
+
+
+@pytest.mark.asyncio
+async def test_generator_tools_run_sequentially():
+    stage = make_stage()
+    tools = make_tools()
+    tools.get_func("search").concurrent = False
+    calls = [
+        ("search", {"query": "a"}, "call_0"),
+        ("notify", {"text": "x"}, "call_1"),
+        ("search", {"query": "b"}, "call_2"),
+    ]
+    event, req = await run(stage, tools, calls)
+    assert event.order == ["a", "notify", "b"]
+    assert [s.tool_call_id for s in req.tool_calls_result[-1].tool_calls_result] == [
+        "call_0",
+        "call_2",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_multi_step_compacts_older_results():
+    stage = make_stage()
+    tools = make_tools()
+    _, req = await run(stage, tools, [("search", {"query": "first"}, "call_0")])
+    assert req.func_tool is tools
+    _, req = await run(stage, tools, [("search", {"query": "second"}, "call_1")], req)
+    assert len(req.tool_calls_result) == 2
+    old, new = req.tool_calls_result
+    assert old.tool_calls_result[0].content.startswith("result o...(已截断")
+    assert new.tool_calls_result[0].content == "result of second"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_tool_returning_message_result():
+    stage = make_stage()
+    tools = make_tools()
+
+    async def reply(event, text: str):
+        return MessageEventResult().message(text)
+
+    tools.add_func("reply", [], "", reply)
+    event = StubEvent()
+    req = ProviderRequest(prompt="hi", func_tool=tools)
+    resp = LLMResponse(
+        "tool",
+        tools_call_name=["reply", "search"],
+        tools_call_args=[{"text": "done"}, {"query": "q"}],
+        tools_call_ids=["call_0", "call_1"],
+    )
+    sent = []
+    async for r in stage._handle_function_tools(event, req, resp):
+        if r is None:
+            sent.append(event.get_result())
+    assert [m.get_plain_text() for m in sent] == ["done"]
+    assert event.extras["tool_call_result"] is sent[0]
+    assert event.get_result() is None
+    segs = req.tool_calls_result[-1].tool_calls_result
+    assert [s.tool_call_id for s in segs] == ["call_1"]
+
+
+@pytest.mark.asyncio
+async def test_non_concurrent_mcp_tool():
+    class TextContent:
+        text = "mcp result"
+
+    class StubMCPClient:
+        async def call_tool(self, name, args):
+            self.called = (name, args)
+            return type("CallToolResult", (), {"content": [TextContent()]})()
+
+    stage = make_stage()
+    tools = FuncCall()
+    client = StubMCPClient()
+    tools.mcp_client_dict["stub"] = client
+    tools.func_list = [
+        FuncTool(
+            name="lookup",
+            parameters={},
+            description="",
+            origin="mcp",
+            mcp_server_name="stub",
+            concurrent=False,
+        )
+    ]
+    _, req = await run(stage, tools, [("lookup", {"q": "x"}, "call_0")])
+    assert client.called == ("lookup", {"q": "x"})
+    segs = req.tool_calls_result[-1].tool_calls_result
+    assert [s.content for s in segs] == ["mcp result"]
+
+
+@pytest.mark.asyncio
+async def test_per_turn_prompt_is_not_saved_to_history():
+    saved = {}
+
+    class StubConvManager:
+        async def update_conversation(self, umo, cid, history):
+            saved["history"] = history
+
+    class StubConversation:
+        cid = "cid"
+
+    class HistoryEvent(StubEvent):
+        unified_msg_origin = "test:group:1"
+
+    stage = make_stage()
+    stage.conv_manager = StubConvManager()
+    req = ProviderRequest(
+        prompt="hello\n\nCurrent datetime: 2025-01-01 00:00\n\nchat history...",
+        contexts=[],
+        conversation=StubConversation(),
+        history_prompt="hello",
+    )
+    await stage._save_to_history(
+        HistoryEvent(), req, LLMResponse("assistant", completion_text="hi")
+    )
+    assert saved["history"] == [
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi"},
+    ]
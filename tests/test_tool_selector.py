@@ -0,0 +1,100 @@
+import pytest
+from astrbot.core.provider.entities import ProviderRequest
+from astrbot.core.provider.func_tool_manager import FuncCall
+from astrbot.core.provider.tool_selector import ToolSelector, evaluate_selection
+
+TOOLS = [
+    ("get_weather", "查询指定城市的天气预报", ["city"]),
+    ("web_search", "Search the web with a search engine and return results", ["query"]),
+    ("fetch_url", "Fetch the content of a web page by URL", ["url"]),
+    ("create_reminder", "创建一个定时提醒，到时间后提醒用户", ["time", "text"]),
+    ("list_reminders", "列出当前会话的所有提醒", []),
+    ("delete_reminder", "删除一个提醒", ["index"]),
+    ("run_python", "Execute Python code in a sandbox and return stdout", ["code"]),
+    ("translate_text", "将文本翻译成目标语言", ["text", "target_language"]),
+    (
+        "github_create_issue",
+        "Create an issue in a GitHub repository",
+        ["repo", "title"],
+    ),
+    (
+        "github_list_pull_requests",
+        "List pull requests of a GitHub repository",
+        ["repo"],
+    ),
+    ("read_file", "Read a file from the local filesystem", ["path"]),
+    ("write_file", "Write content to a file on the local filesystem", ["path"]),
+    ("stock_quote", "查询股票的实时行情和价格", ["symbol"]),
+    ("exchange_rate", "查询两种货币之间的汇率", ["from", "to"]),
+    ("send_email", "Send an email to the given address", ["to", "subject"]),
+    ("calendar_add_event", "Add an event to the user's calendar", ["title", "date"]),
+    ("music_search", "搜索歌曲并返回播放链接", ["keyword"]),
+    ("image_generate", "根据描述生成一张图片", ["prompt"]),
+    ("map_route", "规划两地之间的出行路线", ["origin", "destination"]),
+    ("news_headlines", "获取今日新闻头条", ["category"]),
+] + [
+    (f"mcp_db_tool_{i}", f"Database admin operation #{i} for the SQL server", ["sql"])
+    for i in range(20)
+]
+
+CASES = [
+    ("北京明天天气怎么样", ["get_weather"]),
+    ("帮我搜索一下 python 3.13 的新特性", ["web_search"]),
+    ("十分钟后提醒我喝水", ["create_reminder"]),
+    ("把这段话翻译成英文：你好世界", ["translate_text"]),
+    ("open an issue on the GitHub repo about the crash", ["github_create_issue"]),
+    ("run this python code: print(1+1)", ["run_python"]),
+    ("美元兑人民币汇率是多少", ["exchange_rate"]),
+    ("从公司到机场的路线", ["map_route"]),
+    ("画一张猫的图片", ["image_generate"]),
+    ("read the file config.yaml", ["read_file"]),
+]
+
+
+def make_func_call() -> FuncCall:
+    async def handler(**kwargs):
+        return "ok"
+
+    fc = FuncCall()
+    for name, desc, params in TOOLS:
+        fc.add_func(
+            name,
+            [{"type": "string", "name": p, "description": p} for p in params],
+            desc,
+            handler,
+        )
+    return fc
+
+
+@pytest.mark.asyncio
+async def test_selection_evaluation():
+    fc = make_func_call()
+    selector = ToolSelector({"top_k": 3, "pinned_tools": ["list_reminders"]})
+    report = await evaluate_selection(selector, fc, CASES)
+    assert report["recall"] >= 0.9
+    assert report["token_saving"] > 0.8
+
+
+@pytest.mark.asyncio
+async def test_pinned_tools_and_subset_reuse():
+    fc = make_func_call()
+    selector = ToolSelector({"top_k": 2, "pinned_tools": ["send_email"]})
+    req = ProviderRequest(
+        prompt="那上海呢",
+        contexts=[
+            {"role": "user", "content": "北京天气怎么样"},
+            {"role": "assistant", "content": "北京晴"},
+        ],
+    )
+    subset = await selector.select(fc, selector.build_query(req))
+    names = [f.name for f in subset.func_list]
+    assert "send_email" in names
+    assert "get_weather" in names
+    assert len(names) <= 3
+    # 相同的子集复用同一个 FuncCall，工具描述的缓存得以保留
+    assert await selector.select(fc, selector.build_query(req)) is subset
+
+    # 工具数量不超过 top_k 时不筛选
+    small = FuncCall()
+    small.func_list = fc.func_list[:2]
+    assert await selector.select(small, "anything") is small